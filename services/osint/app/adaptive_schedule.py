@@ -0,0 +1,158 @@
+"""Change-rate driven rescan schedule.
+
+Each target gets its own rescan interval, kept within ``[min_interval, max_interval]``. After
+every scan the target's attack surface (hosts, open ports, findings) is compared with the
+previous scan: an unchanged surface backs the interval off, a changing one shortens it in
+proportion to the change rate. Targets are served from a heap ordered by next-run time, and
+schedule state is persisted in the scan index so it survives restarts.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from loguru import logger
+
+from .scan_index import ScanIndex, scan_index
+
+
+def surface_key(ev: dict[str, Any]) -> str | None:
+    """Attack-surface key of a scan event (host, open port or finding), or None."""
+    etype = (ev.get("type") or "").upper()
+    data = ev.get("data")
+    if etype == "DNS_NAME":
+        host = data if isinstance(data, str) else ev.get("host")
+        return f"host:{host}".lower() if host else None
+    if etype == "OPEN_TCP_PORT":
+        endpoint = data if isinstance(data, str) else None
+        return f"port:{endpoint}".lower() if endpoint else None
+    if etype in ("FINDING", "VULNERABILITY"):
+        desc = data.get("description") if isinstance(data, dict) else data
+        return f"finding:{ev.get('host') or ''}|{desc}".lower() if desc else None
+    return None
+
+
+def _digest(key: str) -> str:
+    # Short digests keep the persisted surface of large targets compact
+    return hashlib.sha1(key.encode("utf-8", "ignore")).hexdigest()[:16]
+
+
+@dataclass
+class TargetSchedule:
+    target: str
+    interval: float
+    next_run: float
+    last_scan_at: float | None = None
+    change_rate: float | None = None
+    surface: frozenset[str] = field(default_factory=frozenset)
+
+
+class AdaptiveScheduler:
+    def __init__(
+        self,
+        targets: Iterable[str],
+        min_interval: float,
+        max_interval: float,
+        backoff: float = 2.0,
+        initial_interval: float | None = None,
+        store: ScanIndex | None = None,
+    ) -> None:
+        self.min_interval = max(1.0, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.backoff = max(1.0, float(backoff))
+        self.store = store if store is not None else scan_index
+        initial = self._clamp(initial_interval if initial_interval is not None else self.min_interval)
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self.states: dict[str, TargetSchedule] = {}
+        now = time.time()
+        for target in dict.fromkeys(targets):
+            state = self._load(target) or TargetSchedule(target=target, interval=initial, next_run=now)
+            state.interval = self._clamp(state.interval)
+            # Never wait longer than max_interval, even if the stored next_run predates a config change
+            state.next_run = min(state.next_run, now + state.interval)
+            self.states[target] = state
+            self._push(state)
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, float(interval)))
+
+    def _push(self, state: TargetSchedule) -> None:
+        heapq.heappush(self._heap, (state.next_run, next(self._seq), state.target))
+
+    def _load(self, target: str) -> TargetSchedule | None:
+        try:
+            row = self.store.get_target_state(target)
+        except Exception as exc:
+            logger.debug("Failed to load schedule state for {}: {}", target, exc)
+            return None
+        if not row:
+            return None
+        return TargetSchedule(
+            target=target,
+            interval=row["interval"],
+            next_run=row["next_run"],
+            last_scan_at=row.get("last_scan_at"),
+            change_rate=row.get("change_rate"),
+            surface=frozenset(row.get("surface") or ()),
+        )
+
+    def _save(self, state: TargetSchedule) -> None:
+        try:
+            self.store.save_target_state(
+                state.target,
+                interval=state.interval,
+                next_run=state.next_run,
+                last_scan_at=state.last_scan_at,
+                change_rate=state.change_rate,
+                surface=sorted(state.surface),
+            )
+        except Exception as exc:
+            logger.debug("Failed to persist schedule state for {}: {}", state.target, exc)
+
+    def peek(self) -> tuple[str, float] | None:
+        """Next target to scan and how many seconds until it is due."""
+        if not self._heap:
+            return None
+        next_run, _, target = self._heap[0]
+        return target, max(0.0, next_run - time.time())
+
+    def pop(self) -> str:
+        return heapq.heappop(self._heap)[2]
+
+    def record(self, target: str, surface_keys: Iterable[str], scanned_at: float | None = None) -> TargetSchedule:
+        """Reschedule ``target`` from the change between its previous and current surface."""
+        state = self.states[target]
+        scanned_at = scanned_at or time.time()
+        surface = frozenset(_digest(k) for k in surface_keys)
+        if state.last_scan_at is None:
+            # First observation: nothing to compare against yet
+            state.change_rate = None
+        else:
+            union = state.surface | surface
+            changed = len(state.surface ^ surface)
+            state.change_rate = changed / len(union) if union else 0.0
+            if state.change_rate == 0:
+                factor = self.backoff
+            else:
+                factor = max(1.0 / self.backoff, 1.0 - state.change_rate)
+            state.interval = self._clamp(state.interval * factor)
+        state.surface = surface
+        state.last_scan_at = scanned_at
+        state.next_run = scanned_at + state.interval
+        self._push(state)
+        self._save(state)
+        return state
+
+    def reschedule(self, target: str, delay: float | None = None) -> TargetSchedule:
+        """Put ``target`` back without touching its surface (failed or empty scan)."""
+        state = self.states[target]
+        state.next_run = time.time() + (self.min_interval if delay is None else delay)
+        self._push(state)
+        self._save(state)
+        return state
@@ -0,0 +1,197 @@
+"""Rate limiting and query admission control.
+
+Two layers keep one busy client from saturating the database and starving ingest:
+
+- ``rate_limiter``: a token bucket per API token (``RATE_LIMIT_PER_MINUTE``, burst
+  ``RATE_LIMIT_BURST``), applied by the API middleware before a request does any work, and per
+  authenticated worker id (``WORKER_RATE_LIMIT_PER_MINUTE``), charged once its token checks out.
+- ``admission``: ``QUERY_MAX_CONCURRENCY`` query slots shared by ad-hoc reads (API and MCP
+  queries) and ingest writes. Reads never take the last ``QUERY_WRITE_RESERVED`` slots and queue
+  behind waiting writes; a read that cannot get a slot within ``QUERY_QUEUE_TIMEOUT`` seconds,
+  or finds ``QUERY_MAX_QUEUE`` reads already waiting, is rejected. Writes wait as long as it takes.
+
+Both reject with ``Overloaded``, which the API reports as 429 with ``Retry-After``.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
+
+from .config import settings
+from . import metrics
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Buckets kept before idle, refilled ones are dropped (one per distinct token / client address)
+_MAX_BUCKETS = 10000
+
+
+class Overloaded(Exception):
+    """Request rejected by a rate limit or the query admission queue."""
+
+    def __init__(self, detail: str, retry_after: float) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float) -> None:
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, rate: float, burst: float, cost: float = 1) -> float:
+        """Take ``cost`` tokens; returns 0 on success, else the seconds until they are available."""
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self) -> None:
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def client_key(token: str | None, address: str | None) -> str:
+        if token:
+            # Keyed by a digest so tokens are not kept in memory
+            return "token:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+        return f"addr:{address or 'unknown'}"
+
+    def check(self, key: str, per_minute: int, burst: int | None = None, cost: int = 1) -> None:
+        """Spend ``cost`` requests of ``key``'s budget; raises ``Overloaded`` when it is exhausted."""
+        if per_minute <= 0 or cost <= 0:
+            return
+        rate = per_minute / 60
+        capacity = float(max(1, burst if burst is not None else per_minute))
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= _MAX_BUCKETS:
+                    self._prune(rate, capacity)
+                bucket = self._buckets[key] = TokenBucket(capacity)
+            # A cost above the burst could never be paid: charge a full bucket instead
+            wait = bucket.take(rate, capacity, min(cost, capacity))
+        if wait > 0:
+            kind = key.split(":", 1)[0]
+            metrics.RATE_LIMITED.labels(kind).inc()
+            raise Overloaded(f"Rate limit exceeded ({per_minute}/min)", wait)
+
+    def _prune(self, rate: float, capacity: float) -> None:
+        now = time.monotonic()
+        for key, bucket in list(self._buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * rate >= capacity:
+                del self._buckets[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {"clients": len(self._buckets)}
+
+
+class AdmissionController:
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self.in_use = {"read": 0, "write": 0}
+        self.waiting = {"read": 0, "write": 0}
+        self.admitted = {"read": 0, "write": 0}
+        self.rejected = {"timeout": 0, "queue_full": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.query_max_concurrency > 0
+
+    def _free(self, kind: str) -> bool:
+        total = self.in_use["read"] + self.in_use["write"]
+        if kind == "write":
+            return total < settings.query_max_concurrency
+        # Reads keep the reserved slots free and let waiting writes go first
+        reserved = min(settings.query_write_reserved, settings.query_max_concurrency - 1)
+        return self.waiting["write"] == 0 and total < settings.query_max_concurrency - reserved
+
+    def acquire(self, kind: str = "read") -> None:
+        """Take a query slot of ``kind`` ("read" or "write"), waiting as configured."""
+        if not self.enabled:
+            return
+        started = time.perf_counter()
+        with self._cond:
+            if not self._free(kind):
+                if kind == "read" and self.waiting["read"] >= settings.query_max_queue:
+                    self.rejected["queue_full"] += 1
+                    metrics.QUERY_REJECTED.labels("queue_full").inc()
+                    raise Overloaded("Too many queued queries", settings.query_queue_timeout or 1)
+                deadline = started + settings.query_queue_timeout if kind == "read" else None
+                self.waiting[kind] += 1
+                try:
+                    while not self._free(kind):
+                        remaining = None if deadline is None else deadline - time.perf_counter()
+                        if remaining is not None and remaining <= 0:
+                            self.rejected["timeout"] += 1
+                            metrics.QUERY_REJECTED.labels("timeout").inc()
+                            raise Overloaded("Query capacity exhausted", settings.query_queue_timeout or 1)
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting[kind] -= 1
+            self.in_use[kind] += 1
+            self.admitted[kind] += 1
+        metrics.QUERY_ADMISSION_WAIT.labels(kind).observe(time.perf_counter() - started)
+
+    def release(self, kind: str = "read") -> None:
+        if not self.enabled:
+            return
+        with self._cond:
+            self.in_use[kind] = max(0, self.in_use[kind] - 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind: str = "read") -> Iterator[None]:
+        self.acquire(kind)
+        try:
+            yield
+        finally:
+            self.release(kind)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "max_concurrency": settings.query_max_concurrency,
+                "write_reserved": settings.query_write_reserved,
+                "in_use": dict(self.in_use),
+                "waiting": dict(self.waiting),
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+            }
+
+
+def admitted(kind: str = "read") -> Callable[[F], F]:
+    """Run the decorated function inside a query slot of ``kind``."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with admission.slot(kind):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+rate_limiter = RateLimiter()
+admission = AdmissionController()
+metrics.QUERY_SLOTS_IN_USE.set_function(lambda: sum(admission.in_use.values()))
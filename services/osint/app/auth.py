@@ -9,3 +9,15 @@ def require_token(x_api_token: str | None = Header(default=None)):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+
+
+def require_scrape_token(
+    x_api_token: str | None = Header(default=None),
+    authorization: str | None = Header(default=None),
+):
+    # Prometheus scrape_configs send the token as "Authorization: Bearer <token>"
+    if not x_api_token and authorization:
+        scheme, _, credentials = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            x_api_token = credentials.strip()
+    require_token(x_api_token)
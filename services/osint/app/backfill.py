@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from .config import settings
+from .config_loader import apply_init_config
+
+
+DEFAULT_MANIFEST_NAME = ".backfill_manifest.jsonl"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk ingest/upload BBOT scan directories (backfill)")
+    parser.add_argument("paths", nargs="*", help="Scan dirs or scan roots (default: all known BBOT scan roots)")
+    parser.add_argument("--mode", choices=["ingest", "upload"], help="ingest into local Neo4j or upload to central (default by deployment_role)")
+    parser.add_argument("--parallel", type=int, default=4, help="Number of scan dirs processed concurrently")
+    parser.add_argument("--manifest", help=f"Resumable manifest file (default: <first root>/{DEFAULT_MANIFEST_NAME})")
+    parser.add_argument("--force", action="store_true", help="Re-process dirs already recorded in the manifest")
+    parser.add_argument("--dry-run", action="store_true", help="Only list pending dirs and estimate size")
+    parser.add_argument("--domain", help="Default domain/target for the scans", default=None)
+    parser.add_argument("--url", help="Central API endpoint (upload mode)", default=None)
+    parser.add_argument("--worker-id", help="Worker identifier (upload mode)", default=None)
+    parser.add_argument("--worker-token", help="Worker secret token (upload mode)", default=None)
+    parser.add_argument("--no-gzip", action="store_true", help="Disable gzip compression (upload mode)")
+    parser.add_argument("--timeout", type=int, default=None, help="Request timeout in seconds (upload mode)")
+    return parser.parse_args()
+
+
+def discover_scan_dirs(paths: list[str] | None = None) -> list[Path]:
+    """Return scan dirs (containing output.json) under the given paths or the BBOT scan roots.
+
+    A path that holds an output.json is taken as a scan dir itself; any other directory is
+    treated as a root whose immediate children are scan dirs. Oldest dirs come first so a
+    rebuild replays history in order.
+    """
+    from .repository import list_scan_dirs
+
+    candidates: list[Path] = []
+    if paths:
+        for raw in paths:
+            p = Path(raw).expanduser()
+            if (p / "output.json").is_file():
+                candidates.append(p)
+            elif p.is_dir():
+                try:
+                    candidates.extend(d for d in p.iterdir() if d.is_dir())
+                except Exception as exc:
+                    logger.warning("Cannot list {}: {}", p, exc)
+            else:
+                logger.warning("Skipping {}: not a directory", p)
+    else:
+        candidates = list_scan_dirs()
+
+    found: list[tuple[Path, float]] = []
+    seen: set[str] = set()
+    for d in candidates:
+        output = d / "output.json"
+        key = str(d.resolve())
+        if key in seen or not output.is_file():
+            continue
+        seen.add(key)
+        try:
+            found.append((d, output.stat().st_mtime))
+        except Exception:
+            continue
+    found.sort(key=lambda x: x[1])
+    return [d for d, _ in found]
+
+
+def _fingerprint(scan_dir: Path) -> dict[str, Any]:
+    st = (scan_dir / "output.json").stat()
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def _dir_key(scan_dir: Path) -> str:
+    # Resolved, so a resume run may name the same roots relatively or through a symlink
+    return str(Path(scan_dir).resolve())
+
+
+class Manifest:
+    """Append-only JSONL record of completed scan dirs, keyed by resolved path + output.json fingerprint."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: dict[str, dict[str, Any]] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except Exception:
+                        continue
+                    if isinstance(entry, dict) and entry.get("dir"):
+                        self._done[_dir_key(Path(entry["dir"]))] = entry
+
+    def is_done(self, scan_dir: Path) -> bool:
+        entry = self._done.get(_dir_key(scan_dir))
+        if not entry:
+            return False
+        try:
+            fp = _fingerprint(scan_dir)
+        except Exception:
+            return False
+        return entry.get("size") == fp["size"] and entry.get("mtime") == fp["mtime"]
+
+    def record(self, scan_dir: Path, records: int) -> None:
+        entry = {"dir": _dir_key(scan_dir), **_fingerprint(scan_dir), "records": records, "ts": int(time.time())}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._done[entry["dir"]] = entry
+
+
+def _default_manifest_path(dirs: list[Path]) -> Path:
+    from .repository import _get_scan_roots
+
+    roots = _get_scan_roots()
+    if roots:
+        return roots[0] / DEFAULT_MANIFEST_NAME
+    if dirs:
+        return dirs[0].parent / DEFAULT_MANIFEST_NAME
+    return Path(DEFAULT_MANIFEST_NAME)
+
+
+def estimate_events(output_file: Path, sample_bytes: int = 65536) -> int:
+    """Estimate JSON lines in output.json from the average line length of its head."""
+    try:
+        size = output_file.stat().st_size
+        with output_file.open("rb") as f:
+            head = f.read(sample_bytes)
+    except Exception:
+        return 0
+    lines = head.count(b"\n")
+    if not head:
+        return 0
+    if len(head) >= size:
+        return lines if head.endswith(b"\n") else lines + 1
+    return int(size / (len(head) / max(lines, 1)))
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+def main() -> int:
+    args = parse_args()
+    apply_init_config()
+
+    role = (settings.deployment_role or "central").lower()
+    mode = args.mode or ("upload" if role == "worker" else "ingest")
+
+    dirs = discover_scan_dirs(args.paths)
+    manifest = Manifest(Path(args.manifest) if args.manifest else _default_manifest_path(dirs))
+    pending = dirs if args.force else [d for d in dirs if not manifest.is_done(d)]
+    skipped = len(dirs) - len(pending)
+    sizes = {d: (d / "output.json").stat().st_size for d in pending}
+    total_bytes = sum(sizes.values())
+
+    logger.info(
+        "Backfill mode={} dirs={} pending={} skipped={} size={} manifest={}",
+        mode, len(dirs), len(pending), skipped, _fmt_bytes(total_bytes), manifest.path,
+    )
+
+    if args.dry_run:
+        est_total = 0
+        for d in pending:
+            est = estimate_events(d / "output.json")
+            est_total += est
+            logger.info("  {} size={} ~events={}", d, _fmt_bytes(sizes[d]), est)
+        logger.info("Dry run: {} dirs, {} total, ~{} events", len(pending), _fmt_bytes(total_bytes), est_total)
+        return 0
+
+    if not pending:
+        logger.info("Nothing to backfill")
+        return 0
+
+    store = None
+    if mode == "upload":
+        from .worker_uploader import upload_scan_dir
+
+        upload_kwargs: dict[str, Any] = {
+            "url": args.url,
+            "worker_id": args.worker_id,
+            "worker_token": args.worker_token,
+            "compress": False if args.no_gzip else None,
+            "timeout": args.timeout,
+        }
+
+        def process(d: Path) -> int:
+            return upload_scan_dir(d, default_domain=args.domain, **upload_kwargs)
+    else:
+        from .repository import ensure_constraints, ingest_scan_dir
+        from .storage import get_store
+
+        # Connect once up front so worker threads share a single driver (or loaded snapshot)
+        store = get_store()
+        store.connect()
+        # Constraints before any MERGE: after a wipe, parallel MERGEs without them scan every
+        # node of the label and can race each other into duplicates
+        ensure_constraints()
+
+        def process(d: Path) -> int:
+            return ingest_scan_dir(str(d), default_domain=args.domain)
+
+    started = time.time()
+    done_bytes = 0
+    done_records = 0
+    failed: list[str] = []
+    parallel = max(1, args.parallel)
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="backfill") as pool:
+        futures = {pool.submit(process, d): d for d in pending}
+        for idx, fut in enumerate(as_completed(futures), start=1):
+            d = futures[fut]
+            try:
+                records = int(fut.result() or 0)
+            except Exception as exc:
+                failed.append(str(d))
+                logger.error("[{}/{}] {} failed: {}", idx, len(pending), d, exc)
+                continue
+            manifest.record(d, records)
+            done_bytes += sizes[d]
+            done_records += records
+            elapsed = max(time.time() - started, 1e-6)
+            logger.info(
+                "[{}/{}] {} records={} | {}/{} {}/s {:.0f} records/s",
+                idx, len(pending), d.name, records,
+                _fmt_bytes(done_bytes), _fmt_bytes(total_bytes), _fmt_bytes(done_bytes / elapsed), done_records / elapsed,
+            )
+
+    if store is not None:
+        store.close()
+    elapsed = time.time() - started
+    logger.info(
+        "Backfill finished in {:.1f}s: {} dirs ok, {} failed, {} records",
+        elapsed, len(pending) - len(failed), len(failed), done_records,
+    )
+    return 3 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,15 @@
-from typing import AsyncIterator, Iterator, Any, Dict
-from bbot.scanner import Scanner
+import copy
+import json
+from collections import OrderedDict
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, Any, Dict
 from .models import ScanRequest
 from .config import settings
 from loguru import logger
 
+# BBOT is imported lazily (first scan) so nodes that only ingest and query never load it
+if TYPE_CHECKING:
+    from bbot.scanner import Preset, Scanner
+
 ALLOWED_PRESETS = {
     # Common presets known to be available in BBOT
     "subdomain-enum",
@@ -20,7 +26,8 @@ ALLOWED_FLAGS = {
 }
 
 
-def build_scanner(req: ScanRequest) -> Scanner:
+def _scanner_kwargs(req: ScanRequest) -> Dict[str, Any]:
+    """Preset arguments (presets, flags, config) for a request; independent of its targets."""
     config = {
         "engine": {"max_workers": req.max_workers},
         "web": {
@@ -37,7 +44,7 @@ def build_scanner(req: ScanRequest) -> Scanner:
         config_modules = config.setdefault("modules", {})
         for mod, mod_cfg in settings.bbot_modules.items():
             try:
-                config_modules[mod] = mod_cfg
+                config_modules[mod] = copy.deepcopy(mod_cfg)
             except Exception:
                 pass
     if disabled:
@@ -66,13 +73,59 @@ def build_scanner(req: ScanRequest) -> Scanner:
         flags.append("allow-deadly")
     # Blacklist some heavy/ansible modules by passing flags if available
     # Note: BBOT CLI supports --skip-modules; as Python API, we filter presets instead by not enabling those presets
-    return Scanner(*req.targets, presets=presets, flags=flags, config=config)
+    return {"presets": presets, "flags": flags, "config": config}
+
+
+def scanner_cache_key(req: ScanRequest) -> str:
+    """Normalized request minus targets, plus the module config it is built with."""
+    fields = req.model_dump(exclude={"targets", "sleep_after_scan_seconds"})
+    fields["presets"] = sorted(set(fields.get("presets") or []))
+    fields["flags"] = sorted(set(fields.get("flags") or []))
+    fields["bbot_modules"] = settings.bbot_modules or {}
+    fields["bbot_disable_modules"] = sorted(settings.bbot_disable_modules or [])
+    return json.dumps(fields, sort_keys=True, default=str)
+
+
+# Prepared preset templates keyed by ``scanner_cache_key``; presets resolve once per config
+_preset_cache: "OrderedDict[str, Preset]" = OrderedDict()
+_PRESET_CACHE_SIZE = 16
+_preset_stats = {"hits": 0, "misses": 0}
+
+
+def preset_template(req: ScanRequest) -> "Preset":
+    from bbot.scanner import Preset
+
+    key = scanner_cache_key(req)
+    template = _preset_cache.get(key)
+    if template is not None:
+        _preset_cache.move_to_end(key)
+        _preset_stats["hits"] += 1
+        return template
+    _preset_stats["misses"] += 1
+    template = Preset(**_scanner_kwargs(req))
+    _preset_cache[key] = template
+    while len(_preset_cache) > _PRESET_CACHE_SIZE:
+        _preset_cache.popitem(last=False)
+    return template
+
+
+def build_scanner(req: ScanRequest) -> "Scanner":
+    from bbot.scanner import Scanner
+
+    try:
+        template = preset_template(req)
+    except Exception as exc:
+        logger.warning(f"Preset template build failed ({exc}); building scanner from scratch")
+        return Scanner(*req.targets, **_scanner_kwargs(req))
+    # Scanner merges the template into a fresh per-target preset; the template itself is not modified
+    return Scanner(*req.targets, preset=template)
 
 
 def _event_to_dict(obj: Any) -> Dict[str, Any]:
     if isinstance(obj, dict):
         return obj
-    for attr in ("asdict", "to_dict"):
+    # BBOT events serialize via .json() to the same shape as output.json lines
+    for attr in ("json", "asdict", "to_dict"):
         fn = getattr(obj, attr, None)
         if callable(fn):
             try:
@@ -96,6 +149,12 @@ def start_scan(req: ScanRequest) -> Iterator[dict]:
 
 
 async def async_start_scan(req: ScanRequest) -> AsyncIterator[dict]:
+    if (settings.scan_backend or "").lower() == "process":
+        from .scan_process import async_start_scan_process
+
+        async for ev in async_start_scan_process(req):
+            yield ev
+        return
     scan = build_scanner(req)
     async for event in scan.async_start():
         yield _event_to_dict(event)
@@ -10,6 +10,38 @@ class Settings(BaseModel):
     neo4j_port: int = int(os.getenv("NEO4J_PORT", "7687"))
     neo4j_username: str = os.getenv("NEO4J_USERNAME", "neo4j")
     neo4j_password: str = os.getenv("NEO4J_PASSWORD", "password")
+    # Connection attempts per candidate host (1s apart), and how long a request waits
+    # for a connection that another thread is still establishing
+    neo4j_connect_attempts: int = int(os.getenv("NEO4J_CONNECT_ATTEMPTS", "120"))
+    neo4j_wait_seconds: float = float(os.getenv("NEO4J_WAIT_SECONDS", "5"))
+    # Driver pool / transactions (use NEO4J_SCHEME=neo4j for cluster routing)
+    neo4j_database: str | None = os.getenv("NEO4J_DATABASE")
+    neo4j_pool_size: int = int(os.getenv("NEO4J_POOL_SIZE", "100"))
+    neo4j_acquisition_timeout: float = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+    neo4j_connection_timeout: float = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "30"))
+    neo4j_fetch_size: int = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+    neo4j_tx_timeout: float = float(os.getenv("NEO4J_TX_TIMEOUT", "0"))
+    neo4j_max_retry_time: float = float(os.getenv("NEO4J_MAX_RETRY_TIME", "30"))
+    # Circuit breaker: open after N consecutive connectivity failures, probe again after reset
+    neo4j_breaker_threshold: int = int(os.getenv("NEO4J_BREAKER_THRESHOLD", "5"))
+    neo4j_breaker_reset_seconds: float = float(os.getenv("NEO4J_BREAKER_RESET_SECONDS", "30"))
+    # Slow-query log: statements slower than this (client or server time) are logged; 0 disables
+    slow_query_ms: int = int(os.getenv("SLOW_QUERY_MS", "1000"))
+    slow_query_log_size: int = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+    # Event-loop lag sampling period (/debug/loop-lag, osint_event_loop_lag_seconds); 0 disables
+    loop_lag_interval_ms: int = int(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+
+    # Streamed /mcp/invoke (SSE): rows per "rows" frame, and idle seconds between keepalive comments
+    mcp_stream_chunk_rows: int = max(1, int(os.getenv("MCP_STREAM_CHUNK_ROWS", "100")))
+    mcp_stream_keepalive_seconds: float = float(os.getenv("MCP_STREAM_KEEPALIVE_SECONDS", "15"))
+    # POST /mcp/invoke/batch: calls per request, and how many run at once
+    mcp_batch_max_calls: int = int(os.getenv("MCP_BATCH_MAX_CALLS", "20"))
+    mcp_batch_concurrency: int = max(1, int(os.getenv("MCP_BATCH_CONCURRENCY", "4")))
+
+    # Graph storage: "neo4j" or "memory" (in-process, for benchmarks and small single-node setups;
+    # snapshotted to MEMORY_STORE_PATH on shutdown when set)
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "neo4j")
+    memory_store_path: str | None = os.getenv("MEMORY_STORE_PATH")
 
     # Uvicorn TLS (optional; recommended to terminate TLS at reverse proxy)
     ssl_certfile: str | None = os.getenv("SSL_CERTFILE")
@@ -18,8 +50,16 @@ class Settings(BaseModel):
     # Public base URL (optional)
     public_base_url: str | None = os.getenv("PUBLIC_BASE_URL")
 
-    # App security
+    # App security: token buckets per API token and per worker id (0 disables)
     rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "120"))
+    rate_limit_burst: int = int(os.getenv("RATE_LIMIT_BURST", "30"))
+    worker_rate_limit_per_minute: int = int(os.getenv("WORKER_RATE_LIMIT_PER_MINUTE", "600"))
+    # Query admission: slots shared by API/MCP reads and ingest writes (0 disables), slots only
+    # writes may use, and how long / how many reads may queue before a 429
+    query_max_concurrency: int = int(os.getenv("QUERY_MAX_CONCURRENCY", "16"))
+    query_write_reserved: int = int(os.getenv("QUERY_WRITE_RESERVED", "4"))
+    query_queue_timeout: float = float(os.getenv("QUERY_QUEUE_TIMEOUT", "5"))
+    query_max_queue: int = int(os.getenv("QUERY_MAX_QUEUE", "64"))
     max_concurrent_scans: int = int(os.getenv("MAX_CONCURRENT_SCANS", "2"))
 
     # Cleanup policy
@@ -27,6 +67,42 @@ class Settings(BaseModel):
     event_retention_days: int = int(os.getenv("EVENT_RETENTION_DAYS", "30"))
     offline_host_retention_days: int = int(os.getenv("OFFLINE_HOST_RETENTION_DAYS", "30"))
     orphan_cleanup_enabled: bool = os.getenv("ORPHAN_CLEANUP_ENABLED", "true").lower() == "true"
+    # Nodes deleted per retention transaction (each pass runs until nothing expired is left)
+    retention_batch_size: int = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+    # Fold expiring events into per (domain, type, module, day) EventRollup nodes before deleting them
+    event_rollup_enabled: bool = os.getenv("EVENT_ROLLUP_ENABLED", "true").lower() == "true"
+    rollup_retention_days: int = int(os.getenv("ROLLUP_RETENTION_DAYS", "0"))  # 0 = keep forever
+
+    # Importer batching (overridable via init_config.json "ingest" block)
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+    ingest_cache_size: int = int(os.getenv("INGEST_CACHE_SIZE", "200000"))
+    ingest_cache_warm: bool = os.getenv("INGEST_CACHE_WARM", "false").lower() == "true"
+    ingest_writers: int = int(os.getenv("INGEST_WRITERS", "1"))
+    ingest_parse_processes: int = int(os.getenv("INGEST_PARSE_PROCESSES", "1"))
+    ingest_parse_min_bytes: int = int(os.getenv("INGEST_PARSE_MIN_BYTES", str(16 * 1024 * 1024)))
+    # Live ingest from the scan event stream (central role only)
+    live_ingest_enabled: bool = os.getenv("LIVE_INGEST_ENABLED", "false").lower() == "true"
+    live_ingest_queue_size: int = int(os.getenv("LIVE_INGEST_QUEUE_SIZE", "2000"))
+    live_ingest_flush_seconds: float = float(os.getenv("LIVE_INGEST_FLUSH_SECONDS", "1.0"))
+    live_ingest_reconcile: bool = os.getenv("LIVE_INGEST_RECONCILE", "false").lower() == "true"
+
+    # Scan execution backend: "inprocess" (scanner in the API event loop) or "process"
+    # (isolated child process with rlimits and a wall-clock timeout; 0 disables a limit)
+    scan_backend: str = os.getenv("SCAN_BACKEND", "inprocess")
+    scan_timeout_seconds: int = int(os.getenv("SCAN_TIMEOUT_SECONDS", "0"))
+    scan_cpu_seconds: int = int(os.getenv("SCAN_CPU_SECONDS", "0"))
+    scan_memory_mb: int = int(os.getenv("SCAN_MEMORY_MB", "0"))
+    scan_prewarm: int = int(os.getenv("SCAN_PREWARM", "0"))
+
+    # Scan directory index (SQLite); defaults to ~/.bbot/scans/.scan_index.sqlite3
+    scan_index_path: str | None = os.getenv("SCAN_INDEX_PATH")
+
+    # Pipeline tracing (scan -> upload -> ingest); exporter "file" (JSON lines) or "otlp" (HTTP/JSON)
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "file")
+    tracing_file: str = os.getenv("TRACING_FILE", os.path.expanduser("~/.bbot/traces/spans.jsonl"))
+    tracing_otlp_endpoint: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318")
+    tracing_service_name: str = os.getenv("TRACING_SERVICE_NAME", "bbot-osint")
 
     # Telegram notifications
     telegram_bot_token: str | None = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -42,6 +42,98 @@ def apply_init_config():
     if isinstance(bbot_disable, list):
         settings.bbot_disable_modules = [str(m) for m in bbot_disable]
 
+    # Importer tuning
+    ingest_cfg = cfg.get("ingest")
+    if isinstance(ingest_cfg, dict):
+        batch_size = ingest_cfg.get("batch_size")
+        if isinstance(batch_size, int) and batch_size > 0:
+            settings.ingest_batch_size = batch_size
+        cache_size = ingest_cfg.get("cache_size")
+        if isinstance(cache_size, int) and cache_size >= 0:
+            settings.ingest_cache_size = cache_size
+        warm_cache = ingest_cfg.get("warm_cache")
+        if isinstance(warm_cache, bool):
+            settings.ingest_cache_warm = warm_cache
+        writers = ingest_cfg.get("writers")
+        if isinstance(writers, int) and writers > 0:
+            settings.ingest_writers = writers
+        parse_processes = ingest_cfg.get("parse_processes")
+        if isinstance(parse_processes, int) and parse_processes > 0:
+            settings.ingest_parse_processes = parse_processes
+        parse_min_bytes = ingest_cfg.get("parse_min_bytes")
+        if isinstance(parse_min_bytes, int) and parse_min_bytes >= 0:
+            settings.ingest_parse_min_bytes = parse_min_bytes
+        live = ingest_cfg.get("live")
+        if isinstance(live, bool):
+            settings.live_ingest_enabled = live
+        live_queue_size = ingest_cfg.get("live_queue_size")
+        if isinstance(live_queue_size, int) and live_queue_size > 0:
+            settings.live_ingest_queue_size = live_queue_size
+        live_reconcile = ingest_cfg.get("live_reconcile")
+        if isinstance(live_reconcile, bool):
+            settings.live_ingest_reconcile = live_reconcile
+
+    # Graph storage backend
+    storage_cfg = cfg.get("storage")
+    if isinstance(storage_cfg, dict):
+        backend = storage_cfg.get("backend")
+        if isinstance(backend, str) and backend.strip().lower() in ("neo4j", "memory"):
+            settings.storage_backend = backend.strip().lower()
+        path = storage_cfg.get("memory_path")
+        if isinstance(path, str) and path.strip():
+            settings.memory_store_path = path.strip()
+
+    # Scan execution backend and limits
+    runner_cfg = cfg.get("scan_runner")
+    if isinstance(runner_cfg, dict):
+        backend = runner_cfg.get("backend")
+        if isinstance(backend, str) and backend.strip().lower() in ("inprocess", "process"):
+            settings.scan_backend = backend.strip().lower()
+        for key, attr in (
+            ("timeout_seconds", "scan_timeout_seconds"),
+            ("cpu_seconds", "scan_cpu_seconds"),
+            ("memory_mb", "scan_memory_mb"),
+            ("max_concurrent", "max_concurrent_scans"),
+            ("prewarm", "scan_prewarm"),
+        ):
+            value = runner_cfg.get(key)
+            if isinstance(value, int) and value >= 0:
+                setattr(settings, attr, value)
+
+    # Rate limits and query admission control
+    limits_cfg = cfg.get("limits")
+    if isinstance(limits_cfg, dict):
+        for key, attr in (
+            ("rate_limit_per_minute", "rate_limit_per_minute"),
+            ("rate_limit_burst", "rate_limit_burst"),
+            ("worker_rate_limit_per_minute", "worker_rate_limit_per_minute"),
+            ("query_max_concurrency", "query_max_concurrency"),
+            ("query_write_reserved", "query_write_reserved"),
+            ("query_max_queue", "query_max_queue"),
+        ):
+            value = limits_cfg.get(key)
+            if isinstance(value, int) and value >= 0:
+                setattr(settings, attr, value)
+        timeout = limits_cfg.get("query_queue_timeout")
+        if isinstance(timeout, (int, float)) and timeout >= 0:
+            settings.query_queue_timeout = float(timeout)
+
+    tracing_cfg = cfg.get("tracing")
+    if isinstance(tracing_cfg, dict):
+        if isinstance(tracing_cfg.get("enabled"), bool):
+            settings.tracing_enabled = tracing_cfg["enabled"]
+        exporter = tracing_cfg.get("exporter")
+        if isinstance(exporter, str) and exporter.strip().lower() in ("none", "file", "otlp"):
+            settings.tracing_exporter = exporter.strip().lower()
+        for key, attr in (
+            ("file", "tracing_file"),
+            ("otlp_endpoint", "tracing_otlp_endpoint"),
+            ("service_name", "tracing_service_name"),
+        ):
+            value = tracing_cfg.get(key)
+            if isinstance(value, str) and value.strip():
+                setattr(settings, attr, value.strip())
+
     # Worker tokens for distributed ingest
     load_worker_tokens_from_config(cfg.get("workers"))
 
@@ -0,0 +1,111 @@
+"""Multi-core parse stage for large output.json files.
+
+The file is split into line-aligned byte ranges (via mmap) that reader processes parse and
+map into compact ``MappedEvent`` tuples. Results are yielded back in file order, so the single
+writer stage downstream can still carry SCAN seed context (``resolve_seeds``) across chunk
+boundaries. Kept free of app imports beyond ``output_mapping`` so spawned readers start fast.
+"""
+
+from __future__ import annotations
+
+import json
+import marshal
+import mmap
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from .output_mapping import MappedEvent, NodeRow, RelRow, iter_output_file, map_output_event
+
+
+def _pack(rows: list[MappedEvent]) -> bytes:
+    # marshal of plain tuples is several times cheaper to move between processes than pickle
+    return marshal.dumps([
+        (m.etype, m.evid, tuple(tuple(n) for n in m.nodes), tuple(tuple(r) for r in m.rels), m.seeds, m.seed_links)
+        for m in rows
+    ])
+
+
+def _unpack(blob: bytes) -> list[MappedEvent]:
+    return [
+        MappedEvent(etype, evid, tuple(NodeRow._make(n) for n in nodes), tuple(RelRow._make(r) for r in rels), seeds, seed_links)
+        for etype, evid, nodes, rels, seeds, seed_links in marshal.loads(blob)
+    ]
+
+
+def split_line_ranges(file_path: str | Path, parts: int, min_chunk: int = 1 << 20) -> list[tuple[int, int]]:
+    """Split a file into ~``parts`` byte ranges that each end on a newline."""
+    p = Path(file_path)
+    size = p.stat().st_size
+    if size == 0:
+        return []
+    step = max(min_chunk, size // max(1, parts))
+    ranges: list[tuple[int, int]] = []
+    with p.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = min(size, start + step)
+            if end < size:
+                nl = mm.find(b"\n", end - 1)
+                end = size if nl == -1 else nl + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def map_range(file_path: str, start: int, end: int) -> tuple[bytes, bool]:
+    """Parse and map the JSON lines in ``[start, end)`` into packed rows.
+
+    Also reports whether any line parsed as JSON (for the whole-file fallback).
+    """
+    rows: list[MappedEvent] = []
+    parsed_any_line = False
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunk = mm[start:end]
+    for raw in chunk.split(b"\n"):
+        raw = raw.strip()
+        if not raw or not raw.startswith(b"{"):
+            continue
+        line = raw.decode("utf-8", "ignore")
+        try:
+            ev = json.loads(line)
+        except Exception:
+            continue
+        if not isinstance(ev, dict):
+            continue
+        parsed_any_line = True
+        mapped = map_output_event(ev, line)
+        if mapped is not None:
+            rows.append(mapped)
+    return _pack(rows), parsed_any_line
+
+
+def iter_output_file_parallel(file_path: str | Path, processes: int, chunks_per_process: int = 4) -> Iterator[MappedEvent]:
+    """Like ``output_mapping.iter_output_file`` but parsed by a process pool, in file order."""
+    p = Path(file_path)
+    ranges = split_line_ranges(p, processes * chunks_per_process)
+    if not ranges:
+        return
+    parsed_any_line = False
+    # Bounded window of in-flight chunks keeps memory flat when the writer is the bottleneck
+    window = processes * 2
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx) as pool:
+        pending: deque[Future] = deque()
+        todo = iter(ranges)
+        for start, end in todo:
+            pending.append(pool.submit(map_range, str(p), start, end))
+            if len(pending) >= window:
+                break
+        while pending:
+            blob, any_line = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(pool.submit(map_range, str(p), *nxt))
+            parsed_any_line = parsed_any_line or any_line
+            yield from _unpack(blob)
+    if not parsed_any_line:
+        # Not JSON lines: defer to the whole-file JSON fallback of the serial reader
+        yield from iter_output_file(p)
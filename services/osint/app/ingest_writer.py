@@ -0,0 +1,276 @@
+"""Batched graph writer for mapped output.json events.
+
+Rows from ``output_mapping`` are buffered and flushed to the storage backend once per batch
+(for Neo4j: one write transaction of grouped ``UNWIND ... MERGE`` statements). Repeated keys
+inside a batch collapse into a single row, and an ``EntityKeyCache`` of keys committed
+earlier in the same import lets bare entity MERGEs (Host, IP, Domain, ...) and relationship
+MERGEs be skipped entirely.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+from loguru import logger
+
+from .admission import admission
+from .config import settings
+from .metrics import record_ingested
+from . import tracing
+from .output_mapping import NODE_KEYS, MappedEvent, NodeRow, RelRow
+from .storage import get_store
+
+
+class EntityKeyCache:
+    """Bounded LRU set of node/relationship keys already committed to the graph."""
+
+    def __init__(self, max_size: int | None = None) -> None:
+        self.max_size = max(0, settings.ingest_cache_size if max_size is None else max_size)
+        self._keys: OrderedDict[Hashable, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def contains(self, key: Hashable) -> bool:
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add_many(self, keys: Iterable[Hashable]) -> None:
+        if not self.max_size:
+            return
+        with self._lock:
+            for key in keys:
+                self._keys[key] = None
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def warm_from_graph(self, labels: Iterable[str] = ("Domain", "Host", "IP", "ASN"), limit: int | None = None) -> int:
+        """Preload existing entity keys so the first batches can already skip MERGEs."""
+        per_label = limit if limit is not None else max(1, self.max_size // 4)
+        store = get_store()
+        loaded = 0
+        for label in labels:
+            keys = [("N", label, k) for k in store.node_keys(label, NODE_KEYS[label], per_label)]
+            self.add_many(keys)
+            loaded += len(keys)
+        return loaded
+
+
+class BatchWriter:
+    """Buffer mapped events and write them in batches, skipping keys the cache has seen."""
+
+    def __init__(self, batch_size: int | None = None, cache: EntityKeyCache | None = None) -> None:
+        self.batch_size = max(1, batch_size or settings.ingest_batch_size)
+        self.cache = cache if cache is not None else EntityKeyCache()
+        self._pending: list[MappedEvent] = []
+        self.events = 0
+        self.batches = 0
+        self.skipped_nodes = 0
+        self.skipped_rels = 0
+        self.retries = 0
+        self.flush_seconds = 0.0
+
+    def add(self, mapped: MappedEvent) -> None:
+        self._pending.append(mapped)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def collapse(self, events: list[MappedEvent]) -> tuple[list[NodeRow], list[RelRow], list[Hashable]]:
+        """Collapse a batch into unique node/relationship rows not yet cached; returns them with the keys they commit."""
+        nodes: dict[tuple[str, Any], NodeRow] = {}
+        rels: dict[RelRow, None] = {}
+        for mapped in events:
+            for node in mapped.nodes:
+                nk = (node.label, node.key)
+                prev = nodes.get(nk)
+                if prev is None:
+                    nodes[nk] = node
+                    continue
+                # Later SETs win for properties; tags accumulate like apoc.coll.toSet
+                props = {**(prev.props or {}), **(node.props or {})} if (prev.props or node.props) else None
+                tags = prev.tags if node.tags is None else tuple(dict.fromkeys((prev.tags or ()) + node.tags))
+                nodes[nk] = prev._replace(props=props, tags=tags)
+            for rel in mapped.rels:
+                rels[rel] = None
+
+        node_rows: list[NodeRow] = []
+        committed: list[Hashable] = []
+        for (label, key), node in nodes.items():
+            cache_key = ("N", label, key)
+            # Nodes with nothing to SET (no props, no new tags) are pure MERGEs and skippable
+            bare = node.props is None and not node.tags
+            if bare and self.cache.contains(cache_key):
+                self.skipped_nodes += 1
+                continue
+            node_rows.append(node)
+            committed.append(cache_key)
+
+        rel_rows: list[RelRow] = []
+        for rel in rels:
+            cache_key = ("R",) + tuple(rel)
+            if self.cache.contains(cache_key):
+                self.skipped_rels += 1
+                continue
+            rel_rows.append(rel)
+            committed.append(cache_key)
+        return node_rows, rel_rows, committed
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        events, self._pending = self._pending, []
+        started = time.perf_counter()
+        with tracing.span("batch_write", events=len(events)) as span:
+            nodes, rels, committed = self.collapse(events)
+            if nodes or rels:
+                with admission.slot("write"):
+                    attempts = get_store().write_rows(nodes, rels)
+                self.retries += max(0, attempts - 1)
+                span.set("rows", len(nodes) + len(rels))
+                span.set("attempts", attempts)
+        # Only cache keys once their transaction has committed
+        self.cache.add_many(committed)
+        elapsed = time.perf_counter() - started
+        self.flush_seconds += elapsed
+        record_ingested((mapped.etype for mapped in events), elapsed)
+        self.events += len(events)
+        self.batches += 1
+
+    def close(self) -> None:
+        self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "events": self.events,
+            "batches": self.batches,
+            "skipped_nodes": self.skipped_nodes,
+            "skipped_rels": self.skipped_rels,
+            "retries": self.retries,
+            "cache_hit_rate": round(self.cache.hit_rate, 4),
+            "flush_seconds": round(self.flush_seconds, 3),
+        }
+
+
+def dominant_key(mapped: MappedEvent) -> str:
+    """Partition key of an event: its Host when present, else its main entity, else the event id."""
+    for node in mapped.nodes:
+        if node.label == "Host":
+            return f"Host:{node.key}"
+    if len(mapped.nodes) > 1:
+        main = mapped.nodes[1]
+        return f"{main.label}:{main.key}"
+    return f"EVENT:{mapped.evid}"
+
+
+class ParallelWriter:
+    """N concurrent BatchWriters, each fed the events whose dominant key hashes to it.
+
+    MERGEs on the same Host (or main entity) always land on the same writer and therefore
+    serialize, while unrelated keys are written in parallel transactions. Keys shared across
+    partitions (seed Domains, resolved IPs) are absorbed by the shared key cache after their
+    first commit; remaining deadlocks are retried by the driver's managed transactions.
+    """
+
+    def __init__(self, writers: int, batch_size: int | None = None, cache: EntityKeyCache | None = None) -> None:
+        self.cache = cache if cache is not None else EntityKeyCache()
+        self._writers = [BatchWriter(batch_size, self.cache) for _ in range(max(1, writers))]
+        depth = self._writers[0].batch_size * 2
+        self._queues: list[queue.Queue] = [queue.Queue(maxsize=depth) for _ in self._writers]
+        self._errors: list[BaseException] = []
+        self._threads = [
+            # Copy the caller's context so per-request settings (e.g. PROFILE capture) apply
+            threading.Thread(
+                target=contextvars.copy_context().run, args=(self._drain, i), name=f"ingest-writer-{i}", daemon=True
+            )
+            for i in range(len(self._writers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _drain(self, idx: int) -> None:
+        writer = self._writers[idx]
+        q = self._queues[idx]
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            if self._errors:
+                continue  # keep draining so producers never block on a failed import
+            try:
+                writer.add(item)
+            except BaseException as exc:
+                self._errors.append(exc)
+        if not self._errors:
+            try:
+                writer.close()
+            except BaseException as exc:
+                self._errors.append(exc)
+
+    @property
+    def events(self) -> int:
+        return sum(w.events for w in self._writers)
+
+    def add(self, mapped: MappedEvent) -> None:
+        if self._errors:
+            raise self._errors[0]
+        idx = zlib.crc32(dominant_key(mapped).encode("utf-8", "ignore")) % len(self._writers)
+        self._queues[idx].put(mapped)
+
+    def close(self) -> None:
+        for q in self._queues:
+            q.put(None)
+        for t in self._threads:
+            t.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def stats(self) -> dict[str, Any]:
+        per_writer = [w.stats() for w in self._writers]
+        merged: dict[str, Any] = {
+            key: sum(s[key] for s in per_writer)
+            for key in ("events", "batches", "skipped_nodes", "skipped_rels", "retries")
+        }
+        merged["cache_hit_rate"] = round(self.cache.hit_rate, 4)
+        merged["flush_seconds"] = round(max(s["flush_seconds"] for s in per_writer), 3)
+        merged["writers"] = len(per_writer)
+        merged["events_per_writer"] = [s["events"] for s in per_writer]
+        return merged
+
+
+def new_writer(cache: EntityKeyCache | None = None) -> BatchWriter | ParallelWriter:
+    """Writer for one import: parallel when ``ingest.writers`` > 1, else a single BatchWriter."""
+    if settings.ingest_writers > 1:
+        return ParallelWriter(settings.ingest_writers, cache=cache)
+    return BatchWriter(cache=cache)
+
+
+def new_import_cache() -> EntityKeyCache:
+    """Cache for one import run, optionally warmed from the graph (``ingest.warm_cache``)."""
+    cache = EntityKeyCache()
+    if settings.ingest_cache_warm and cache.max_size:
+        try:
+            loaded = cache.warm_from_graph()
+            logger.debug("Warmed ingest key cache with {} keys", loaded)
+        except Exception as exc:
+            logger.warning("Failed to warm ingest key cache: {}", exc)
+    return cache
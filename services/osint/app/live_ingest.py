@@ -0,0 +1,128 @@
+"""Live ingest of scan events straight from the BBOT event stream.
+
+Events are pushed into a bounded asyncio queue while the scan runs; a consumer task maps them
+with the output.json mapping and writes them through a ``BatchWriter`` in a worker thread.
+A full queue blocks the producer, which stalls BBOT's event iterator: the scan slows down
+instead of events being dropped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from loguru import logger
+
+from .config import settings
+from .ingest_writer import BatchWriter, new_import_cache
+from .output_mapping import MappedEvent, expand_seed_links, map_output_event
+
+
+class LiveIngestor:
+    def __init__(self, queue_size: int | None = None, flush_seconds: float | None = None) -> None:
+        self.queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(
+            maxsize=max(1, queue_size or settings.live_ingest_queue_size)
+        )
+        self.flush_seconds = flush_seconds if flush_seconds is not None else settings.live_ingest_flush_seconds
+        self.writer: BatchWriter | None = None
+        self.failed = False
+        self.received = 0
+        self.unmapped = 0
+        self._seeds: list[str] = []
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self.writer = BatchWriter(cache=await asyncio.to_thread(new_import_cache))
+        self._task = asyncio.create_task(self._consume())
+
+    async def put(self, event: dict[str, Any]) -> None:
+        """Enqueue one output.json-style event; waits while the queue is full (backpressure)."""
+        self.received += 1
+        await self._offer(event)
+
+    async def close(self) -> dict[str, Any]:
+        """Drain the queue, flush the writer and return its stats."""
+        if self._task is None:
+            return {}
+        await self._offer(None)
+        try:
+            await self._task
+        except Exception as exc:
+            self.failed = True
+            logger.error("Live ingest consumer failed, falling back to file import: {}", exc)
+        self._task = None
+        stats = self.writer.stats() if self.writer else {}
+        stats["received"] = self.received
+        stats["unmapped"] = self.unmapped
+        stats["failed"] = self.failed
+        return stats
+
+    async def _offer(self, item: dict[str, Any] | None) -> None:
+        if not self.queue.full():
+            self.queue.put_nowait(item)
+            return
+        # Wait for room, but not on a consumer that has died: nothing would ever free it
+        task = self._task
+        if task is None or task.done():
+            self.failed = True
+            return
+        putter = asyncio.ensure_future(self.queue.put(item))
+        await asyncio.wait({putter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if not putter.done():
+            putter.cancel()
+            self.failed = True
+
+    def _map(self, ev: dict[str, Any]) -> MappedEvent | None:
+        mapped = map_output_event(ev)
+        if mapped is None:
+            return None
+        if mapped.seeds is not None:
+            self._seeds = list(mapped.seeds)
+        return expand_seed_links(mapped, self._seeds)
+
+    def _write(self, batch: list[MappedEvent]) -> None:
+        assert self.writer is not None
+        for mapped in batch:
+            self.writer.add(mapped)
+        self.writer.flush()
+
+    async def _consume(self) -> None:
+        assert self.writer is not None
+        batch_size = self.writer.batch_size
+        done = False
+        while not done:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch: list[MappedEvent] = []
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                try:
+                    mapped = self._map(item)
+                except Exception as exc:
+                    # One malformed event must not stop the consumer (and with it the scan)
+                    self.unmapped += 1
+                    logger.warning("Live ingest skipped an event it could not map: {}", exc)
+                    mapped = None
+                if mapped is not None:
+                    batch.append(mapped)
+                if len(batch) >= batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self.queue.get(), remaining)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    done = True
+                    break
+            if not batch or self.failed:
+                # After a write failure keep draining so the scan is never blocked;
+                # the scan dir is reconciled by the file importer instead.
+                continue
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as exc:
+                self.failed = True
+                logger.error("Live ingest write failed, falling back to file import: {}", exc)
@@ -0,0 +1,76 @@
+"""Event-loop lag sampler.
+
+A task sleeps ``loop_lag_interval_ms`` at a time and records how late it wakes up. The lag is
+time the loop spent on something else: a sync Neo4j call inside an ``async def`` handler, a
+large JSON encode, a CPU-heavy ingest step. Samples go to the Prometheus histogram and to a
+bounded in-memory window read by ``/debug/loop-lag`` (and by ``benchmarks.load_test``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any
+
+from .config import settings
+from .metrics import EVENT_LOOP_LAG
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+class LoopLagMonitor:
+    def __init__(self, window: int = 36000) -> None:
+        # (wall time, lag seconds); 36000 samples = one hour at the default 100 ms interval
+        self.samples: deque[tuple[float, float]] = deque(maxlen=window)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def interval(self) -> float:
+        return max(0, settings.loop_lag_interval_ms) / 1000
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        interval = self.interval
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - started - interval)
+            self.samples.append((time.time(), lag))
+            EVENT_LOOP_LAG.observe(lag)
+
+    def summary(self, since: float | None = None) -> dict[str, Any]:
+        """Lag percentiles (ms) over the samples taken after ``since`` (epoch seconds)."""
+        lags = sorted(lag for ts, lag in list(self.samples) if since is None or ts >= since)
+        out: dict[str, Any] = {
+            "running": self.running,
+            "interval_ms": settings.loop_lag_interval_ms,
+            "samples": len(lags),
+        }
+        if lags:
+            out.update({
+                "p50_ms": round(_percentile(lags, 50) * 1000, 2),
+                "p99_ms": round(_percentile(lags, 99) * 1000, 2),
+                "max_ms": round(lags[-1] * 1000, 2),
+                # Share of wall time the loop was late (blocked) over the window
+                "blocked_ratio": round(sum(lags) / max(1e-9, sum(lags) + len(lags) * self.interval), 4),
+            })
+        return out
+
+
+loop_monitor = LoopLagMonitor()
@@ -1,26 +1,96 @@
+import asyncio
 import base64
 import gzip
+import time
 
 from fastapi import FastAPI, Depends, Request, Header, HTTPException
-from fastapi.responses import ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response
+from neo4j.exceptions import ServiceUnavailable
 from loguru import logger
 
-from .auth import require_token
-from .models import QueryRequest, EventsQueryRequest, OutputIngestRequest
+from .admission import Overloaded, admission, rate_limiter
+from .auth import require_scrape_token, require_token
+from .models import QueryRequest, EventsQueryRequest, EventRollupQueryRequest, OutputIngestRequest
 from .repository import (
     query_subdomains,
     ensure_constraints,
     query_events,
+    query_event_rollups,
     ingest_output_json_bytes,
 )
 from .config import settings
+from . import metrics, shaping, tracing
+from .neo4j_client import neo4j_client
 from .config_loader import apply_init_config
+from .loop_monitor import loop_monitor
+from .scan_index import scan_index
+from .scan_process import close_warm_pool, start_warm_pool
+from .scan_watcher import scan_dir_watcher
 from .scheduler import scanner
+from .storage import UnsupportedByBackend, get_store
 from mcp_server.server import get_app as get_mcp_app
 
 app = FastAPI(title="BBOT OSINT Monitoring API", default_response_class=ORJSONResponse)
 
 
+@app.exception_handler(ServiceUnavailable)
+async def _neo4j_unavailable(request: Request, exc: ServiceUnavailable):
+    # Database down (or circuit breaker open): tell clients when to retry instead of a 500
+    retry_after = max(1, int(neo4j_client.breaker.retry_after()) or int(settings.neo4j_breaker_reset_seconds))
+    return ORJSONResponse(
+        {"detail": "Neo4j unavailable", "error": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def _overloaded_response(exc: Overloaded) -> ORJSONResponse:
+    return ORJSONResponse({"detail": exc.detail}, status_code=429, headers={"Retry-After": exc.retry_after_header})
+
+
+@app.exception_handler(Overloaded)
+async def _overloaded(request: Request, exc: Overloaded):
+    return _overloaded_response(exc)
+
+
+def _worker_authorized(worker_id: str | None, worker_token: str | None) -> bool:
+    tokens = settings.worker_tokens or {}
+    return bool(worker_id and worker_token and tokens.get(worker_id) == worker_token)
+
+
+# Probes and scrapes stay reachable while a client is being throttled
+_RATE_LIMIT_EXEMPT = {"/readyz", "/healthz", "/metrics", "/mcp/healthz"}
+
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    path = request.url.path
+    try:
+        address = request.client.host if request.client else None
+        if path.startswith("/ingest/"):
+            # Authenticated workers are charged their own budget by require_worker; anything
+            # else must not be able to spend it, so it counts against its address
+            if not _worker_authorized(request.headers.get("X-Worker-Id"), request.headers.get("X-Worker-Token")):
+                rate_limiter.check(rate_limiter.client_key(None, address), settings.rate_limit_per_minute, settings.rate_limit_burst)
+        elif path not in _RATE_LIMIT_EXEMPT:
+            key = rate_limiter.client_key(request.headers.get("X-API-Token"), address)
+            rate_limiter.check(key, settings.rate_limit_per_minute, settings.rate_limit_burst)
+    except Overloaded as exc:
+        return _overloaded_response(exc)
+    return await call_next(request)
+
+
+@app.exception_handler(shaping.CursorError)
+async def _bad_cursor(request: Request, exc: shaping.CursorError):
+    return ORJSONResponse({"detail": str(exc)}, status_code=422)
+
+
+@app.exception_handler(UnsupportedByBackend)
+async def _unsupported_by_backend(request: Request, exc: UnsupportedByBackend):
+    return ORJSONResponse({"detail": str(exc)}, status_code=501)
+
+
 # Simple token-protected health
 @app.get("/healthz", dependencies=[Depends(require_token)])
 def healthz():
@@ -39,21 +109,83 @@ def status():
         "targets": settings.default_targets,
         "scan_config": settings.scan_defaults,
         "cleanup_enabled": settings.cleanup_enabled,
+        "scan_startup": scanner.startup_summary(),
+        "neo4j": neo4j_client.metrics(),
+        "storage": {"backend": get_store().name, **get_store().stats()},
+        "admission": admission.stats(),
+        "rate_limit": {
+            "per_minute": settings.rate_limit_per_minute,
+            "burst": settings.rate_limit_burst,
+            "worker_per_minute": settings.worker_rate_limit_per_minute,
+            **rate_limiter.stats(),
+        },
     }
 
 
+def _with_profile(body: dict, plans: list | None) -> dict:
+    if plans is not None:
+        body["profile"] = plans
+    return body
+
+
+@app.get("/debug/slow-queries", dependencies=[Depends(require_token)])
+def slow_queries(limit: int = 50):
+    """Most recent statements over SLOW_QUERY_MS, newest first"""
+    rows = list(neo4j_client.slow_queries)[::-1][: max(1, min(limit, 1000))]
+    return {"results": rows, "count": len(rows), "threshold_ms": settings.slow_query_ms}
+
+
+@app.get("/debug/loop-lag", dependencies=[Depends(require_token)])
+def loop_lag(since: float | None = None):
+    """Event-loop lag percentiles over the samples taken since ``since`` (epoch seconds)"""
+    return loop_monitor.summary(since)
+
+
 @app.post("/query", dependencies=[Depends(require_token)])
 def query(req: QueryRequest):
     """Query hosts from Neo4j"""
-    rows = list(query_subdomains(req.domain, req.host, req.online_only, req.limit))
-    return {"results": rows, "count": len(rows)}
+    offset = shaping.cursor_offset(req)
+    with neo4j_client.profiling(req.profile) as plans:
+        rows = list(query_subdomains(req.domain, req.host, req.online_only, req.limit, offset))
+    if shaping.requested(req):
+        return _with_profile(shaping.shape(rows, req, offset, "/query"), plans)
+    return _with_profile({"results": rows, "count": len(rows)}, plans)
 
 
 @app.post("/events/query", dependencies=[Depends(require_token)])
 def events_query(req: EventsQueryRequest):
     """Query events from Neo4j"""
-    rows = list(query_events(req.types, req.modules, req.domain, req.host, req.since_ts, req.until_ts, req.limit))
-    return {"results": rows, "count": len(rows)}
+    offset = shaping.cursor_offset(req)
+    with neo4j_client.profiling(req.profile) as plans:
+        rows = list(query_events(req.types, req.modules, req.domain, req.host, req.since_ts, req.until_ts, req.limit, offset))
+    if shaping.requested(req):
+        return _with_profile(shaping.shape(rows, req, offset, "/events/query"), plans)
+    return _with_profile({"results": rows, "count": len(rows)}, plans)
+
+
+@app.post("/events/rollups", dependencies=[Depends(require_token)])
+def events_rollups(req: EventRollupQueryRequest):
+    """Event counts per day/week, including history already removed by retention"""
+    with neo4j_client.profiling(req.profile) as plans:
+        rows = query_event_rollups(
+            req.types, req.modules, req.domain, req.since_ts, req.until_ts, req.bucket, req.group_by, req.include_raw, req.limit
+        )
+    return _with_profile({"results": rows, "count": len(rows), "bucket": req.bucket}, plans)
+
+
+@app.get("/scans", dependencies=[Depends(require_token)])
+def scans(limit: int = 50, offset: int = 0, target: str | None = None, status: str | None = None):
+    """List indexed scans, newest first"""
+    rows = scan_index.list(limit=max(1, min(limit, 1000)), offset=max(0, offset), target=target, status=status)
+    return {"results": rows, "count": len(rows), "total": scan_index.count()}
+
+
+@app.get("/metrics", dependencies=[Depends(require_scrape_token)])
+def prometheus_metrics():
+    """Prometheus exposition (requires prometheus_client)"""
+    if not metrics.available():
+        return ORJSONResponse({"detail": "prometheus_client is not installed"}, status_code=501)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
 
 
 # Mount MCP shim app (query-only)
@@ -61,45 +193,116 @@ mcp_app = get_mcp_app()
 app.mount("/mcp", mcp_app)
 
 
+_startup_state: dict = {"role": None, "neo4j": "pending", "constraints": False, "error": None, "t0": time.monotonic()}
+
+
+# Delay between bootstrap attempts after a failure, doubling up to the maximum
+_BOOTSTRAP_RETRY_SECONDS = (5.0, 300.0)
+
+
+async def _bootstrap_storage():
+    """Connect and create the schema, retrying with backoff until it succeeds (/readyz waits on it)."""
+    store = get_store()
+    started = time.monotonic()
+    delay, max_delay = _BOOTSTRAP_RETRY_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(store.connect)
+            _startup_state["neo4j"] = "connected" if store.name == "neo4j" else "skipped"
+            await asyncio.to_thread(ensure_constraints)
+            _startup_state["constraints"] = True
+            _startup_state["error"] = None
+            logger.info("Storage ({}) ready after {:.1f}s", store.name, time.monotonic() - started)
+            return
+        except Exception as exc:
+            # Don't crash if DB not ready yet; queries retry the connection on demand
+            _startup_state["neo4j"] = "connected" if neo4j_client.is_connected else "failed"
+            _startup_state["error"] = str(exc)
+            logger.warning("Failed to ensure {} constraints ({}); retrying in {:.0f}s", store.name, exc, delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: central nodes are ready once storage is connected and constraints exist"""
+    role = _startup_state["role"] or (settings.deployment_role or "central").lower()
+    ready = role != "central" or (get_store().is_connected and _startup_state["constraints"])
+    body = {
+        "ready": ready,
+        "role": role,
+        "storage": settings.storage_backend,
+        "neo4j": "connected" if neo4j_client.is_connected else _startup_state["neo4j"],
+        "constraints": _startup_state["constraints"],
+    }
+    return ORJSONResponse(body, status_code=200 if ready else 503)
+
+
 @app.on_event("startup")
 async def _on_startup():
     apply_init_config()
     role = (settings.deployment_role or "central").lower()
+    _startup_state["role"] = role
     if role == "central":
-        # Ensure constraints, but don't crash if DB not ready yet
-        try:
-            ensure_constraints()
-        except Exception as exc:
-            logger.warning("Failed to ensure Neo4j constraints during startup: {}", exc)
+        # Connect and ensure constraints in the background; /readyz reports when done
+        _startup_state["bootstrap"] = asyncio.create_task(_bootstrap_storage())
     else:
+        _startup_state["neo4j"] = "skipped"
         logger.info("deployment_role='{}' – skipping Neo4j constraint bootstrap", role)
-    # Start continuous scanner in background
-    import asyncio
+    await loop_monitor.start()
+    # Watch scan roots so the importer can look up scan dirs without walking them
+    try:
+        await scan_dir_watcher.start()
+    except Exception as exc:
+        logger.warning("Failed to start scan dir watcher: {}", exc)
+    if (settings.scan_backend or "").lower() == "process":
+        # Pre-spawn scan processes now, so the first scan after a restart is warm too
+        start_warm_pool()
+    # Start continuous scanner in background (BBOT itself is only imported by the first scan)
     asyncio.create_task(scanner.run_forever())
+    logger.info("Startup ({}) completed in {:.2f}s", role, time.monotonic() - _startup_state["t0"])
 
 
 @app.on_event("shutdown")
 async def _on_shutdown():
+    bootstrap = _startup_state.pop("bootstrap", None)
+    if bootstrap is not None and not bootstrap.done():
+        bootstrap.cancel()
     await scanner.stop()
+    await loop_monitor.stop()
+    await scan_dir_watcher.stop()
+    await close_warm_pool()
+    await asyncio.to_thread(get_store().close)
+    await asyncio.to_thread(tracing.flush)
 
 
 def require_worker(
     worker_id: str | None = Header(default=None, alias="X-Worker-Id"),
     worker_token: str | None = Header(default=None, alias="X-Worker-Token"),
 ):
-    tokens = settings.worker_tokens or {}
-    if not worker_id or not worker_token or tokens.get(worker_id) != worker_token:
+    if not _worker_authorized(worker_id, worker_token):
         raise HTTPException(status_code=401, detail="Unauthorized worker")
+    rate_limiter.check(f"worker:{worker_id}", settings.worker_rate_limit_per_minute)
     return worker_id
 
 
 @app.post("/ingest/output")
-async def ingest_output(req: OutputIngestRequest, worker_id: str = Depends(require_worker)):
-    data = base64.b64decode(req.payload_b64)
-    if req.encoding == "gzip":
-        data = gzip.decompress(data)
-    imported = ingest_output_json_bytes(data, default_domain=req.default_domain)
-    return {"imported": imported, "worker": worker_id}
+async def ingest_output(
+    req: OutputIngestRequest,
+    worker_id: str = Depends(require_worker),
+    traceparent: str | None = Header(default=None),
+):
+    # Continue the worker's scan trace when the upload carries one
+    with tracing.span("ingest_request", parent=traceparent, worker=worker_id, scan_name=req.scan_name) as span:
+        with tracing.span("decode", encoding=req.encoding):
+            data = base64.b64decode(req.payload_b64)
+            if req.encoding == "gzip":
+                data = gzip.decompress(data)
+        span.set("bytes", len(data))
+        with neo4j_client.profiling(req.profile) as plans:
+            # Off the event loop: the import may wait for write slots (admission control)
+            imported = await run_in_threadpool(ingest_output_json_bytes, data, default_domain=req.default_domain)
+    return _with_profile({"imported": imported, "worker": worker_id}, plans)
 
 
 
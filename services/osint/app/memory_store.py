@@ -0,0 +1,405 @@
+"""In-process storage backend: the repository's graph model without Neo4j.
+
+Nodes are identified like the importer's MERGEs, by ``(label, key property, key)``; each has
+a property dict, and relationships are kept as outgoing and incoming adjacency sets per
+relationship type. A label index makes the repository queries a walk over one label plus
+its neighbours instead of a scan of the whole graph. All operations hold one lock, so the
+parallel importer writers can share a store.
+
+Writes follow the Cypher of the Neo4j backend (``n += props`` drops null properties, tags
+accumulate as a set, relationship rows whose endpoints are missing are ignored) and queries
+return the same rows, including Neo4j's ordering of nulls first in ``ORDER BY ... DESC``.
+Retention deletes expired nodes and their orphans but keeps no rollups.
+
+With a ``path`` the graph is loaded from a JSON snapshot on ``connect`` and written back on
+``close``; otherwise it lives only as long as the process.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+from loguru import logger
+
+from .config import settings
+from .output_mapping import NodeRow, RelRow
+from .storage import GraphStore
+
+NodeKey = tuple[str, str, Any]
+
+
+def _desc_nulls_first(value: Any) -> tuple[bool, Any]:
+    # Sort key reproducing Cypher ORDER BY ... DESC, where null sorts above every value
+    return (value is None, value if value is not None else 0)
+
+
+def _contains(value: Any, needle: str) -> bool:
+    return isinstance(value, str) and needle in value
+
+
+class MemoryStore(GraphStore):
+    name = "memory"
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = Path(path).expanduser() if path else None
+        self._lock = threading.RLock()
+        self._connected = False
+        self._stamped = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._next_id = 0
+        self._ids: dict[NodeKey, int] = {}
+        self._keys: dict[int, NodeKey] = {}
+        self._props: dict[int, dict[str, Any]] = {}
+        self._labels: dict[str, set[int]] = {}
+        self._out: dict[int, dict[str, set[int]]] = {}
+        self._in: dict[int, dict[str, set[int]]] = {}
+
+    # --- graph primitives (callers hold the lock) ---
+
+    def _merge(self, label: str, prop: str, key: Any) -> int:
+        nk = (label, prop, key)
+        nid = self._ids.get(nk)
+        if nid is None:
+            nid = self._next_id
+            self._next_id += 1
+            self._ids[nk] = nid
+            self._keys[nid] = nk
+            self._props[nid] = {prop: key}
+            self._labels.setdefault(label, set()).add(nid)
+        return nid
+
+    def _find(self, label: str, prop: str, key: Any) -> int | None:
+        return self._ids.get((label, prop, key))
+
+    def _relate(self, start: int, rel_type: str, end: int) -> None:
+        self._out.setdefault(start, {}).setdefault(rel_type, set()).add(end)
+        self._in.setdefault(end, {}).setdefault(rel_type, set()).add(start)
+
+    def _set(self, nid: int, props: dict[str, Any]) -> None:
+        target = self._props[nid]
+        for k, v in props.items():
+            if v is None:
+                target.pop(k, None)
+            else:
+                target[k] = v
+
+    def _neighbours(self, nid: int, rel_type: str, label: str | None = None, incoming: bool = False) -> Iterable[int]:
+        adjacency = self._in if incoming else self._out
+        for other in adjacency.get(nid, {}).get(rel_type, ()):
+            if label is None or self._keys[other][0] == label:
+                yield other
+
+    def _all_neighbours(self, nid: int) -> set[int]:
+        out: set[int] = set()
+        for adjacency in (self._out, self._in):
+            for ids in adjacency.get(nid, {}).values():
+                out.update(ids)
+        out.discard(nid)
+        return out
+
+    def _delete(self, nid: int) -> None:
+        """DETACH DELETE one node."""
+        for adjacency, reverse in ((self._out, self._in), (self._in, self._out)):
+            for rel_type, others in adjacency.pop(nid, {}).items():
+                for other in others:
+                    back = reverse.get(other, {}).get(rel_type)
+                    if back is not None:
+                        back.discard(nid)
+                        if not back:
+                            del reverse[other][rel_type]
+                    if other in reverse and not reverse[other]:
+                        del reverse[other]
+        nk = self._keys.pop(nid)
+        del self._ids[nk]
+        del self._props[nid]
+        self._labels[nk[0]].discard(nid)
+
+    # --- GraphStore ---
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def connect(self) -> None:
+        with self._lock:
+            if self._connected:
+                return
+            if self.path is not None and self.path.is_file():
+                self._load(self.path)
+            self._connected = True
+
+    def close(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            self._save(self.path)
+
+    def ensure_schema(self) -> None:
+        # Uniqueness is structural (one node per label/key) and every lookup is indexed
+        self.connect()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "nodes": len(self._props),
+                "relationships": sum(len(ids) for rels in self._out.values() for ids in rels.values()),
+                "labels": {label: len(ids) for label, ids in sorted(self._labels.items()) if ids},
+            }
+
+    def write_rows(self, nodes: list[NodeRow], rels: list[RelRow]) -> int:
+        with self._lock:
+            for node in nodes:
+                nid = self._merge(node.label, node.prop, node.key)
+                if node.props:
+                    self._set(nid, node.props)
+                if node.tags is not None:
+                    props = self._props[nid]
+                    props["tags"] = list(dict.fromkeys([*(props.get("tags") or ()), *node.tags]))
+            for rel in rels:
+                start = self._find(rel.start_label, rel.start_prop, rel.start_key)
+                end = self._find(rel.end_label, rel.end_prop, rel.end_key)
+                if start is not None and end is not None:
+                    self._relate(start, rel.rel_type, end)
+        return 1
+
+    def node_keys(self, label: str, prop: str, limit: int) -> list[Any]:
+        with self._lock:
+            keys = []
+            for nid in self._labels.get(label, ()):
+                value = self._props[nid].get(prop)
+                if value is not None:
+                    keys.append(value)
+                    if len(keys) >= limit:
+                        break
+            return keys
+
+    def upsert_subdomain(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            d = self._merge("Domain", "name", record["domain"])
+            h = self._merge("Host", "fqdn", record["host"])
+            self._relate(h, "PART_OF", d)
+            self._set(h, {k: record.get(k) for k in ("status", "last_seen_ts", "sources", "ports")})
+
+    def ingest_event(self, p: dict[str, Any]) -> None:
+        with self._lock:
+            m = self._merge("Module", "name", p["module"])
+            ev = self._merge("Event", "id", p["evid"])
+            self._set(ev, {"type": p["etype"], "ts": p["ts"], "raw": p["raw"]})
+            self._relate(ev, "EMITTED_BY", m)
+
+            def about(label: str, prop: str, key: Any) -> int:
+                nid = self._merge(label, prop, key)
+                self._relate(ev, "ABOUT", nid)
+                return nid
+
+            d = about("Domain", "name", p["domain"]) if p["domain"] else None
+            h = None
+            if p["host"]:
+                h = about("Host", "name", p["host"])
+                props = self._props[h]
+                self._set(h, {
+                    "status": p["status"] if p["status"] is not None else props.get("status"),
+                    "last_seen_ts": p["ts"],
+                    "sources": [*(props.get("sources") or ()), *p["sources"]],
+                })
+            i = about("IP", "addr", p["ip"]) if p["ip"] else None
+            u = about("URL", "value", p["url"]) if p["url"] else None
+            if p["email"]:
+                about("Email", "value", p["email"])
+            dn = None
+            if p["dns_name"]:
+                dn = about("DNS_NAME", "name", p["dns_name"])
+                self._set(dn, {"last_seen_ts": p["ts"]})
+            op = None
+            if p["open_port_endpoint"]:
+                op = about("OPEN_TCP_PORT", "endpoint", p["open_port_endpoint"])
+                self._set(op, {"port": p["port"], "host": p["host"], "last_seen_ts": p["ts"]})
+                if h is not None:
+                    self._relate(op, "ON_HOST", h)
+            if p["technology"]:
+                t = about("TECHNOLOGY", "name", p["technology"])
+                if h is not None:
+                    self._relate(h, "USES_TECH", t)
+            if p["port"] and h is not None:
+                props = self._props[h]
+                props["ports"] = list(dict.fromkeys([*(props.get("ports") or ()), p["port"]]))
+            if p["asn_number"]:
+                a = about("ASN", "number", p["asn_number"])
+                if p["asn_name"] is not None:
+                    self._set(a, {"name": p["asn_name"]})
+                if i is not None:
+                    self._relate(i, "IN_ASN", a)
+            if p["protocol_name"]:
+                about("PROTOCOL", "name", p["protocol_name"])
+            if p["finding_id"]:
+                f = about("FINDING", "id", p["finding_id"])
+                if p["finding_severity"] is not None:
+                    self._set(f, {"severity": p["finding_severity"]})
+                if h is not None:
+                    self._relate(f, "ON_HOST", h)
+            if p["mobile_app_name"]:
+                ma = about("MOBILE_APP", "name", p["mobile_app_name"])
+                if p.get("mobile_app_url"):
+                    self._relate(ma, "DOWNLOAD_URL", self._merge("URL", "value", p["mobile_app_url"]))
+            for rip in p.get("resolved_ips") or ():
+                ip = self._merge("IP", "addr", rip)
+                for src in (dn, h, op, u):
+                    if src is not None:
+                        self._relate(src, "RESOLVES_TO", ip)
+            if p["social_handle"]:
+                about("SOCIAL", "handle", p["social_handle"])
+            if p["org_stub_name"]:
+                og = about("ORG_STUB", "name", p["org_stub_name"])
+                if d is not None:
+                    self._relate(og, "OWNS", d)
+            if p["azure_tenant_id"]:
+                about("AZURE_TENANT", "id", p["azure_tenant_id"])
+            if d is not None and h is not None:
+                self._relate(h, "PART_OF", d)
+
+    def query_subdomains(self, domain: str | None, host: str | None, online_only: bool, limit: int, skip: int = 0) -> list[dict]:
+        with self._lock:
+            rows = []
+            for h in self._labels.get("Host", ()):
+                hp = self._props[h]
+                if host and not _contains(hp.get("name"), host):
+                    continue
+                if online_only and hp.get("status") != "online":
+                    continue
+                for d in self._neighbours(h, "PART_OF", "Domain"):
+                    dname = self._props[d].get("name")
+                    if domain and not _contains(dname, domain):
+                        continue
+                    rows.append({
+                        "domain": dname,
+                        "host": hp.get("name"),
+                        "status": hp.get("status"),
+                        "last_seen_ts": hp.get("last_seen_ts"),
+                        "sources": hp.get("sources"),
+                        "ports": hp.get("ports"),
+                    })
+        # Ascending tie-breakers first; nlargest is stable, so ties keep that order (as the Cypher)
+        rows.sort(key=lambda r: (r["host"] or "", r["domain"] or ""))
+        return heapq.nlargest(skip + limit, rows, key=lambda r: _desc_nulls_first(r["last_seen_ts"]))[skip:]
+
+    def query_events(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        host: str | None,
+        since_ts: int | None,
+        until_ts: int | None,
+        limit: int,
+        skip: int = 0,
+    ) -> list[dict]:
+        type_set = set(types) if types else None
+        module_set = set(modules) if modules else None
+        with self._lock:
+            rows = []
+            for ev in self._labels.get("Event", ()):
+                props = self._props[ev]
+                ts = props.get("ts")
+                if type_set is not None and props.get("type") not in type_set:
+                    continue
+                if since_ts and (ts is None or ts < since_ts):
+                    continue
+                if until_ts and (ts is None or ts > until_ts):
+                    continue
+                # One row per matched (module, domain, host) combination, as the Cypher MATCHes
+                matches = 1
+                if domain:
+                    matches *= sum(1 for d in self._neighbours(ev, "ABOUT", "Domain") if _contains(self._props[d].get("name"), domain))
+                if host:
+                    matches *= sum(1 for h in self._neighbours(ev, "ABOUT", "Host") if _contains(self._props[h].get("name"), host))
+                if not matches:
+                    continue
+                for m in self._neighbours(ev, "EMITTED_BY", "Module"):
+                    mname = self._props[m].get("name")
+                    if module_set is not None and mname not in module_set:
+                        continue
+                    row = {"id": props.get("id"), "type": props.get("type"), "ts": ts, "module": mname, "raw": props.get("raw")}
+                    rows.extend([row] * matches)
+        rows.sort(key=lambda r: (r["id"] or "", r["module"] or ""))
+        return heapq.nlargest(skip + limit, rows, key=lambda r: _desc_nulls_first(r["ts"]))[skip:]
+
+    def cleanup(self, now_epoch: int) -> dict[str, Any]:
+        started = time.monotonic()
+        stats: dict[str, Any] = {
+            "deleted_events": 0,
+            "deleted_offline_hosts": 0,
+            "deleted_orphans": 0,
+            "deleted_rollups": 0,
+            "stamped_events": 0,
+            "batches": 1,
+        }
+        with self._lock:
+            candidates: set[int] = set()
+
+            def expire(label: str, prop: str, threshold: float, stat: str, offline_only: bool = False) -> None:
+                for nid in list(self._labels.get(label, ())):
+                    props = self._props[nid]
+                    value = props.get(prop)
+                    if value is None or value >= threshold:
+                        continue
+                    if offline_only and props.get("status") != "offline":
+                        continue
+                    candidates.update(self._all_neighbours(nid))
+                    self._delete(nid)
+                    candidates.discard(nid)
+                    stats[stat] += 1
+
+            if settings.event_retention_days > 0:
+                if not self._stamped:
+                    for nid in self._labels.get("EVENT", ()):
+                        if self._props[nid].get("ingested_ts") is None:
+                            self._props[nid]["ingested_ts"] = now_epoch
+                            stats["stamped_events"] += 1
+                    self._stamped = True
+                threshold = now_epoch - settings.event_retention_days * 86400
+                expire("Event", "ts", threshold, "deleted_events")
+                expire("EVENT", "ingested_ts", threshold, "deleted_events")
+            if settings.offline_host_retention_days > 0:
+                threshold = now_epoch - settings.offline_host_retention_days * 86400
+                expire("Host", "last_seen_ts", threshold, "deleted_offline_hosts", offline_only=True)
+            if settings.orphan_cleanup_enabled:
+                for nid in candidates:
+                    if nid in self._props and not self._out.get(nid) and not self._in.get(nid):
+                        self._delete(nid)
+                        stats["deleted_orphans"] += 1
+        stats["seconds"] = round(time.monotonic() - started, 3)
+        return stats
+
+    # --- snapshots ---
+
+    def _save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({
+                "nodes": [[nid, *self._keys[nid], self._props[nid]] for nid in self._props],
+                "rels": [[s, t, e] for s, rels in self._out.items() for t, ends in rels.items() for e in ends],
+            }, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+        logger.info("Saved in-memory graph ({} nodes) to {}", len(self._props), path)
+
+    def _load(self, path: Path) -> None:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        self._reset()
+        remap: dict[int, int] = {}
+        for old, label, prop, key, props in data.get("nodes", []):
+            nid = self._merge(label, prop, key)
+            self._props[nid] = props
+            remap[old] = nid
+        for s, t, e in data.get("rels", []):
+            if s in remap and e in remap:
+                self._relate(remap[s], t, remap[e])
+        logger.info("Loaded in-memory graph ({} nodes) from {}", len(self._props), path)
@@ -0,0 +1,125 @@
+"""Prometheus metrics for the ingest, query, scan and upload pipelines.
+
+``prometheus_client`` is optional: without it every metric is a no-op and ``/metrics``
+reports that the exporter is unavailable. Hot paths record per batch, never per event.
+"""
+
+from __future__ import annotations
+
+import functools
+import time
+import weakref
+from collections import Counter as _Tally
+from typing import Any, Callable, Iterable, TypeVar
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+except ImportError:  # pragma: no cover - optional dependency
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    generate_latest = None
+
+    class _NoopMetric:
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            pass
+
+        def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+            return self
+
+        def inc(self, amount: float = 1) -> None:
+            pass
+
+        def observe(self, amount: float) -> None:
+            pass
+
+        def set(self, value: float) -> None:
+            pass
+
+        def set_function(self, fn: Callable[[], float]) -> None:
+            pass
+
+    Counter = Gauge = Histogram = _NoopMetric  # type: ignore[misc,assignment]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Scans and uploads take minutes, queries and flushes milliseconds
+_FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_SLOW_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0)
+
+EVENTS_INGESTED = Counter("osint_events_ingested_total", "Events written to Neo4j", ["type"])
+BATCH_FLUSH_SECONDS = Histogram(
+    "osint_ingest_batch_flush_seconds", "Time to build and commit one ingest batch", buckets=_FAST_BUCKETS
+)
+BATCH_EVENTS = Histogram(
+    "osint_ingest_batch_events", "Events per ingest batch", buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+INGEST_QUEUE_DEPTH = Gauge("osint_ingest_queue_depth", "Events waiting in live ingest queues")
+QUERY_SECONDS = Histogram(
+    "osint_neo4j_query_seconds", "Latency of repository Neo4j calls", ["function"], buckets=_FAST_BUCKETS
+)
+QUERY_ERRORS = Counter("osint_neo4j_query_errors_total", "Failed repository Neo4j calls", ["function"])
+MCP_INVOCATIONS = Counter("osint_mcp_tool_invocations_total", "MCP tool invocations", ["tool", "status"])
+MCP_SECONDS = Histogram("osint_mcp_tool_seconds", "MCP tool latency", ["tool"], buckets=_FAST_BUCKETS)
+UPLOAD_BYTES = Counter("osint_upload_bytes_total", "Bytes sent to the central API", ["encoding"])
+UPLOAD_SECONDS = Histogram("osint_upload_seconds", "Upload duration to the central API", buckets=_FAST_BUCKETS)
+UPLOADS = Counter("osint_uploads_total", "Uploads to the central API", ["status"])
+SCAN_SECONDS = Histogram("osint_scan_seconds", "Scan duration per target", ["target"], buckets=_SLOW_BUCKETS)
+SCAN_EVENTS = Counter("osint_scan_events_total", "Events produced by scans per target", ["target"])
+SCANS = Counter("osint_scans_total", "Completed scans per target", ["target", "status"])
+EVENT_LOOP_LAG = Histogram(
+    "osint_event_loop_lag_seconds",
+    "How late the API event loop wakes a periodic timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+RATE_LIMITED = Counter("osint_rate_limited_total", "Requests rejected by the per-client rate limit", ["kind"])
+QUERY_REJECTED = Counter("osint_query_rejected_total", "Queries rejected by admission control", ["reason"])
+QUERY_ADMISSION_WAIT = Histogram(
+    "osint_query_admission_wait_seconds", "Time queries waited for an admission slot", ["kind"], buckets=_FAST_BUCKETS
+)
+QUERY_SLOTS_IN_USE = Gauge("osint_query_slots_in_use", "Admission slots held by running queries")
+
+_queues: "weakref.WeakSet[Any]" = weakref.WeakSet()
+INGEST_QUEUE_DEPTH.set_function(lambda: sum(q.qsize() for q in list(_queues)))
+
+
+def available() -> bool:
+    return generate_latest is not None
+
+
+def render() -> bytes:
+    return generate_latest() if generate_latest is not None else b""
+
+
+def track_queue(queue: Any) -> None:
+    """Count ``queue.qsize()`` into the ingest queue depth gauge while the queue is alive."""
+    _queues.add(queue)
+
+
+def record_ingested(types: Iterable[str], seconds: float) -> None:
+    """One flushed batch: per-type event counts, batch size and flush latency."""
+    tally = _Tally(types)
+    for etype, n in tally.items():
+        EVENTS_INGESTED.labels(etype or "UNKNOWN").inc(n)
+    BATCH_EVENTS.observe(sum(tally.values()))
+    BATCH_FLUSH_SECONDS.observe(seconds)
+
+
+def timed_query(name: str) -> Callable[[F], F]:
+    """Decorator: observe a repository function's latency (and failures) under ``name``."""
+    histogram = QUERY_SECONDS.labels(name)
+    errors = QUERY_ERRORS.labels(name)
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
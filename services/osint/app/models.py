@@ -24,14 +24,24 @@ class SubdomainRecord(BaseModel):
     ports: list[int] = Field(default_factory=list)
 
 
-class QueryRequest(BaseModel):
+class ResultShaping(BaseModel):
+    # Agent-facing result shaping (app.shaping): size budget and paging cursor
+    max_bytes: Optional[int] = Field(default=None, gt=0)
+    max_tokens: Optional[int] = Field(default=None, gt=0)
+    cursor: Optional[str] = None
+
+
+class QueryRequest(ResultShaping):
     domain: Optional[str] = None
     host: Optional[str] = None
     online_only: bool = False
     limit: int = 100
+    # Run the Cypher with PROFILE and return the plans (debugging)
+    profile: bool = False
+    group_by: Optional[Literal["domain", "status"]] = None
 
 
-class EventsQueryRequest(BaseModel):
+class EventsQueryRequest(ResultShaping):
     types: list[str] = Field(default_factory=list)
     modules: list[str] = Field(default_factory=list)
     domain: Optional[str] = None
@@ -39,6 +49,26 @@ class EventsQueryRequest(BaseModel):
     since_ts: Optional[int] = None
     until_ts: Optional[int] = None
     limit: int = 200
+    profile: bool = False
+    group_by: Optional[Literal["type", "module", "host"]] = None
+    # raw event JSON: as stored, cut to raw_max_chars, a few key fields, or left out
+    # (default: "full", or "summary" when a byte/token budget is set)
+    raw: Optional[Literal["full", "truncate", "summary", "omit"]] = None
+    raw_max_chars: int = Field(default=256, ge=16)
+
+
+class EventRollupQueryRequest(BaseModel):
+    types: list[str] = Field(default_factory=list)
+    modules: list[str] = Field(default_factory=list)
+    domain: Optional[str] = None
+    since_ts: Optional[int] = None
+    until_ts: Optional[int] = None
+    bucket: Literal["day", "week"] = "day"
+    group_by: list[Literal["domain", "type", "module"]] = Field(default_factory=lambda: ["type"])
+    # Also count events that are still stored raw (not yet rolled up)
+    include_raw: bool = True
+    limit: int = 1000
+    profile: bool = False
 
 
 class OutputIngestRequest(BaseModel):
@@ -46,5 +76,7 @@ class OutputIngestRequest(BaseModel):
     default_domain: Optional[str] = None
     encoding: Literal["plain", "gzip"] = "plain"
     payload_b64: str
+    # Return PROFILE plans of the first importer batches
+    profile: bool = False
 
 
@@ -1,36 +1,210 @@
-from neo4j import GraphDatabase, Driver
-from typing import Any, Iterable
+from neo4j import READ_ACCESS, GraphDatabase, Driver, unit_of_work
+from typing import Any, Callable, Iterable, Iterator
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from .config import settings
+import re
+import threading
 import time
-from neo4j.exceptions import ServiceUnavailable
+from loguru import logger
+from neo4j.exceptions import ServiceUnavailable, SessionExpired
+
+
+class Neo4jUnavailable(ServiceUnavailable):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+# Errors that mean the database (not the query) is the problem
+_CONNECTIVITY_ERRORS = (ServiceUnavailable, SessionExpired, ConnectionError, OSError)
+
+# Set by ``Neo4jClient.profiling``: queries in that context run with PROFILE and append their plan
+_profile_capture: ContextVar[list[dict[str, Any]] | None] = ContextVar("neo4j_profile_capture", default=None)
+
+# Plans kept per profiling context (an import can issue thousands of batches)
+_MAX_PLANS = 50
+
+_SENSITIVE_PARAM = re.compile(r"pass|token|secret|raw|payload", re.IGNORECASE)
+
+
+def _redact(value: Any, key: str = "", depth: int = 0) -> Any:
+    """Parameters as logged: secrets and raw payloads masked, long values and lists shortened."""
+    if _SENSITIVE_PARAM.search(key):
+        return "***"
+    if isinstance(value, str):
+        return value if len(value) <= 64 else f"{value[:61]}..."
+    if isinstance(value, dict):
+        if depth >= 2:
+            return f"<{len(value)} keys>"
+        return {k: _redact(v, str(k), depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], dict):
+            return f"<{len(value)} rows>"
+        head = [_redact(v, key, depth + 1) for v in value[:5]]
+        return head + [f"... {len(value)} items"] if len(value) > 5 else head
+    return value
+
+
+def _compact(cypher: str, limit: int = 2000) -> str:
+    text = " ".join(cypher.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _plan(profile: dict[str, Any] | None) -> dict[str, Any] | None:
+    """Operator tree of a PROFILE summary with rows and db hits per operator."""
+    if not profile:
+        return None
+    args = profile.get("args") or {}
+    return {
+        "operator": profile.get("operatorType"),
+        "details": args.get("Details"),
+        "rows": profile.get("rows"),
+        "db_hits": profile.get("dbHits"),
+        "children": [_plan(child) for child in profile.get("children") or []],
+    }
+
+
+def _db_hits(profile: dict[str, Any] | None) -> int | None:
+    if not profile:
+        return None
+    return int(profile.get("dbHits") or 0) + sum(_db_hits(c) or 0 for c in profile.get("children") or [])
+
+
+class CircuitBreaker:
+    """Fail fast after repeated connectivity failures; probe again after ``reset_seconds``."""
+
+    def __init__(self, threshold: int, reset_seconds: float) -> None:
+        self.threshold = max(1, threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True  # let exactly one call probe the database
+                return
+            self.rejected += 1
+            raise Neo4jUnavailable(f"Neo4j circuit open; retry in {max(0.0, remaining):.0f}s")
+
+    def success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Neo4j circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    logger.warning("Neo4j circuit opened after {} consecutive failures", self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
 
 
 class Neo4jClient:
     def __init__(self) -> None:
         self._driver: Driver | None = None
+        # One thread establishes the connection; others wait briefly instead of retrying in parallel
+        self._connect_lock = threading.Lock()
+        self.connected_at: float | None = None
+        self.last_error: str | None = None
+        self.breaker = CircuitBreaker(settings.neo4j_breaker_threshold, settings.neo4j_breaker_reset_seconds)
+        self._stats_lock = threading.Lock()
+        self.slow_queries: deque[dict[str, Any]] = deque(maxlen=max(1, settings.slow_query_log_size))
+        self._stats = {
+            "active_sessions": 0,
+            "peak_sessions": 0,
+            "read_tx": 0,
+            "write_tx": 0,
+            "autocommit": 0,
+            "tx_retries": 0,
+            "errors": 0,
+            "slow_queries": 0,
+            "db_hits": 0,
+            "cancelled_streams": 0,
+        }
+
+    @property
+    def is_connected(self) -> bool:
+        return self._driver is not None
+
+    def connect(self) -> None:
+        """Connect (with retries per candidate host); meant for a background startup task."""
+        with self._connect_lock:
+            self._connect(settings.neo4j_connect_attempts)
+        self.breaker.success()
 
     def _ensure_connected(self) -> None:
         if self._driver is not None:
             return
-        candidate_hosts = [
+        if not self._connect_lock.acquire(timeout=settings.neo4j_wait_seconds):
+            raise ServiceUnavailable("Neo4j connection is still being established")
+        try:
+            # Request path: one attempt per host; the circuit breaker handles repeated failures
+            self._connect(1)
+        finally:
+            self._connect_lock.release()
+
+    def _driver_config(self) -> dict[str, Any]:
+        return {
+            "max_connection_pool_size": settings.neo4j_pool_size,
+            "connection_acquisition_timeout": settings.neo4j_acquisition_timeout,
+            "connection_timeout": settings.neo4j_connection_timeout,
+            "max_transaction_retry_time": settings.neo4j_max_retry_time,
+        }
+
+    def _connect(self, attempts: int) -> None:
+        if self._driver is not None:
+            return
+        candidate_hosts = list(dict.fromkeys([
             str(settings.neo4j_host or "neo4j"),
             "neo4j",
             "bbot_neo4j",
-        ]
+        ]))
         auth = (settings.neo4j_username, settings.neo4j_password)
         last_exc: Exception | None = None
-        for host in candidate_hosts:
-            uri = f"{settings.neo4j_scheme}://{host}:{settings.neo4j_port}"
-            for _ in range(120):
+        for attempt in range(max(1, attempts)):
+            for host in candidate_hosts:
+                # neo4j:// (and neo4j+s://) enable cluster routing: reads may go to followers
+                uri = f"{settings.neo4j_scheme}://{host}:{settings.neo4j_port}"
+                drv: Driver | None = None
                 try:
-                    drv: Driver = GraphDatabase.driver(uri, auth=auth)
-                    with drv.session() as session:
-                        session.run("RETURN 1").consume()
+                    drv = GraphDatabase.driver(uri, auth=auth, **self._driver_config())
+                    drv.verify_connectivity()
                     self._driver = drv
+                    self.connected_at = time.time()
+                    self.last_error = None
+                    logger.info("Connected to Neo4j at {}", uri)
                     return
-                except (ServiceUnavailable, Exception) as exc:
+                except Exception as exc:
                     last_exc = exc
-                    time.sleep(1)
+                    self.last_error = str(exc)
+                    if drv is not None:
+                        drv.close()
+            if attempt + 1 < attempts:
+                time.sleep(1)
+        if isinstance(last_exc, (ValueError, OSError)):
+            # e.g. unresolvable host: surface as the driver's connectivity error
+            raise ServiceUnavailable(str(last_exc)) from last_exc
         if last_exc:
             raise last_exc
 
@@ -39,15 +213,233 @@ class Neo4jClient:
             self._driver.close()
             self._driver = None
 
-    def run(self, cypher: str, parameters: dict[str, Any] | None = None) -> Iterable[dict[str, Any]]:
-        self._ensure_connected()
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += n
+
+    @contextmanager
+    def _session(self, **options: Any):
+        """Session bound to breaker and metrics; always closed, even if the caller bails out."""
+        self.breaker.before_call()
+        try:
+            self._ensure_connected()
+        except Exception:
+            self.breaker.failure()
+            raise
         assert self._driver is not None
-        with self._driver.session() as session:
+        kwargs: dict[str, Any] = {"fetch_size": settings.neo4j_fetch_size}
+        if settings.neo4j_database:
+            kwargs["database"] = settings.neo4j_database
+        kwargs.update(options)
+        with self._stats_lock:
+            self._stats["active_sessions"] += 1
+            self._stats["peak_sessions"] = max(self._stats["peak_sessions"], self._stats["active_sessions"])
+        try:
+            with self._driver.session(**kwargs) as session:
+                yield session
+            self.breaker.success()
+        except _CONNECTIVITY_ERRORS:
+            self._bump("errors")
+            self.breaker.failure()
+            raise
+        except Exception:
+            # Query errors mean the database answered: not a breaker failure
+            self._bump("errors")
+            self.breaker.success()
+            raise
+        finally:
+            self._bump("active_sessions", -1)
+
+    @contextmanager
+    def profiling(self, enabled: bool = True) -> Iterator[list[dict[str, Any]] | None]:
+        """Run the queries issued in this context with PROFILE; yields the collected plans.
+
+        Yields None when ``enabled`` is false, so callers can pass a request flag straight in.
+        """
+        if not enabled:
+            yield None
+            return
+        plans: list[dict[str, Any]] = []
+        token = _profile_capture.set(plans)
+        try:
+            yield plans
+        finally:
+            _profile_capture.reset(token)
+
+    def _observe(self, cypher: str, parameters: dict[str, Any] | None, summary: Any, rows: int, wall: float, kind: str) -> None:
+        """Slow-query log and PROFILE capture from a consumed result summary."""
+        server_ms = None
+        if summary is not None:
+            available = summary.result_available_after
+            consumed = summary.result_consumed_after
+            if available is not None or consumed is not None:
+                server_ms = (available or 0) + (consumed or 0)
+        profile = getattr(summary, "profile", None) if summary is not None else None
+        plans = _profile_capture.get()
+        if profile:
+            self._bump("db_hits", _db_hits(profile) or 0)
+        entry: dict[str, Any] | None = None
+        if plans is not None and profile and len(plans) < _MAX_PLANS:
+            entry = self._entry(cypher, parameters, kind, wall, server_ms, rows, profile)
+            entry["plan"] = _plan(profile)
+            plans.append(entry)
+        threshold = settings.slow_query_ms
+        if threshold <= 0 or max(wall * 1000, server_ms or 0) < threshold:
+            return
+        entry = dict(entry) if entry else self._entry(cypher, parameters, kind, wall, server_ms, rows, profile)
+        entry.pop("plan", None)
+        self.slow_queries.append(entry)
+        self._bump("slow_queries")
+        logger.warning(
+            "Slow Neo4j {} ({:.0f} ms, server {} ms, {} rows, db hits {}): {} params={}",
+            kind, entry["wall_ms"], server_ms, rows, entry["db_hits"], entry["query"][:500], entry["parameters"],
+        )
+
+    def _entry(self, cypher: str, parameters: dict[str, Any] | None, kind: str, wall: float, server_ms: Any, rows: int, profile: Any) -> dict[str, Any]:
+        return {
+            "at": time.time(),
+            "kind": kind,
+            "query": _compact(cypher),
+            "parameters": _redact(parameters or {}),
+            "wall_ms": round(wall * 1000, 1),
+            "server_ms": server_ms,
+            "rows": rows,
+            "db_hits": _db_hits(profile),
+        }
+
+    def _tx_function(self, work: Callable) -> Callable:
+        timeout = settings.neo4j_tx_timeout if settings.neo4j_tx_timeout > 0 else None
+        return unit_of_work(timeout=timeout)(work)
+
+    def _execute(self, mode: str, cypher: str, parameters: dict[str, Any] | None) -> list[dict[str, Any]]:
+        attempts = 0
+        statement = "PROFILE " + cypher if _profile_capture.get() is not None else cypher
+
+        def _work(tx) -> tuple[list[dict[str, Any]], Any]:
+            nonlocal attempts
+            attempts += 1
+            result = tx.run(statement, parameters or {})
+            rows = [record.data() for record in result]
+            return rows, result.consume()
+
+        started = time.perf_counter()
+        with self._session() as session:
+            execute = session.execute_read if mode == "read" else session.execute_write
+            rows, summary = execute(self._tx_function(_work))
+        self._bump(f"{mode}_tx")
+        self._bump("tx_retries", max(0, attempts - 1))
+        self._observe(cypher, parameters, summary, len(rows), time.perf_counter() - started, mode)
+        return rows
+
+    def read(self, cypher: str, parameters: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+        """Read transaction with automatic retry; routed to followers on a cluster."""
+        return self._execute("read", cypher, parameters)
+
+    def write(self, cypher: str, parameters: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+        """Write transaction with automatic retry (deadlocks, leader switches)."""
+        return self._execute("write", cypher, parameters)
+
+    def run(self, cypher: str, parameters: dict[str, Any] | None = None) -> Iterable[dict[str, Any]]:
+        """Auto-commit query (schema statements, large deletes). Records are fetched eagerly."""
+        started = time.perf_counter()
+        with self._session() as session:
             result = session.run(cypher, parameters or {})
-            for record in result:
-                yield record.data()
+            rows = [record.data() for record in result]
+            summary = result.consume()
+        self._bump("autocommit")
+        self._observe(cypher, parameters, summary, len(rows), time.perf_counter() - started, "autocommit")
+        return rows
 
+    def stream(
+        self,
+        cypher: str,
+        parameters: dict[str, Any] | None = None,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Read query whose records are yielded as the server sends them (``fetch_size`` per pull).
 
-neo4j_client = Neo4jClient()
+        Runs in an explicit read transaction without driver retries, since rows may already be
+        on their way to the client. Setting ``cancel`` or closing the generator early rolls the
+        transaction back, which stops the query on the server; ``cancel`` is checked between
+        records, so a query still computing its first row runs until then (or NEO4J_TX_TIMEOUT).
+        """
+        statement = "PROFILE " + cypher if _profile_capture.get() is not None else cypher
+        timeout = settings.neo4j_tx_timeout if settings.neo4j_tx_timeout > 0 else None
+        rows = 0
+        summary = None
+        started = time.perf_counter()
+        with self._session(default_access_mode=READ_ACCESS) as session:
+            tx = session.begin_transaction(timeout=timeout)
+            try:
+                result = tx.run(statement, parameters or {})
+                for record in result:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    rows += 1
+                    yield record.data()
+                else:
+                    summary = result.consume()
+            except GeneratorExit:
+                pass  # consumer went away: end normally so the session and breaker are released
+            finally:
+                # Nothing to commit for a read; closing an open transaction rolls it back
+                tx.close()
+        self._bump("read_tx")
+        if summary is None:
+            self._bump("cancelled_streams")
+        self._observe(cypher, parameters, summary, rows, time.perf_counter() - started, "stream")
 
+    def run_write_batch(self, statements: list[tuple[str, dict[str, Any]]]) -> int:
+        """Run several write statements in one managed transaction.
 
+        Transient failures (deadlocks, leader switches) are retried by the driver.
+        Returns the number of attempts it took.
+        """
+        attempts = 0
+        profile = _profile_capture.get() is not None
+        summaries: list[Any] = []
+
+        def _work(tx) -> None:
+            nonlocal attempts
+            attempts += 1
+            summaries.clear()
+            for cypher, parameters in statements:
+                summaries.append(tx.run("PROFILE " + cypher if profile else cypher, parameters).consume())
+
+        with self._session() as session:
+            session.execute_write(self._tx_function(_work))
+        self._bump("write_tx")
+        self._bump("tx_retries", max(0, attempts - 1))
+        for (cypher, parameters), summary in zip(statements, summaries):
+            # Statements share the transaction, so each one is judged on its own server time
+            self._observe(cypher, parameters, summary, len((parameters or {}).get("rows") or ()), 0.0, "batch")
+        return attempts
+
+    def metrics(self) -> dict[str, Any]:
+        with self._stats_lock:
+            out: dict[str, Any] = dict(self._stats)
+        out["connected"] = self.is_connected
+        out["breaker_state"] = self.breaker.state
+        out["breaker_failures"] = self.breaker.failures
+        out["breaker_rejected"] = self.breaker.rejected
+        out["pool_max_size"] = settings.neo4j_pool_size
+        # Per-address connection counts from the driver's pool (private API; best effort)
+        pool = getattr(self._driver, "_pool", None)
+        if pool is not None:
+            try:
+                in_use = idle = 0
+                for conns in list(pool.connections.values()):
+                    for conn in list(conns):
+                        if getattr(conn, "in_use", False):
+                            in_use += 1
+                        else:
+                            idle += 1
+                out["pool_in_use"] = in_use
+                out["pool_idle"] = idle
+                out["pool_utilization"] = round(in_use / settings.neo4j_pool_size, 4) if settings.neo4j_pool_size else None
+            except Exception:
+                pass
+        return out
+
+
+neo4j_client = Neo4jClient()
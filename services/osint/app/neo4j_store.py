@@ -0,0 +1,518 @@
+"""Neo4j storage backend: the repository's Cypher against the shared ``neo4j_client``."""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Iterator
+
+from loguru import logger
+from neo4j.exceptions import Neo4jError
+
+from .neo4j_client import neo4j_client
+from .output_mapping import NodeRow, RelRow
+from .retention import INDEX_STATEMENTS as RETENTION_INDEXES, ROLLUP_FIELDS, run_retention
+from .storage import GraphStore
+
+# Unique constraints for fast MERGE operations
+CONSTRAINT_STATEMENTS = (
+    "CREATE CONSTRAINT domain_unique IF NOT EXISTS FOR (d:Domain) REQUIRE d.name IS UNIQUE",
+    "CREATE CONSTRAINT host_unique IF NOT EXISTS FOR (h:Host) REQUIRE h.name IS UNIQUE",
+    "CREATE CONSTRAINT ip_unique IF NOT EXISTS FOR (i:IP) REQUIRE i.addr IS UNIQUE",
+    "CREATE CONSTRAINT url_unique IF NOT EXISTS FOR (u:URL) REQUIRE u.value IS UNIQUE",
+    "CREATE CONSTRAINT email_unique IF NOT EXISTS FOR (e:Email) REQUIRE e.value IS UNIQUE",
+    "CREATE CONSTRAINT module_unique IF NOT EXISTS FOR (m:Module) REQUIRE m.name IS UNIQUE",
+    "CREATE CONSTRAINT event_unique IF NOT EXISTS FOR (ev:Event) REQUIRE ev.id IS UNIQUE",
+    "CREATE CONSTRAINT dns_name_unique IF NOT EXISTS FOR (dn:DNS_NAME) REQUIRE dn.name IS UNIQUE",
+    "CREATE CONSTRAINT open_port_unique IF NOT EXISTS FOR (op:OPEN_TCP_PORT) REQUIRE op.endpoint IS UNIQUE",
+    "CREATE CONSTRAINT technology_unique IF NOT EXISTS FOR (t:TECHNOLOGY) REQUIRE t.name IS UNIQUE",
+    "CREATE CONSTRAINT asn_unique IF NOT EXISTS FOR (a:ASN) REQUIRE a.number IS UNIQUE",
+    "CREATE CONSTRAINT protocol_unique IF NOT EXISTS FOR (p:PROTOCOL) REQUIRE p.name IS UNIQUE",
+    "CREATE CONSTRAINT finding_unique IF NOT EXISTS FOR (f:FINDING) REQUIRE f.id IS UNIQUE",
+    "CREATE CONSTRAINT mobile_app_unique IF NOT EXISTS FOR (ma:MOBILE_APP) REQUIRE ma.name IS UNIQUE",
+    "CREATE CONSTRAINT social_unique IF NOT EXISTS FOR (s:SOCIAL) REQUIRE s.handle IS UNIQUE",
+    "CREATE CONSTRAINT org_stub_unique IF NOT EXISTS FOR (og:ORG_STUB) REQUIRE og.name IS UNIQUE",
+    "CREATE CONSTRAINT azure_tenant_unique IF NOT EXISTS FOR (az:AZURE_TENANT) REQUIRE az.id IS UNIQUE",
+    # Additional labels requested
+    "CREATE CONSTRAINT scan_unique IF NOT EXISTS FOR (sc:SCAN) REQUIRE sc.name IS UNIQUE",
+    "CREATE CONSTRAINT storage_bucket_unique IF NOT EXISTS FOR (sb:STORAGE_BUCKET) REQUIRE sb.name IS UNIQUE",
+    "CREATE CONSTRAINT code_repository_unique IF NOT EXISTS FOR (cr:CODE_REPOSITORY) REQUIRE cr.url IS UNIQUE",
+    "CREATE CONSTRAINT email_upper_unique IF NOT EXISTS FOR (e2:EMAIL) REQUIRE e2.value IS UNIQUE",
+)
+
+# Labels MERGEd by the output.json mapping (output_mapping.NODE_KEYS) that were written without a
+# constraint before; databases from that time may hold duplicates, merged before the constraint
+LATE_CONSTRAINTS: dict[str, tuple[str, str]] = {
+    "CREATE CONSTRAINT raw_event_unique IF NOT EXISTS FOR (n:EVENT) REQUIRE n.id IS UNIQUE": ("EVENT", "id"),
+    "CREATE CONSTRAINT ip_address_unique IF NOT EXISTS FOR (n:IP_ADDRESS) REQUIRE n.addr IS UNIQUE": ("IP_ADDRESS", "addr"),
+    "CREATE CONSTRAINT email_address_unique IF NOT EXISTS FOR (n:EMAIL_ADDRESS) REQUIRE n.value IS UNIQUE": ("EMAIL_ADDRESS", "value"),
+    "CREATE CONSTRAINT url_unverified_unique IF NOT EXISTS FOR (n:URL_UNVERIFIED) REQUIRE n.value IS UNIQUE": ("URL_UNVERIFIED", "value"),
+}
+CONSTRAINT_STATEMENTS += tuple(LATE_CONSTRAINTS)
+
+# Duplicate groups merged per transaction by dedupe_nodes
+_DEDUPE_BATCH = 500
+
+
+def dedupe_nodes(label: str, prop: str, batch: int = _DEDUPE_BATCH) -> int:
+    """Merge nodes of ``label`` sharing a ``prop`` value into one (relationships moved, later
+    properties win). Returns the number of duplicate groups merged."""
+    cypher = (
+        f"MATCH (n:`{label}`) WHERE n.`{prop}` IS NOT NULL "
+        f"WITH n.`{prop}` AS k, collect(n) AS nodes WHERE size(nodes) > 1 "
+        "WITH nodes LIMIT $batch "
+        "CALL apoc.refactor.mergeNodes(nodes, {properties: 'overwrite', mergeRels: true}) YIELD node "
+        "RETURN count(node) AS merged"
+    )
+    total = 0
+    while True:
+        rows = neo4j_client.write(cypher, {"batch": batch})
+        merged = int(rows[0]["merged"]) if rows else 0
+        if not merged:
+            return total
+        total += merged
+
+
+def _node_statement(label: str, prop: str, with_props: bool, with_tags: bool) -> str:
+    sets = []
+    if with_props:
+        sets.append("n += r.props")
+    if with_tags:
+        sets.append("n.tags = apoc.coll.toSet(coalesce(n.tags, []) + r.tags)")
+    cypher = f"UNWIND $rows AS r MERGE (n:`{label}` {{`{prop}`: r.key}})"
+    if sets:
+        cypher += " SET " + ", ".join(sets)
+    return cypher
+
+
+def _rel_statement(start_label: str, start_prop: str, rel_type: str, end_label: str, end_prop: str) -> str:
+    return (
+        f"UNWIND $rows AS r MATCH (a:`{start_label}` {{`{start_prop}`: r.s}}) "
+        f"MATCH (b:`{end_label}` {{`{end_prop}`: r.e}}) MERGE (a)-[:`{rel_type}`]->(b)"
+    )
+
+
+def batch_statements(nodes: list[NodeRow], rels: list[RelRow]) -> list[tuple[str, dict[str, Any]]]:
+    """Group importer rows into one ``UNWIND ... MERGE`` statement per label / relationship shape."""
+    node_groups: dict[tuple[str, str, bool, bool], list[dict[str, Any]]] = {}
+    for node in nodes:
+        row: dict[str, Any] = {"key": node.key}
+        if node.props is not None:
+            row["props"] = node.props
+        if node.tags is not None:
+            row["tags"] = list(node.tags)
+        node_groups.setdefault((node.label, node.prop, node.props is not None, node.tags is not None), []).append(row)
+    rel_groups: dict[tuple[str, str, str, str, str], list[dict[str, Any]]] = {}
+    for rel in rels:
+        group = (rel.start_label, rel.start_prop, rel.rel_type, rel.end_label, rel.end_prop)
+        rel_groups.setdefault(group, []).append({"s": rel.start_key, "e": rel.end_key})
+
+    statements: list[tuple[str, dict[str, Any]]] = []
+    # Nodes first so relationship MATCHes find them; rows sorted for a stable lock order
+    for (label, prop, with_props, with_tags), rows in sorted(node_groups.items()):
+        rows.sort(key=lambda r: str(r["key"]))
+        statements.append((_node_statement(label, prop, with_props, with_tags), {"rows": rows}))
+    for (sl, sp, rt, el, ep), rows in sorted(rel_groups.items()):
+        rows.sort(key=lambda r: (str(r["s"]), str(r["e"])))
+        statements.append((_rel_statement(sl, sp, rt, el, ep), {"rows": rows}))
+    return statements
+
+
+def _event_cypher(params: dict[str, Any]) -> str:
+    cypher = [
+        "MERGE (m:Module {name: $module})",
+        "MERGE (ev:Event {id: $evid})",
+        "SET ev.type = $etype, ev.ts = $ts, ev.raw = $raw",
+    ]
+
+    if params["domain"]:
+        cypher += [
+            "MERGE (d:Domain {name: $domain})",
+            "MERGE (ev)-[:ABOUT]->(d)",
+        ]
+    if params["host"]:
+        cypher += [
+            "MERGE (h:Host {name: $host})",
+            "SET h.status = coalesce($status, h.status), h.last_seen_ts = $ts, h.sources = coalesce(h.sources, []) + $sources",
+            "MERGE (ev)-[:ABOUT]->(h)",
+        ]
+    if params["ip"]:
+        cypher += [
+            "MERGE (i:IP {addr: $ip})",
+            "MERGE (ev)-[:ABOUT]->(i)",
+        ]
+    if params["url"]:
+        cypher += [
+            "MERGE (u:URL {value: $url})",
+            "MERGE (ev)-[:ABOUT]->(u)",
+        ]
+    if params["email"]:
+        cypher += [
+            "MERGE (e:Email {value: $email})",
+            "MERGE (ev)-[:ABOUT]->(e)",
+        ]
+    
+    # DNS_NAME node
+    if params["dns_name"]:
+        cypher += [
+            "MERGE (dn:DNS_NAME {name: $dns_name})",
+            "SET dn.last_seen_ts = $ts",
+            "MERGE (ev)-[:ABOUT]->(dn)",
+        ]
+    
+    # OPEN_TCP_PORT node
+    if params["open_port_endpoint"]:
+        cypher += [
+            "MERGE (op:OPEN_TCP_PORT {endpoint: $open_port_endpoint})",
+            "SET op.port = $port, op.host = $host, op.last_seen_ts = $ts",
+            "MERGE (ev)-[:ABOUT]->(op)",
+        ]
+        if params["host"]:
+            cypher += ["MERGE (op)-[:ON_HOST]->(h)"]
+    
+    # TECHNOLOGY node
+    if params["technology"]:
+        cypher += [
+            "MERGE (t:TECHNOLOGY {name: $technology})",
+            "MERGE (ev)-[:ABOUT]->(t)",
+        ]
+        if params["host"]:
+            cypher += ["MERGE (h)-[:USES_TECH]->(t)"]
+    
+    if params["port"] and params["host"]:
+        cypher += [
+            "SET h.ports = apoc.coll.toSet(coalesce(h.ports, []) + [$port])",
+        ]
+
+    # ASN node
+    if params["asn_number"]:
+        cypher += [
+            "MERGE (a:ASN {number: $asn_number})",
+            "SET a.name = coalesce($asn_name, a.name)",
+            "MERGE (ev)-[:ABOUT]->(a)",
+        ]
+        if params["ip"]:
+            cypher += [
+                "MERGE (i:IP {addr: $ip})",
+                "MERGE (i)-[:IN_ASN]->(a)",
+            ]
+
+    # PROTOCOL node
+    if params["protocol_name"]:
+        cypher += [
+            "MERGE (pr:PROTOCOL {name: $protocol_name})",
+            "MERGE (ev)-[:ABOUT]->(pr)",
+        ]
+
+    # FINDING node
+    if params["finding_id"]:
+        cypher += [
+            "MERGE (f:FINDING {id: $finding_id})",
+            "SET f.severity = coalesce($finding_severity, f.severity)",
+            "MERGE (ev)-[:ABOUT]->(f)",
+        ]
+        if params["host"]:
+            cypher += ["MERGE (f)-[:ON_HOST]->(h)"]
+
+    # MOBILE_APP node
+    if params["mobile_app_name"]:
+        cypher += [
+            "MERGE (ma:MOBILE_APP {name: $mobile_app_name})",
+            "MERGE (ev)-[:ABOUT]->(ma)",
+        ]
+        if params.get("mobile_app_url"):
+            cypher += [
+                "MERGE (u:URL {value: $mobile_app_url})",
+                "MERGE (ma)-[:DOWNLOAD_URL]->(u)",
+            ]
+
+    # After creating nodes, link resolved IPs by property matches to avoid scope issues
+    if params.get("resolved_ips"):
+        # Link DNS_NAME -> IP
+        if params.get("dns_name"):
+            cypher += [
+                "WITH $dns_name AS dn_name, $resolved_ips AS rips",
+                "MATCH (dn:DNS_NAME {name: dn_name})",
+                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (dn)-[:RESOLVES_TO]->(i)",
+            ]
+        # Link Host -> IP
+        if params.get("host"):
+            cypher += [
+                "WITH $host AS fq, $resolved_ips AS rips",
+                "MATCH (h3:Host {name: fq})",
+                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h3)-[:RESOLVES_TO]->(i)",
+            ]
+        # Link OPEN_TCP_PORT -> IP
+        if params.get("open_port_endpoint"):
+            cypher += [
+                "WITH $open_port_endpoint AS ep, $resolved_ips AS rips",
+                "MATCH (op2:OPEN_TCP_PORT {endpoint: ep})",
+                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (op2)-[:RESOLVES_TO]->(i)",
+            ]
+        # Link URL -> IP
+        if params.get("url"):
+            cypher += [
+                "WITH $url AS uv, $resolved_ips AS rips",
+                "MATCH (u2:URL {value: uv})",
+                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (u2)-[:RESOLVES_TO]->(i)",
+            ]
+
+    # SOCIAL node
+    if params["social_handle"]:
+        cypher += [
+            "MERGE (s:SOCIAL {handle: $social_handle})",
+            "MERGE (ev)-[:ABOUT]->(s)",
+        ]
+
+
+    # ORG_STUB node
+    if params["org_stub_name"]:
+        cypher += [
+            "MERGE (og:ORG_STUB {name: $org_stub_name})",
+            "MERGE (ev)-[:ABOUT]->(og)",
+        ]
+        if params["domain"]:
+            cypher += ["MERGE (og)-[:OWNS]->(d)"]
+
+    # AZURE_TENANT node
+    if params["azure_tenant_id"]:
+        cypher += [
+            "MERGE (az:AZURE_TENANT {id: $azure_tenant_id})",
+            "MERGE (ev)-[:ABOUT]->(az)",
+        ]
+
+    cypher += [
+        "MERGE (ev)-[:EMITTED_BY]->(m)",
+        # Connect host to domain when both exist
+        "WITH * WHERE $domain IS NOT NULL AND $host IS NOT NULL",
+        "MERGE (h)-[:PART_OF]->(d)",
+    ]
+
+    return "\n".join(cypher)
+
+
+def _subdomains_query(domain: str | None, host: str | None, online_only: bool, limit: int, skip: int) -> tuple[str, dict[str, Any]]:
+    where = []
+    params: dict[str, object] = {"limit": limit, "skip": skip}
+    if domain:
+        where.append("d.name CONTAINS $domain")
+        params["domain"] = domain
+    if host:
+        where.append("h.name CONTAINS $host")
+        params["host"] = host
+    if online_only:
+        where.append("h.status = 'online'")
+
+    where_clause = ("WHERE " + " AND ".join(where)) if where else ""
+    query = (
+        "MATCH (h:Host)-[:PART_OF]->(d:Domain) "
+        f"{where_clause} "
+        "RETURN d.name AS domain, h.name AS host, h.status AS status, h.last_seen_ts AS last_seen_ts, h.sources AS sources, h.ports AS ports "
+        # Tie-breakers keep SKIP-based cursor pages stable
+        "ORDER BY h.last_seen_ts DESC, h.name, d.name "
+        "SKIP $skip LIMIT $limit"
+    )
+    return query, params
+
+
+def _events_query(
+    types: list[str] | None,
+    modules: list[str] | None,
+    domain: str | None,
+    host: str | None,
+    since_ts: int | None,
+    until_ts: int | None,
+    limit: int,
+    skip: int,
+) -> tuple[str, dict[str, Any]]:
+    where = ["1=1"]
+    params: dict[str, Any] = {"limit": limit, "skip": skip}
+    if types:
+        where.append("ev.type IN $types")
+        params["types"] = types
+    if modules:
+        where.append("m.name IN $modules")
+        params["modules"] = modules
+    if since_ts:
+        where.append("ev.ts >= $since_ts")
+        params["since_ts"] = since_ts
+    if until_ts:
+        where.append("ev.ts <= $until_ts")
+        params["until_ts"] = until_ts
+
+    match = ["MATCH (ev:Event)-[:EMITTED_BY]->(m:Module)"]
+    if domain:
+        match.append("MATCH (ev)-[:ABOUT]->(d:Domain)")
+        where.append("d.name CONTAINS $domain")
+        params["domain"] = domain
+    if host:
+        match.append("MATCH (ev)-[:ABOUT]->(h:Host)")
+        where.append("h.name CONTAINS $host")
+        params["host"] = host
+
+    query = (
+        "\n".join(match)
+        + "\nWHERE "
+        + " AND ".join(where)
+        + "\nRETURN ev.id AS id, ev.type AS type, ev.ts AS ts, m.name AS module, ev.raw AS raw\n"
+        + "ORDER BY ev.ts DESC, ev.id, m.name SKIP $skip LIMIT $limit"
+    )
+    return query, params
+
+
+class Neo4jStore(GraphStore):
+    name = "neo4j"
+    # Schema statements that failed in the last ensure_schema (statement -> error)
+    schema_errors: dict[str, str] = {}
+
+    @property
+    def is_connected(self) -> bool:
+        return neo4j_client.is_connected
+
+    def connect(self) -> None:
+        neo4j_client.connect()
+
+    def ensure_schema(self) -> None:
+        # Each statement on its own: one failing constraint must not leave the rest (and the
+        # retention range indexes) uncreated. Connection errors still propagate.
+        self.schema_errors = {}
+        for stmt in (*CONSTRAINT_STATEMENTS, *RETENTION_INDEXES):
+            try:
+                self._create(stmt)
+            except Neo4jError as exc:
+                self.schema_errors[stmt] = str(exc)
+                logger.error("Schema statement failed: {} ({})", stmt, exc)
+
+    def _create(self, stmt: str) -> None:
+        try:
+            list(neo4j_client.run(stmt))
+        except Neo4jError:
+            key = LATE_CONSTRAINTS.get(stmt)
+            if key is None:
+                raise
+            # Most likely duplicates written before the constraint existed: merge them and retry
+            merged = dedupe_nodes(*key)
+            logger.warning("Merged {} duplicate {}.{} groups before creating its constraint", merged, *key)
+            list(neo4j_client.run(stmt))
+
+    def stats(self) -> dict[str, Any]:
+        stats = super().stats()
+        if self.schema_errors:
+            stats["schema_errors"] = dict(self.schema_errors)
+        return stats
+
+    def write_rows(self, nodes: list[NodeRow], rels: list[RelRow]) -> int:
+        return neo4j_client.run_write_batch(batch_statements(nodes, rels))
+
+    def node_keys(self, label: str, prop: str, limit: int) -> list[Any]:
+        rows = neo4j_client.read(
+            f"MATCH (n:`{label}`) WHERE n.`{prop}` IS NOT NULL RETURN n.`{prop}` AS k LIMIT $limit",
+            {"limit": limit},
+        )
+        return [r["k"] for r in rows]
+
+    def upsert_subdomain(self, record: dict[str, Any]) -> None:
+        query = (
+            "MERGE (d:Domain {name: $domain}) "
+            "MERGE (h:Host {fqdn: $host})-[:PART_OF]->(d) "
+            "SET h.status = $status, "
+            "    h.last_seen_ts = $last_seen_ts, "
+            "    h.sources = $sources, "
+            "    h.ports = $ports"
+        )
+        neo4j_client.write(query, record)
+
+    def ingest_event(self, params: dict[str, Any]) -> None:
+        neo4j_client.write(_event_cypher(params), params)
+
+    def query_subdomains(self, domain: str | None, host: str | None, online_only: bool, limit: int, skip: int = 0) -> list[dict]:
+        return neo4j_client.read(*_subdomains_query(domain, host, online_only, limit, skip))
+
+    def iter_subdomains(
+        self,
+        domain: str | None,
+        host: str | None,
+        online_only: bool,
+        limit: int,
+        skip: int = 0,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[dict]:
+        return neo4j_client.stream(*_subdomains_query(domain, host, online_only, limit, skip), cancel=cancel)
+
+    def query_events(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        host: str | None,
+        since_ts: int | None,
+        until_ts: int | None,
+        limit: int,
+        skip: int = 0,
+    ) -> list[dict]:
+        return neo4j_client.read(*_events_query(types, modules, domain, host, since_ts, until_ts, limit, skip))
+
+    def iter_events(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        host: str | None,
+        since_ts: int | None,
+        until_ts: int | None,
+        limit: int,
+        skip: int = 0,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[dict]:
+        return neo4j_client.stream(*_events_query(types, modules, domain, host, since_ts, until_ts, limit, skip), cancel=cancel)
+
+    def rollup_rows(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        since: int,
+        until: int,
+        include_raw: bool,
+    ) -> list[dict]:
+        # Rollups are whole days: a window starting mid-day still takes that day's rollup
+        params: dict[str, Any] = {"since": since // 86400 * 86400, "until": until}
+        where = []
+        if types:
+            where.append("etype IN $types")
+            params["types"] = types
+        if modules:
+            where.append("emodule IN $modules")
+            params["modules"] = modules
+        if domain:
+            where.append("edomain CONTAINS $domain")
+            params["domain"] = domain
+        filters = (" WHERE " + " AND ".join(where)) if where else ""
+
+        rows = list(neo4j_client.read(
+            "MATCH (r:EventRollup) WHERE r.day_ts >= $since AND r.day_ts <= $until "
+            "WITH r.type AS etype, r.module AS emodule, r.domain AS edomain, r.day_ts AS day_ts, r.count AS c"
+            f"{filters} "
+            "RETURN day_ts, etype, emodule, edomain, sum(c) AS count",
+            params,
+        ))
+        if include_raw:
+            # Window on the time the events are bucketed by (``t`` in ROLLUP_FIELDS, the scan ts
+            # when known), as disjoint branches each served by a range index. Event nodes have no
+            # ingested_ts.
+            ts_branch = "MATCH (n:{label}) WHERE n.ts >= $since AND n.ts <= $until RETURN n"
+            ingested_branch = (
+                "MATCH (n:EVENT) WHERE n.ingested_ts >= $since AND n.ingested_ts <= $until "
+                "AND n.ts IS NULL RETURN n"
+            )
+            for label, branches in (("Event", [ts_branch]), ("EVENT", [ts_branch, ingested_branch])):
+                windowed = " UNION ALL ".join(branch.format(label=label) for branch in branches)
+                rows += neo4j_client.read(
+                    f"CALL {{ {windowed} }} "
+                    f"WITH {ROLLUP_FIELDS}{filters} "
+                    "RETURN toInteger(t) / 86400 * 86400 AS day_ts, etype, emodule, edomain, count(*) AS count",
+                    params,
+                )
+        return rows
+
+    def cleanup(self, now_epoch: int) -> dict[str, Any]:
+        return run_retention(now_epoch)
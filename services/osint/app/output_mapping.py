@@ -0,0 +1,365 @@
+"""Pure mapping of BBOT output.json lines to graph nodes and relationships.
+
+This mirrors the per-type Cypher built by ``repository.ingest_output_json_file`` as plain
+tuples, so the same mapping can feed bulk exports and batched writers without a database.
+
+SCAN seed context is kept out of the per-line mapping: a SCAN row carries its ``seeds`` and
+other rows carry ``seed_links`` (the node to attach to every current seed Domain).
+``resolve_seeds`` applies them in file order.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple
+
+
+class NodeRow(NamedTuple):
+    label: str
+    prop: str
+    key: Any
+    # Extra properties SET on the node (None: none)
+    props: dict[str, Any] | None = None
+    # Tags merged into n.tags (None: node tags are not touched)
+    tags: tuple[str, ...] | None = None
+
+
+class RelRow(NamedTuple):
+    start_label: str
+    start_prop: str
+    start_key: Any
+    rel_type: str
+    end_label: str
+    end_prop: str
+    end_key: Any
+
+
+class MappedEvent(NamedTuple):
+    etype: str
+    evid: str
+    nodes: tuple[NodeRow, ...]
+    rels: tuple[RelRow, ...]
+    # SCAN only: seeds that replace the current seed context for following lines
+    seeds: tuple[str, ...] | None = None
+    # (label, prop, key, rel_type) linked to Domain {name: seed} for every current seed
+    seed_links: tuple[tuple[str, str, Any, str], ...] = ()
+
+
+# Key property per label, as used by the importer MERGE statements
+NODE_KEYS: dict[str, str] = {
+    "EVENT": "id",
+    "SCAN": "name",
+    "Domain": "name",
+    "Host": "name",
+    "IP": "addr",
+    "IP_ADDRESS": "addr",
+    "DNS_NAME": "name",
+    "OPEN_TCP_PORT": "endpoint",
+    "TECHNOLOGY": "name",
+    "EMAIL_ADDRESS": "value",
+    "MOBILE_APP": "name",
+    "URL": "value",
+    "URL_UNVERIFIED": "value",
+    "ASN": "number",
+    "FINDING": "id",
+    "STORAGE_BUCKET": "name",
+    "PROTOCOL": "name",
+    "SOCIAL": "handle",
+    "CODE_REPOSITORY": "url",
+}
+
+
+def _valid_key(value: Any) -> bool:
+    # MERGE on a null (or non-primitive) key fails in Neo4j; such entities are dropped
+    return value is not None and isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+class _Builder:
+    def __init__(self, etype: str, evid: str, tags: tuple[str, ...], event_props: dict[str, Any]) -> None:
+        self.etype = etype
+        self.evid = evid
+        self.tags = tags
+        self.nodes: list[NodeRow] = [NodeRow("EVENT", "id", evid, event_props, tags)]
+        self.rels: list[RelRow] = []
+        self.seed_links: list[tuple[str, str, Any, str]] = []
+        self.seeds: tuple[str, ...] | None = None
+
+    def node(self, label: str, key: Any, props: dict[str, Any] | None = None, tagged: bool = False) -> bool:
+        if not _valid_key(key):
+            return False
+        self.nodes.append(NodeRow(label, NODE_KEYS[label], key, props, self.tags if tagged else None))
+        return True
+
+    def main(self, label: str, key: Any, props: dict[str, Any] | None = None, tagged: bool = True) -> bool:
+        ok = self.node(label, key, props, tagged=tagged)
+        if ok:
+            self.rel("EVENT", self.evid, "ABOUT", label, key)
+        return ok
+
+    def rel(self, start_label: str, start_key: Any, rel_type: str, end_label: str, end_key: Any) -> None:
+        if not _valid_key(start_key) or not _valid_key(end_key):
+            return
+        self.rels.append(
+            RelRow(start_label, NODE_KEYS[start_label], start_key, rel_type, end_label, NODE_KEYS[end_label], end_key)
+        )
+
+    def host(self, host: Any, from_label: str | None = None, from_key: Any = None, rel_type: str = "ON_HOST") -> None:
+        if not host or not self.node("Host", host):
+            return
+        if from_label is not None:
+            self.rel(from_label, from_key, rel_type, "Host", host)
+
+    def resolved(self, label: str, key: Any, resolved_hosts: list[Any]) -> None:
+        if not _valid_key(key):
+            return
+        for rip in resolved_hosts:
+            if self.node("IP", rip):
+                self.rel(label, key, "RESOLVES_TO", "IP", rip)
+
+    def seed_link(self, label: str, key: Any, rel_type: str) -> None:
+        if _valid_key(key):
+            self.seed_links.append((label, NODE_KEYS[label], key, rel_type))
+
+    def build(self) -> MappedEvent:
+        return MappedEvent(self.etype, self.evid, tuple(self.nodes), tuple(self.rels), self.seeds, tuple(self.seed_links))
+
+
+def _fallback_evid(etype: str, text: str) -> str:
+    # Stable across processes (built-in hash() is salted per interpreter)
+    return f"{etype}:{hashlib.sha1(text.encode('utf-8', 'ignore')).hexdigest()[:16]}"
+
+
+def map_output_event(ev: dict[str, Any], line: str | None = None) -> MappedEvent | None:
+    """Map one output.json event to nodes/relationships; returns None for unsupported types."""
+    etype = (ev.get("type") or "").upper()
+    raw_data = ev.get("data")
+    data = raw_data if isinstance(raw_data, dict) else {"value": raw_data} if raw_data is not None else {}
+    tags = tuple(ev.get("tags")) if isinstance(ev.get("tags"), list) else ()
+    host = ev.get("host") or data.get("host")
+    resolved_hosts = ev.get("resolved_hosts") if isinstance(ev.get("resolved_hosts"), list) else []
+    # The source line already is the event's JSON; only re-serialize objects without one
+    raw = line if line is not None else json.dumps(ev, ensure_ascii=False, default=str)
+    evid = ev.get("id") or ev.get("uuid") or _fallback_evid(etype, raw)
+
+    event_props: dict[str, Any] = {"type": etype, "raw": raw, "ingested_ts": int(time.time())}
+    if isinstance(ev.get("module"), str):
+        event_props["module"] = ev["module"]
+    ts = ev.get("timestamp")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        event_props["ts"] = float(ts)
+    b = _Builder(etype, str(evid), tags, event_props)
+
+    if etype == "SCAN":
+        scan_name = (data.get("name") or ev.get("name") or ev.get("id") or "").strip()
+        try:
+            seeds = list((data.get("target") or {}).get("seeds") or [])
+        except Exception:
+            seeds = []
+        b.seeds = tuple(str(sd) for sd in seeds)
+        b.main("SCAN", scan_name)
+        for sd in b.seeds:
+            b.node("Domain", sd)
+            b.rel("SCAN", scan_name, "TARGETS", "Domain", sd)
+
+    elif etype == "DNS_NAME":
+        dns_children = ev.get("dns_children") or {}
+        ns_vals = dns_children.get("NS") if isinstance(dns_children, dict) and isinstance(dns_children.get("NS"), list) else []
+        dns_label = ns_vals[0] if ns_vals else (data.get("name") or data.get("host") or host)
+        host_val = data.get("host") or host
+        b.main("DNS_NAME", dns_label)
+        b.host(host_val, "DNS_NAME", dns_label)
+        if host_val:
+            b.resolved("Host", host_val, resolved_hosts)
+            b.seed_link("Host", host_val, "PART_OF")
+
+    elif etype == "OPEN_TCP_PORT":
+        port = ev.get("port") or data.get("port")
+        endpoint = f"{host}:{port}" if host and port else None
+        b.main("OPEN_TCP_PORT", endpoint, {"port": port})
+        b.host(host, "OPEN_TCP_PORT", endpoint)
+        b.resolved("OPEN_TCP_PORT", endpoint, resolved_hosts)
+        if host:
+            b.seed_link("Host", host, "PART_OF")
+
+    elif etype == "TECHNOLOGY":
+        tech = data.get("technology") or data.get("name")
+        b.main("TECHNOLOGY", tech)
+        if host:
+            b.host(host)
+            b.rel("Host", host, "USES_TECH", "TECHNOLOGY", tech)
+            b.resolved("Host", host, resolved_hosts)
+            b.seed_link("Host", host, "PART_OF")
+
+    elif etype == "EMAIL_ADDRESS":
+        email_val = data.get("email") or data.get("value") or ev.get("data")
+        b.main("EMAIL_ADDRESS", email_val)
+        b.host(host, "EMAIL_ADDRESS", email_val)
+        if host:
+            b.resolved("Host", host, resolved_hosts)
+        b.seed_link("EMAIL_ADDRESS", email_val, "OF_DOMAIN")
+
+    elif etype == "MOBILE_APP":
+        app_id = data.get("id") or data.get("name")
+        url = data.get("url")
+        b.main("MOBILE_APP", app_id)
+        if url and b.node("URL", url):
+            b.rel("MOBILE_APP", app_id, "DOWNLOAD_URL", "URL", url)
+        b.seed_link("MOBILE_APP", app_id, "OF_DOMAIN")
+
+    elif etype in ("URL", "URL_UNVERIFIED"):
+        url = data.get("url") or data.get("value") or ev.get("data")
+        b.main(etype, url)
+        b.resolved(etype, url, resolved_hosts)
+        b.host(host, etype, url)
+        b.seed_link(etype, url, "OF_DOMAIN")
+
+    elif etype == "ASN":
+        asn_val = data.get("asn") or data.get("number") or data.get("value")
+        b.main("ASN", str(asn_val).upper().lstrip("AS") if asn_val is not None else None)
+
+    elif etype == "FINDING":
+        desc = data.get("description") or data.get("title") or data.get("name")
+        url = data.get("url")
+        b.main("FINDING", desc)
+        if url and b.node("URL", url):
+            b.rel("FINDING", desc, "RELATED_URL", "URL", url)
+        b.host(host, "FINDING", desc)
+        if host:
+            b.resolved("Host", host, resolved_hosts)
+        b.seed_link("FINDING", desc, "OF_DOMAIN")
+
+    elif etype == "STORAGE_BUCKET":
+        name = data.get("name")
+        url = data.get("url")
+        b.main("STORAGE_BUCKET", name)
+        if url and b.node("URL", url):
+            b.rel("STORAGE_BUCKET", name, "EXPOSED_AT", "URL", url)
+        b.host(host, "STORAGE_BUCKET", name)
+        if host:
+            b.resolved("Host", host, resolved_hosts)
+        b.seed_link("STORAGE_BUCKET", name, "OF_DOMAIN")
+
+    elif etype == "PROTOCOL":
+        proto = data.get("protocol") or data.get("name")
+        port = ev.get("port") or data.get("port")
+        b.main("PROTOCOL", proto)
+        b.host(host, "PROTOCOL", proto)
+        if port and host:
+            endpoint = f"{host}:{port}"
+            if b.node("OPEN_TCP_PORT", endpoint):
+                b.rel("PROTOCOL", proto, "ON_PORT", "OPEN_TCP_PORT", endpoint)
+        if host:
+            b.resolved("Host", host, resolved_hosts)
+        b.seed_link("PROTOCOL", proto, "OF_DOMAIN")
+
+    elif etype == "SOCIAL":
+        platform = data.get("platform") or data.get("name")
+        b.main("SOCIAL", platform)
+        b.host(host, "SOCIAL", platform)
+        b.seed_link("SOCIAL", platform, "OF_DOMAIN")
+
+    elif etype == "CODE_REPOSITORY":
+        repo_url = data.get("url")
+        b.main("CODE_REPOSITORY", repo_url)
+        b.host(host, "CODE_REPOSITORY", repo_url)
+        b.seed_link("CODE_REPOSITORY", repo_url, "OF_DOMAIN")
+
+    elif etype == "IP_ADDRESS":
+        ip_val = data.get("ip") or data.get("addr") or data.get("value")
+        b.main("IP_ADDRESS", ip_val, tagged=False)
+
+    else:
+        # Skip unknown types quietly
+        return None
+
+    return b.build()
+
+
+def parse_output_line(line: str) -> MappedEvent | None:
+    line = line.strip()
+    if not line or not line.startswith("{"):
+        return None
+    try:
+        ev = json.loads(line)
+    except Exception:
+        return None
+    if not isinstance(ev, dict):
+        return None
+    return map_output_event(ev, line)
+
+
+def _iter_whole_file(p: Path) -> Iterator[dict[str, Any]]:
+    # Fallback for non-JSONL files: a JSON array, or an object wrapping a list of events
+    try:
+        obj = json.loads(p.read_text(encoding="utf-8", errors="ignore"))
+    except Exception:
+        return
+    items: list[Any] = []
+    if isinstance(obj, list):
+        items = obj
+    elif isinstance(obj, dict):
+        for key in ("events", "artifacts", "results", "items", "data"):
+            if isinstance(obj.get(key), list):
+                items = obj[key]
+                break
+        if not items:
+            items = [obj]
+    for ev in items:
+        if isinstance(ev, dict):
+            yield ev
+
+
+def iter_output_file(file_path: str | Path) -> Iterator[MappedEvent]:
+    """Yield mapped events of an output.json file (JSON lines, or whole-file JSON fallback)."""
+    p = Path(file_path)
+    if not p.exists() or not p.is_file():
+        return
+    parsed_any_line = False
+    with p.open("r", encoding="utf-8", errors="ignore") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or not line.startswith("{"):
+                continue
+            try:
+                ev = json.loads(line)
+            except Exception:
+                continue
+            if not isinstance(ev, dict):
+                continue
+            parsed_any_line = True
+            mapped = map_output_event(ev, line)
+            if mapped is not None:
+                yield mapped
+    if not parsed_any_line:
+        for ev in _iter_whole_file(p):
+            mapped = map_output_event(ev)
+            if mapped is not None:
+                yield mapped
+
+
+def expand_seed_links(mapped: MappedEvent, seeds: Iterable[str]) -> MappedEvent:
+    """Return ``mapped`` with its seed links materialized against ``seeds``."""
+    if not mapped.seed_links:
+        return mapped
+    seeds = [sd for sd in seeds if _valid_key(sd)]
+    if not seeds:
+        return mapped._replace(seed_links=())
+    nodes = list(mapped.nodes)
+    rels = list(mapped.rels)
+    for sd in seeds:
+        nodes.append(NodeRow("Domain", "name", sd))
+        for label, prop, key, rel_type in mapped.seed_links:
+            rels.append(RelRow(label, prop, key, rel_type, "Domain", "name", sd))
+    return mapped._replace(nodes=tuple(nodes), rels=tuple(rels), seed_links=())
+
+
+def resolve_seeds(events: Iterable[MappedEvent], seeds: Iterable[str] = ()) -> Iterator[MappedEvent]:
+    """Carry SCAN seed context across an ordered stream of mapped events."""
+    current_seeds: list[str] = list(seeds)
+    for mapped in events:
+        if mapped.seeds is not None:
+            current_seeds = list(mapped.seeds)
+        yield expand_seed_links(mapped, current_seeds)
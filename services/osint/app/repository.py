@@ -2,79 +2,61 @@ import contextlib
 import json
 import os
 import tempfile
+import threading
+import time
 from pathlib import Path
 
-from typing import Iterable, Any
-from .neo4j_client import neo4j_client
+from typing import Iterable, Iterator, Any
+
+from loguru import logger
+
+from .ingest_pipeline import iter_output_file_parallel
+from .admission import admitted
+from .ingest_writer import new_import_cache, new_writer
+from .metrics import timed_query
+from . import tracing
+from .output_mapping import iter_output_file, resolve_seeds
 from .models import SubdomainRecord
+from .storage import get_store
 from .config import settings
 
 
+@timed_query("upsert_subdomain")
 def upsert_subdomain(record: SubdomainRecord) -> None:
-    query = (
-        "MERGE (d:Domain {name: $domain}) "
-        "MERGE (h:Host {fqdn: $host})-[:PART_OF]->(d) "
-        "SET h.status = $status, "
-        "    h.last_seen_ts = $last_seen_ts, "
-        "    h.sources = $sources, "
-        "    h.ports = $ports"
-    )
-    # Ensure the write executes by consuming the generator
-    list(neo4j_client.run(query, record.model_dump()))
-
-
-def query_subdomains(domain: str | None = None, host: str | None = None, online_only: bool = False, limit: int = 100) -> Iterable[dict]:
-    where = []
-    params: dict[str, object] = {"limit": limit}
-    if domain:
-        where.append("d.name CONTAINS $domain")
-        params["domain"] = domain
-    if host:
-        where.append("h.name CONTAINS $host")
-        params["host"] = host
-    if online_only:
-        where.append("h.status = 'online'")
-
-    where_clause = ("WHERE " + " AND ".join(where)) if where else ""
-    query = (
-        "MATCH (h:Host)-[:PART_OF]->(d:Domain) "
-        f"{where_clause} "
-        "RETURN d.name AS domain, h.name AS host, h.status AS status, h.last_seen_ts AS last_seen_ts, h.sources AS sources, h.ports AS ports "
-        "ORDER BY h.last_seen_ts DESC "
-        "LIMIT $limit"
-    )
-    return neo4j_client.run(query, params)
+    get_store().upsert_subdomain(record.model_dump())
+
+
+@admitted("read")
+@timed_query("query_subdomains")
+def query_subdomains(
+    domain: str | None = None, host: str | None = None, online_only: bool = False, limit: int = 100, skip: int = 0
+) -> Iterable[dict]:
+    return get_store().query_subdomains(domain, host, online_only, limit, skip)
+
+
+def iter_subdomains(
+    domain: str | None = None,
+    host: str | None = None,
+    online_only: bool = False,
+    limit: int = 100,
+    skip: int = 0,
+    cancel: threading.Event | None = None,
+) -> Iterator[dict]:
+    """``query_subdomains`` yielding rows as the backend fetches them (streamed MCP responses).
+
+    Not admission-controlled: the caller holds a read slot for the life of the stream.
+    """
+    return get_store().iter_subdomains(domain, host, online_only, limit, skip, cancel)
 
 
+@timed_query("ensure_constraints")
 def ensure_constraints() -> None:
-    # Unique constraints for fast MERGE operations
-    for stmt in [
-        "CREATE CONSTRAINT domain_unique IF NOT EXISTS FOR (d:Domain) REQUIRE d.name IS UNIQUE",
-        "CREATE CONSTRAINT host_unique IF NOT EXISTS FOR (h:Host) REQUIRE h.name IS UNIQUE",
-        "CREATE CONSTRAINT ip_unique IF NOT EXISTS FOR (i:IP) REQUIRE i.addr IS UNIQUE",
-        "CREATE CONSTRAINT url_unique IF NOT EXISTS FOR (u:URL) REQUIRE u.value IS UNIQUE",
-        "CREATE CONSTRAINT email_unique IF NOT EXISTS FOR (e:Email) REQUIRE e.value IS UNIQUE",
-        "CREATE CONSTRAINT module_unique IF NOT EXISTS FOR (m:Module) REQUIRE m.name IS UNIQUE",
-        "CREATE CONSTRAINT event_unique IF NOT EXISTS FOR (ev:Event) REQUIRE ev.id IS UNIQUE",
-        "CREATE CONSTRAINT dns_name_unique IF NOT EXISTS FOR (dn:DNS_NAME) REQUIRE dn.name IS UNIQUE",
-        "CREATE CONSTRAINT open_port_unique IF NOT EXISTS FOR (op:OPEN_TCP_PORT) REQUIRE op.endpoint IS UNIQUE",
-        "CREATE CONSTRAINT technology_unique IF NOT EXISTS FOR (t:TECHNOLOGY) REQUIRE t.name IS UNIQUE",
-        "CREATE CONSTRAINT asn_unique IF NOT EXISTS FOR (a:ASN) REQUIRE a.number IS UNIQUE",
-        "CREATE CONSTRAINT protocol_unique IF NOT EXISTS FOR (p:PROTOCOL) REQUIRE p.name IS UNIQUE",
-        "CREATE CONSTRAINT finding_unique IF NOT EXISTS FOR (f:FINDING) REQUIRE f.id IS UNIQUE",
-        "CREATE CONSTRAINT mobile_app_unique IF NOT EXISTS FOR (ma:MOBILE_APP) REQUIRE ma.name IS UNIQUE",
-        "CREATE CONSTRAINT social_unique IF NOT EXISTS FOR (s:SOCIAL) REQUIRE s.handle IS UNIQUE",
-        "CREATE CONSTRAINT org_stub_unique IF NOT EXISTS FOR (og:ORG_STUB) REQUIRE og.name IS UNIQUE",
-        "CREATE CONSTRAINT azure_tenant_unique IF NOT EXISTS FOR (az:AZURE_TENANT) REQUIRE az.id IS UNIQUE",
-        # Additional labels requested
-        "CREATE CONSTRAINT scan_unique IF NOT EXISTS FOR (sc:SCAN) REQUIRE sc.name IS UNIQUE",
-        "CREATE CONSTRAINT storage_bucket_unique IF NOT EXISTS FOR (sb:STORAGE_BUCKET) REQUIRE sb.name IS UNIQUE",
-        "CREATE CONSTRAINT code_repository_unique IF NOT EXISTS FOR (cr:CODE_REPOSITORY) REQUIRE cr.url IS UNIQUE",
-        "CREATE CONSTRAINT email_upper_unique IF NOT EXISTS FOR (e2:EMAIL) REQUIRE e2.value IS UNIQUE",
-    ]:
-        list(neo4j_client.run(stmt))
+    # Unique constraints and retention indexes (no-op for backends without a schema)
+    get_store().ensure_schema()
 
 
+@admitted("write")
+@timed_query("ingest_event")
 def ingest_event(event: dict[str, Any], default_domain: str | None = None) -> None:
     # Normalize
     etype = event.get("type") or "UNKNOWN"
@@ -244,179 +226,11 @@ def ingest_event(event: dict[str, Any], default_domain: str | None = None) -> No
         except Exception:
             pass
 
-    cypher = [
-        "MERGE (m:Module {name: $module})",
-        "MERGE (ev:Event {id: $evid})",
-        "SET ev.type = $etype, ev.ts = $ts, ev.raw = $raw",
-    ]
-
-    if params["domain"]:
-        cypher += [
-            "MERGE (d:Domain {name: $domain})",
-            "MERGE (ev)-[:ABOUT]->(d)",
-        ]
-    if params["host"]:
-        cypher += [
-            "MERGE (h:Host {name: $host})",
-            "SET h.status = coalesce($status, h.status), h.last_seen_ts = $ts, h.sources = coalesce(h.sources, []) + $sources",
-            "MERGE (ev)-[:ABOUT]->(h)",
-        ]
-    if params["ip"]:
-        cypher += [
-            "MERGE (i:IP {addr: $ip})",
-            "MERGE (ev)-[:ABOUT]->(i)",
-        ]
-    if params["url"]:
-        cypher += [
-            "MERGE (u:URL {value: $url})",
-            "MERGE (ev)-[:ABOUT]->(u)",
-        ]
-    if params["email"]:
-        cypher += [
-            "MERGE (e:Email {value: $email})",
-            "MERGE (ev)-[:ABOUT]->(e)",
-        ]
-    
-    # DNS_NAME node
-    if params["dns_name"]:
-        cypher += [
-            "MERGE (dn:DNS_NAME {name: $dns_name})",
-            "SET dn.last_seen_ts = $ts",
-            "MERGE (ev)-[:ABOUT]->(dn)",
-        ]
-    
-    # OPEN_TCP_PORT node
-    if params["open_port_endpoint"]:
-        cypher += [
-            "MERGE (op:OPEN_TCP_PORT {endpoint: $open_port_endpoint})",
-            "SET op.port = $port, op.host = $host, op.last_seen_ts = $ts",
-            "MERGE (ev)-[:ABOUT]->(op)",
-        ]
-        if params["host"]:
-            cypher += ["MERGE (op)-[:ON_HOST]->(h)"]
-    
-    # TECHNOLOGY node
-    if params["technology"]:
-        cypher += [
-            "MERGE (t:TECHNOLOGY {name: $technology})",
-            "MERGE (ev)-[:ABOUT]->(t)",
-        ]
-        if params["host"]:
-            cypher += ["MERGE (h)-[:USES_TECH]->(t)"]
-    
-    if params["port"] and params["host"]:
-        cypher += [
-            "SET h.ports = apoc.coll.toSet(coalesce(h.ports, []) + [$port])",
-        ]
-
-    # ASN node
-    if params["asn_number"]:
-        cypher += [
-            "MERGE (a:ASN {number: $asn_number})",
-            "SET a.name = coalesce($asn_name, a.name)",
-            "MERGE (ev)-[:ABOUT]->(a)",
-        ]
-        if params["ip"]:
-            cypher += [
-                "MERGE (i:IP {addr: $ip})",
-                "MERGE (i)-[:IN_ASN]->(a)",
-            ]
-
-    # PROTOCOL node
-    if params["protocol_name"]:
-        cypher += [
-            "MERGE (pr:PROTOCOL {name: $protocol_name})",
-            "MERGE (ev)-[:ABOUT]->(pr)",
-        ]
-
-    # FINDING node
-    if params["finding_id"]:
-        cypher += [
-            "MERGE (f:FINDING {id: $finding_id})",
-            "SET f.severity = coalesce($finding_severity, f.severity)",
-            "MERGE (ev)-[:ABOUT]->(f)",
-        ]
-        if params["host"]:
-            cypher += ["MERGE (f)-[:ON_HOST]->(h)"]
-
-    # MOBILE_APP node
-    if params["mobile_app_name"]:
-        cypher += [
-            "MERGE (ma:MOBILE_APP {name: $mobile_app_name})",
-            "MERGE (ev)-[:ABOUT]->(ma)",
-        ]
-        if params.get("mobile_app_url"):
-            cypher += [
-                "MERGE (u:URL {value: $mobile_app_url})",
-                "MERGE (ma)-[:DOWNLOAD_URL]->(u)",
-            ]
-
-    # After creating nodes, link resolved IPs by property matches to avoid scope issues
-    if params.get("resolved_ips"):
-        # Link DNS_NAME -> IP
-        if params.get("dns_name"):
-            cypher += [
-                "WITH $dns_name AS dn_name, $resolved_ips AS rips",
-                "MATCH (dn:DNS_NAME {name: dn_name})",
-                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (dn)-[:RESOLVES_TO]->(i)",
-            ]
-        # Link Host -> IP
-        if params.get("host"):
-            cypher += [
-                "WITH $host AS fq, $resolved_ips AS rips",
-                "MATCH (h3:Host {name: fq})",
-                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h3)-[:RESOLVES_TO]->(i)",
-            ]
-        # Link OPEN_TCP_PORT -> IP
-        if params.get("open_port_endpoint"):
-            cypher += [
-                "WITH $open_port_endpoint AS ep, $resolved_ips AS rips",
-                "MATCH (op2:OPEN_TCP_PORT {endpoint: ep})",
-                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (op2)-[:RESOLVES_TO]->(i)",
-            ]
-        # Link URL -> IP
-        if params.get("url"):
-            cypher += [
-                "WITH $url AS uv, $resolved_ips AS rips",
-                "MATCH (u2:URL {value: uv})",
-                "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (u2)-[:RESOLVES_TO]->(i)",
-            ]
-
-    # SOCIAL node
-    if params["social_handle"]:
-        cypher += [
-            "MERGE (s:SOCIAL {handle: $social_handle})",
-            "MERGE (ev)-[:ABOUT]->(s)",
-        ]
-
-
-    # ORG_STUB node
-    if params["org_stub_name"]:
-        cypher += [
-            "MERGE (og:ORG_STUB {name: $org_stub_name})",
-            "MERGE (ev)-[:ABOUT]->(og)",
-        ]
-        if params["domain"]:
-            cypher += ["MERGE (og)-[:OWNS]->(d)"]
-
-    # AZURE_TENANT node
-    if params["azure_tenant_id"]:
-        cypher += [
-            "MERGE (az:AZURE_TENANT {id: $azure_tenant_id})",
-            "MERGE (ev)-[:ABOUT]->(az)",
-        ]
-
-    cypher += [
-        "MERGE (ev)-[:EMITTED_BY]->(m)",
-        # Connect host to domain when both exist
-        "WITH * WHERE $domain IS NOT NULL AND $host IS NOT NULL",
-        "MERGE (h)-[:PART_OF]->(d)",
-    ]
-
-    # Ensure the write executes by consuming the generator
-    list(neo4j_client.run("\n".join(cypher), params))
+    get_store().ingest_event(params)
 
 
+@admitted("read")
+@timed_query("query_events")
 def query_events(
     types: list[str] | None = None,
     modules: list[str] | None = None,
@@ -425,499 +239,130 @@ def query_events(
     since_ts: int | None = None,
     until_ts: int | None = None,
     limit: int = 200,
+    skip: int = 0,
 ) -> Iterable[dict]:
-    where = ["1=1"]
-    params: dict[str, Any] = {"limit": limit}
-    if types:
-        where.append("ev.type IN $types")
-        params["types"] = types
-    if modules:
-        where.append("m.name IN $modules")
-        params["modules"] = modules
-    if since_ts:
-        where.append("ev.ts >= $since_ts")
-        params["since_ts"] = since_ts
-    if until_ts:
-        where.append("ev.ts <= $until_ts")
-        params["until_ts"] = until_ts
-
-    match = ["MATCH (ev:Event)-[:EMITTED_BY]->(m:Module)"]
-    if domain:
-        match.append("MATCH (ev)-[:ABOUT]->(d:Domain)")
-        where.append("d.name CONTAINS $domain")
-        params["domain"] = domain
-    if host:
-        match.append("MATCH (ev)-[:ABOUT]->(h:Host)")
-        where.append("h.name CONTAINS $host")
-        params["host"] = host
-
-    query = (
-        "\n".join(match)
-        + "\nWHERE "
-        + " AND ".join(where)
-        + "\nRETURN ev.id AS id, ev.type AS type, ev.ts AS ts, m.name AS module, ev.raw AS raw\n"
-        + "ORDER BY ev.ts DESC LIMIT $limit"
-    )
-    return neo4j_client.run(query, params)
+    return get_store().query_events(types, modules, domain, host, since_ts, until_ts, limit, skip)
+
+
+def iter_events(
+    types: list[str] | None = None,
+    modules: list[str] | None = None,
+    domain: str | None = None,
+    host: str | None = None,
+    since_ts: int | None = None,
+    until_ts: int | None = None,
+    limit: int = 200,
+    skip: int = 0,
+    cancel: threading.Event | None = None,
+) -> Iterator[dict]:
+    """``query_events`` yielding rows as the backend fetches them (see ``iter_subdomains``)."""
+    return get_store().iter_events(types, modules, domain, host, since_ts, until_ts, limit, skip, cancel)
 
 
+def _bucket_start(day_ts: int, bucket: str) -> int:
+    if bucket == "week":
+        # Epoch day 0 was a Thursday: shift so weeks start on Monday
+        return (day_ts + 3 * 86400) // 604800 * 604800 - 3 * 86400
+    return day_ts
+
+
+@admitted("read")
+@timed_query("query_event_rollups")
+def query_event_rollups(
+    types: list[str] | None = None,
+    modules: list[str] | None = None,
+    domain: str | None = None,
+    since_ts: int | None = None,
+    until_ts: int | None = None,
+    bucket: str = "day",
+    group_by: Iterable[str] = ("type",),
+    include_raw: bool = True,
+    limit: int = 1000,
+) -> list[dict]:
+    """Event counts per time bucket from the EventRollup nodes (plus raw events if asked).
+
+    Rollups hold events already removed by retention, raw events the rest, so together
+    they cover the whole history without double counting.
+    """
+    since = (since_ts or 0) // 86400 * 86400
+    until = until_ts if until_ts is not None else int(time.time()) + 86400
+    rows = get_store().rollup_rows(types, modules, domain, since, until, include_raw)
+
+    dims = [d for d in ("domain", "type", "module") if d in set(group_by)]
+    series: dict[tuple, int] = {}
+    for row in rows:
+        values = {"domain": row["edomain"], "type": row["etype"], "module": row["emodule"]}
+        key = (_bucket_start(int(row["day_ts"]), bucket), *(values[d] for d in dims))
+        series[key] = series.get(key, 0) + int(row["count"] or 0)
+
+    out = []
+    for key in sorted(series)[:limit]:
+        point: dict[str, Any] = {
+            "bucket_ts": key[0],
+            "bucket": time.strftime("%Y-%m-%d", time.gmtime(key[0])),
+        }
+        point.update(zip(dims, key[1:]))
+        point["count"] = series[key]
+        out.append(point)
+    return out
+
+
+def _timed_iter(items: Iterable[Any], total: list[float]) -> Iterator[Any]:
+    """Yield from ``items``, adding the time spent producing them to ``total[0]``."""
+    it = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            total[0] += time.perf_counter() - started
+        yield item
+
+
+@timed_query("ingest_output_json_file")
 def ingest_output_json_file(file_path: str, default_domain: str | None = None) -> int:
     """Read BBOT consolidated output.json as JSON Lines and ingest per custom mapping.
 
-    - Creates main node per type as specified.
+    - Creates main node per type as specified (see ``output_mapping``).
     - Attaches tags from line (if present) onto the main node as a property `tags`.
-    - Uses MERGE to create missing linked objects.
+    - Uses MERGE to create missing linked objects, written in batches of grouped
+      UNWIND statements; keys already committed during this import are skipped.
+
+    Large files are parsed by a process pool (``ingest.parse_processes``) while this
+    process stays the single in-order writer stage carrying SCAN seeds.
 
     Returns number of lines ingested.
     """
     p = Path(file_path)
     if not p.exists() or not p.is_file():
         return 0
-    count = 0
-    current_seeds: list[str] = []
-    parsed_any_line = False
-    with p.open("r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line or not line.startswith("{"):
-                continue
-            try:
-                ev = json.loads(line)
-            except Exception:
-                continue
-            if not isinstance(ev, dict):
-                continue
-            parsed_any_line = True
-
-            etype = (ev.get("type") or "").upper()
-            raw_data = ev.get("data")
-            data = raw_data if isinstance(raw_data, dict) else {"value": raw_data} if raw_data is not None else {}
-            tags = ev.get("tags") if isinstance(ev.get("tags"), list) else []
-            host = ev.get("host") or data.get("host")
-            resolved_hosts = ev.get("resolved_hosts") if isinstance(ev.get("resolved_hosts"), list) else []
-
-            cypher: list[str] = []
-            params: dict[str, Any] = {
-                "tags": tags or [],
-                "evid": ev.get("id") or ev.get("uuid") or f"{etype}:{hash(line)}",
-                "etype": etype,
-                # Store raw event as JSON string (Neo4j property must be primitive/array)
-                "raw": json.dumps(ev, ensure_ascii=False, default=str),
-            }
-
-            # Always create EVENT node first for every line
-            cypher.extend([
-                "MERGE (ev:EVENT {id: $evid})",
-                "SET ev.type = $etype, ev.raw = $raw, ev.tags = apoc.coll.toSet(coalesce(ev.tags, []) + $tags)",
-            ])
-
-            def merge_host_rel(var: str = "h") -> None:
-                nonlocal cypher
-                if host:
-                    cypher.extend([
-                        "MERGE (h:Host {fqdn: $host})",
-                    ])
-
-            def link_resolved_to(node_var: str, rel_type: str = "RESOLVES_TO") -> None:
-                nonlocal cypher
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $resolved AS rips",
-                        f"UNWIND rips AS rip MERGE (i:IP {{addr: rip}}) MERGE ({node_var})-[:{rel_type}]->(i)",
-                    ])
-
-            # Build per-type
-            if etype == "SCAN":
-                scan_name = (data.get("name") or ev.get("name") or ev.get("id") or "").strip()
-                seeds = []
-                try:
-                    tgt = data.get("target") or {}
-                    seeds = tgt.get("seeds") or []
-                except Exception:
-                    seeds = []
-                # Remember seeds for subsequent lines in this file
-                try:
-                    current_seeds = list(seeds)
-                except Exception:
-                    current_seeds = []
-                params.update({"scan_name": scan_name, "seeds": list(seeds)})
-                cypher.extend([
-                    "MERGE (sc:SCAN {name: $scan_name})",
-                    "SET sc.tags = apoc.coll.toSet(coalesce(sc.tags, []) + $tags)",
-                    "WITH sc, $evid AS evid, $seeds AS seeds",
-                    "MATCH (ev:EVENT {id: evid})",
-                    "MERGE (ev)-[:ABOUT]->(sc)",
-                ])
-                if params.get("seeds"):
-                    cypher.extend([
-                        "WITH sc, seeds",
-                        "UNWIND seeds AS sd",
-                        "MERGE (d:Domain {name: sd})",
-                        "MERGE (sc)-[:TARGETS]->(d)",
-                    ])
-
-            elif etype == "DNS_NAME":
-                # Label value from dns_children.NS (first) else data/name/host
-                dns_children = ev.get("dns_children") or {}
-                ns_vals = dns_children.get("NS") if isinstance(dns_children.get("NS"), list) else []
-                dns_label = ns_vals[0] if ns_vals else (data.get("name") or data.get("host") or host)
-                # Host for linkage should come from data (string) if present, else fallback to ev.host
-                host_from_data = data if isinstance(data, str) else (data.get("host") if isinstance(data, dict) else None)
-                host_val = host_from_data or host
-                params.update({"dns_label": dns_label, "host": host_val, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (dn:DNS_NAME {name: $dns_label})",
-                    "SET dn.tags = apoc.coll.toSet(coalesce(dn.tags, []) + $tags)",
-                    "WITH dn MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(dn)",
-                ])
-                if host_val:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (dn)-[:ON_HOST]->(h)"])
-                # Per request, link HOST to IPs from resolved_hosts
-                if host_val and resolved_hosts:
-                    cypher.extend([
-                        "WITH $host AS fq, $resolved AS rips",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h)-[:RESOLVES_TO]->(i)",
-                    ])
-                # Link Host to Domain seeds if present
-                if current_seeds and host_val:
-                    cypher.extend([
-                        "WITH $host AS fq, $scan_seeds AS seeds",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (h)-[:PART_OF]->(d)",
-                    ])
-
-            elif etype == "OPEN_TCP_PORT":
-                port = ev.get("port") or data.get("port")
-                params.update({"port": port, "host": host, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                if host and port:
-                    params["endpoint"] = f"{host}:{port}"
-                else:
-                    params["endpoint"] = None
-                cypher.extend([
-                    "MERGE (op:OPEN_TCP_PORT {endpoint: $endpoint})",
-                    "SET op.port = $port, op.tags = apoc.coll.toSet(coalesce(op.tags, []) + $tags)",
-                    "WITH op MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(op)",
-                ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (op)-[:ON_HOST]->(h)"])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $endpoint AS ep, $resolved AS rips",
-                        "MATCH (op:OPEN_TCP_PORT {endpoint: ep})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (op)-[:RESOLVES_TO]->(i)",
-                    ])
-                # Link Host and Port to Domain seeds if present
-                if current_seeds and host:
-                    cypher.extend([
-                        "WITH $host AS fq, $scan_seeds AS seeds",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (h)-[:PART_OF]->(d)",
-                    ])
-
-            elif etype == "TECHNOLOGY":
-                tech = data.get("technology") or data.get("name")
-                params.update({"tech": tech, "host": host, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (t:TECHNOLOGY {name: $tech})",
-                    "SET t.tags = apoc.coll.toSet(coalesce(t.tags, []) + $tags)",
-                    "WITH t MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(t)",
-                ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (h)-[:USES_TECH]->(t)"])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $host AS fq, $resolved AS rips",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h)-[:RESOLVES_TO]->(i)",
-                    ])
-                # Link Host to Domain seeds if present
-                if current_seeds and host:
-                    cypher.extend([
-                        "WITH $host AS fq, $scan_seeds AS seeds",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (h)-[:PART_OF]->(d)",
-                    ])
-
-            elif etype == "EMAIL_ADDRESS":
-                email_val = data if isinstance(data, str) else (data.get("email") or data.get("value") or ev.get("data"))
-                params.update({"email": email_val, "host": host, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (e:EMAIL_ADDRESS {value: $email})",
-                    "SET e.tags = apoc.coll.toSet(coalesce(e.tags, []) + $tags)",
-                    "WITH e MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(e)",
-                ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (e)-[:ON_HOST]->(h)"])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $host AS fq, $resolved AS rips",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h)-[:RESOLVES_TO]->(i)",
-                    ])
-                # Link EMAIL to Domain seeds if present
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $email AS evl, $scan_seeds AS seeds",
-                        "MATCH (e:EMAIL_ADDRESS {value: evl})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (e)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "MOBILE_APP":
-                app_id = data.get("id") or data.get("name")
-                # Per request, use data.url; if missing, we won't set URL
-                url = data.get("url")
-                params.update({"app_id": app_id, "url": url, "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (ma:MOBILE_APP {name: $app_id})",
-                    "SET ma.tags = apoc.coll.toSet(coalesce(ma.tags, []) + $tags)",
-                    "WITH ma MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(ma)",
-                ])
-                if url:
-                    cypher.extend(["MERGE (u:URL {value: $url})", "MERGE (ma)-[:DOWNLOAD_URL]->(u)"])
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $app_id AS an, $scan_seeds AS seeds",
-                        "MATCH (ma:MOBILE_APP {name: an})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (ma)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype in ("URL", "URL_UNVERIFIED"):
-                # Per request, use `data` as the URL value (string), otherwise data.url/value
-                url = data if isinstance(data, str) else (data.get("url") or data.get("value") or ev.get("data"))
-                params.update({"url": url, "host": host, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    f"MERGE (u:{'URL_UNVERIFIED' if etype=='URL_UNVERIFIED' else 'URL'} {{value: $url}})",
-                    "SET u.tags = apoc.coll.toSet(coalesce(u.tags, []) + $tags)",
-                    "WITH u MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(u)",
-                ])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $url AS uv, $resolved AS rips",
-                        "MATCH (u:URL {value: uv})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (u)-[:RESOLVES_TO]->(i)",
-                    ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (u)-[:ON_HOST]->(h)"])
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $url AS uv, $scan_seeds AS seeds",
-                        "MATCH (u:URL {value: uv})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (u)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "ASN":
-                asn_val = data if isinstance(data, str) else (data.get("asn") or data.get("number") or data.get("value"))
-                params.update({"asn": str(asn_val).upper().lstrip("AS") if asn_val is not None else None})
-                cypher.extend(["MERGE (a:ASN {number: $asn})", "SET a.tags = apoc.coll.toSet(coalesce(a.tags, []) + $tags)",
-                               "WITH a MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(a)"])
-
-            elif etype == "FINDING":
-                desc = (data.get("description") or data.get("title") or data.get("name"))
-                url = data.get("url")
-                params.update({"desc": desc, "url": url, "host": host, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (f:FINDING {id: $desc})",
-                    "SET f.tags = apoc.coll.toSet(coalesce(f.tags, []) + $tags)",
-                    "WITH f MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(f)",
-                ])
-                if url:
-                    cypher.extend(["MERGE (u:URL {value: $url})", "MERGE (f)-[:RELATED_URL]->(u)"])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (f)-[:ON_HOST]->(h)"])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $host AS fq, $resolved AS rips",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h)-[:RESOLVES_TO]->(i)",
-                    ])
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $desc AS fid, $scan_seeds AS seeds",
-                        "MATCH (f:FINDING {id: fid})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (f)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "STORAGE_BUCKET":
-                name = data.get("name")
-                url = data.get("url")
-                params.update({"bucket": name, "url": url, "host": host, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (sb:STORAGE_BUCKET {name: $bucket})",
-                    "SET sb.tags = apoc.coll.toSet(coalesce(sb.tags, []) + $tags)",
-                    "WITH sb MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(sb)",
-                ])
-                if url:
-                    cypher.extend(["MERGE (u:URL {value: $url})", "MERGE (sb)-[:EXPOSED_AT]->(u)"])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (sb)-[:ON_HOST]->(h)"])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $host AS fq, $resolved AS rips",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h)-[:RESOLVES_TO]->(i)",
-                    ])
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $bucket AS bn, $scan_seeds AS seeds",
-                        "MATCH (sb:STORAGE_BUCKET {name: bn})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (sb)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "PROTOCOL":
-                proto = data.get("protocol") or data.get("name")
-                port = ev.get("port") or data.get("port")
-                params.update({"proto": proto, "host": host, "port": port, "resolved": list(resolved_hosts), "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (pr:PROTOCOL {name: $proto})",
-                    "SET pr.tags = apoc.coll.toSet(coalesce(pr.tags, []) + $tags)",
-                    "WITH pr MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(pr)",
-                ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (pr)-[:ON_HOST]->(h)"])
-                if port and host:
-                    cypher.extend([
-                        "WITH $host AS fq, $port AS p",
-                        "WITH fq, p, fq + ':' + toString(p) AS ep",
-                        "MERGE (op:OPEN_TCP_PORT {endpoint: ep})",
-                        "MERGE (pr)-[:ON_PORT]->(op)",
-                    ])
-                if resolved_hosts:
-                    cypher.extend([
-                        "WITH $host AS fq, $resolved AS rips",
-                        "MATCH (h:Host {name: fq})",
-                        "UNWIND rips AS rip MERGE (i:IP {addr: rip}) MERGE (h)-[:RESOLVES_TO]->(i)",
-                    ])
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $proto AS pn, $scan_seeds AS seeds",
-                        "MATCH (pr:PROTOCOL {name: pn})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (pr)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "SOCIAL":
-                platform = data.get("platform") or data.get("name")
-                params.update({"platform": platform, "host": host, "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (s:SOCIAL {handle: $platform})",
-                    "SET s.tags = apoc.coll.toSet(coalesce(s.tags, []) + $tags)",
-                    "WITH s MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(s)",
-                ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (s)-[:ON_HOST]->(h)"])
-                if current_seeds:
-                    cypher.extend([
-                        "WITH $platform AS ph, $scan_seeds AS seeds",
-                        "MATCH (s:SOCIAL {handle: ph})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (s)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "CODE_REPOSITORY":
-                repo_url = data.get("url")
-                params.update({"repo_url": repo_url, "host": host, "scan_seeds": list(current_seeds)})
-                cypher.extend([
-                    "MERGE (cr:CODE_REPOSITORY {url: $repo_url})",
-                    "SET cr.tags = apoc.coll.toSet(coalesce(cr.tags, []) + $tags)",
-                    "WITH cr MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(cr)",
-                ])
-                if host:
-                    cypher.extend(["MERGE (h:Host {name: $host})", "MERGE (cr)-[:ON_HOST]->(h)"])
-                if current_seeds and repo_url:
-                    cypher.extend([
-                        "WITH $repo_url AS ru, $scan_seeds AS seeds",
-                        "MATCH (cr:CODE_REPOSITORY {url: ru})",
-                        "UNWIND seeds AS sd MERGE (d:Domain {name: sd}) MERGE (cr)-[:OF_DOMAIN]->(d)",
-                    ])
-
-            elif etype == "IP_ADDRESS":
-                ip_val = data if isinstance(data, str) else (data.get("ip") or data.get("addr") or data.get("value"))
-                params.update({"ip": ip_val})
-                cypher.extend(["MERGE (i:IP_ADDRESS {addr: $ip})", "WITH i MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(i)"])
-
-            else:
-                # Skip unknown types quietly
-                continue
-
-            # Execute if we have any statements
-            if cypher:
-                list(neo4j_client.run("\n".join(cypher), params))
-                count += 1
-
-    # Fallback: if no JSONL lines parsed, try full-file JSON (array or object)
-    if not parsed_any_line and count == 0:
-        txt = p.read_text(encoding="utf-8", errors="ignore")
+    events = iter_output_file(p)
+    if settings.ingest_parse_processes > 1 and p.stat().st_size >= settings.ingest_parse_min_bytes:
+        events = iter_output_file_parallel(p, settings.ingest_parse_processes)
+    with tracing.span("ingest", file=str(p), bytes=p.stat().st_size) as span:
+        parse_seconds = [0.0]
+        if tracing.enabled():
+            events = _timed_iter(events, parse_seconds)
+        writer = new_writer(new_import_cache())
         try:
-            obj = json.loads(txt)
-        except Exception:
-            return 0
-        items: list[Any] = []
-        if isinstance(obj, list):
-            items = obj
-        elif isinstance(obj, dict):
-            for key in ("events", "artifacts", "results", "items", "data"):
-                if isinstance(obj.get(key), list):
-                    items = obj[key]
-                    break
-            if not items:
-                items = [obj]
-        for ev in items:
-            if not isinstance(ev, dict):
-                continue
-            etype = (ev.get("type") or "").upper()
-            raw_data = ev.get("data")
-            data = raw_data if isinstance(raw_data, dict) else {"value": raw_data} if raw_data is not None else {}
-            tags = ev.get("tags") if isinstance(ev.get("tags"), list) else []
-            host = ev.get("host") or data.get("host")
-            resolved_hosts = ev.get("resolved_hosts") if isinstance(ev.get("resolved_hosts"), list) else []
-            cypher: list[str] = []
-            params: dict[str, Any] = {
-                "tags": tags or [],
-                "evid": ev.get("id") or ev.get("uuid") or f"{etype}:{abs(hash(json.dumps(ev, default=str)))%10**8}",
-                "etype": etype,
-                "raw": json.dumps(ev, ensure_ascii=False, default=str),
-            }
-            cypher.extend([
-                "MERGE (ev:EVENT {id: $evid})",
-                "SET ev.type = $etype, ev.raw = $raw, ev.tags = apoc.coll.toSet(coalesce(ev.tags, []) + $tags)",
-            ])
-            # Reuse same per-type builder as above (duplicated minimally)
-            # For brevity, handle main common types here
-            if etype == "SCAN":
-                scan_name = (data.get("name") or ev.get("name") or ev.get("id") or "").strip()
-                seeds = []
-                try:
-                    tgt = data.get("target") or {}
-                    seeds = tgt.get("seeds") or []
-                except Exception:
-                    seeds = []
-                current_seeds = list(seeds)
-                params.update({"scan_name": scan_name, "seeds": list(seeds)})
-                cypher += [
-                    "MERGE (sc:SCAN {name: $scan_name})",
-                    "SET sc.tags = apoc.coll.toSet(coalesce(sc.tags, []) + $tags)",
-                    "WITH sc, $evid AS evid, $seeds AS seeds",
-                    "MATCH (ev:EVENT {id: evid})",
-                    "MERGE (ev)-[:ABOUT]->(sc)",
-                ]
-                if seeds:
-                    cypher += [
-                        "UNWIND seeds AS sd",
-                        "MERGE (d:Domain {name: sd})",
-                        "MERGE (sc)-[:TARGETS]->(d)",
-                    ]
-            elif etype == "URL":
-                url = data if isinstance(data, str) else (data.get("url") or data.get("value") or ev.get("data"))
-                params.update({"url": url, "host": host})
-                cypher += [
-                    "MERGE (u:URL {value: $url})",
-                    "SET u.tags = apoc.coll.toSet(coalesce(u.tags, []) + $tags)",
-                    "WITH u MATCH (ev:EVENT {id: $evid}) MERGE (ev)-[:ABOUT]->(u)",
-                ]
-            # Execute
-            if cypher:
-                list(neo4j_client.run("\n".join(cypher), params))
-                count += 1
-    return count
+            for mapped in resolve_seeds(events):
+                writer.add(mapped)
+        finally:
+            writer.close()
+        stats = writer.stats()
+        span.set("events", stats["events"])
+        span.set("batches", stats["batches"])
+        # Parsing interleaves with the batch writes: report its cumulative time as one span
+        tracing.record_span(
+            "parse", span.start_ns, span.start_ns + int(parse_seconds[0] * 1e9), parent=span, cumulative=True
+        )
+    logger.info(
+        "Ingested {} events from {} in {} batches (cache hit rate {:.1%}, skipped {} nodes / {} rels, {} retries)",
+        stats["events"], p, stats["batches"], stats["cache_hit_rate"], stats["skipped_nodes"], stats["skipped_rels"], stats["retries"],
+    )
+    return writer.events
 
 
 def ingest_output_json_bytes(payload: bytes, default_domain: str | None = None) -> int:
@@ -931,41 +376,12 @@ def ingest_output_json_bytes(payload: bytes, default_domain: str | None = None)
             os.unlink(tmp_path)
 
 
+@timed_query("cleanup_graph")
 def cleanup_graph(now_epoch: int) -> dict:
-    stats: dict[str, int] = {
-        "deleted_events": 0,
-        "deleted_offline_hosts": 0,
-        "deleted_orphans": 0,
-    }
+    """Apply the retention policy (see ``retention``); runs in batches until nothing expired is left."""
     if not settings.cleanup_enabled:
-        return stats
-
-    # Delete old events
-    if settings.event_retention_days > 0:
-        threshold = now_epoch - settings.event_retention_days * 86400
-        for _ in neo4j_client.run(
-            "MATCH (ev:Event) WHERE ev.ts IS NOT NULL AND ev.ts < $threshold WITH ev LIMIT 10000 DETACH DELETE ev RETURN 1",
-            {"threshold": threshold},
-        ):
-            stats["deleted_events"] += 1
-
-    # Delete offline hosts older than retention
-    if settings.offline_host_retention_days > 0:
-        threshold_h = now_epoch - settings.offline_host_retention_days * 86400
-        for _ in neo4j_client.run(
-            "MATCH (h:Host) WHERE h.status = 'offline' AND h.last_seen_ts IS NOT NULL AND h.last_seen_ts < $threshold WITH h LIMIT 10000 DETACH DELETE h RETURN 1",
-            {"threshold": threshold_h},
-        ):
-            stats["deleted_offline_hosts"] += 1
-
-    # Remove orphaned nodes (no relationships)
-    if settings.orphan_cleanup_enabled:
-        for _ in neo4j_client.run(
-            "MATCH (n) WHERE NOT (n)--() WITH n LIMIT 10000 DETACH DELETE n RETURN 1"
-        ):
-            stats["deleted_orphans"] += 1
-
-    return stats
+        return {"deleted_events": 0, "deleted_offline_hosts": 0, "deleted_orphans": 0}
+    return get_store().cleanup(now_epoch)
 
 
 
@@ -1036,10 +452,7 @@ def _is_sub_of_domain(domain: str, name: str) -> bool:
 # Heuristic target dir finder removed: importer relies on directory diff or exact name
 
 
-def find_scan_dirs_by_name(scan_name: str, max_dirs: int = 1, max_age_seconds: int = 7200) -> list[Path]:
-    """Return scan directories matching the exact BBOT scan name.
-    Matches directory name equals scan_name, or scan.log contains 'Scan <scan_name>'.
-    """
+def _walk_scan_dirs_by_name(scan_name: str) -> list[tuple[Path, float]]:
     results: list[tuple[Path, float]] = []
     for root in _get_scan_roots():
         for d in root.iterdir():
@@ -1059,13 +472,37 @@ def find_scan_dirs_by_name(scan_name: str, max_dirs: int = 1, max_age_seconds: i
                 except Exception:
                     pass
                 results.append((d, mtime))
+    return results
+
+
+def find_scan_dirs_by_name(scan_name: str, max_dirs: int = 1, max_age_seconds: int = 7200) -> list[Path]:
+    """Return scan directories matching the exact BBOT scan name.
+    Looks the name up in the persistent scan index first, then in the scan dir watcher
+    registry when it is running; otherwise walks the roots and matches directory name
+    equals scan_name, or scan.log contains 'Scan <scan_name>'.
+    """
+    from .scan_index import scan_index
+    from .scan_watcher import scan_dir_watcher
+
+    results: list[tuple[Path, float]] = []
+    try:
+        row = scan_index.get(scan_name)
+    except Exception as exc:
+        logger.debug("Scan index lookup failed for {}: {}", scan_name, exc)
+        row = None
+    if row and row.get("dir") and Path(row["dir"]).is_dir():
+        results.append((Path(row["dir"]), row.get("finished_at") or row.get("started_at") or 0.0))
+    elif scan_dir_watcher.running:
+        # Live registry: BBOT names the scan dir after the scan, no directory walk needed
+        info = scan_dir_watcher.get(scan_name)
+        if info is not None:
+            results.append((info.path, info.mtime))
+    else:
+        results = _walk_scan_dirs_by_name(scan_name)
     # filter by age if requested
     if max_age_seconds > 0 and results:
-        try:
-            now_m = max(Path("/").stat().st_mtime, max(m for _, m in results))
-        except Exception:
-            now_m = max(m for _, m in results)
-        results = [(p, m) for (p, m) in results if (now_m - m) <= max_age_seconds]
+        now = time.time()
+        results = [(p, m) for (p, m) in results if (now - m) <= max_age_seconds]
     results.sort(key=lambda x: x[1], reverse=True)
     return [p for p, _ in results[:max_dirs]]
 
@@ -0,0 +1,196 @@
+"""Batched retention for the graph.
+
+Expired nodes are found through a range index on their timestamp property and deleted in
+bounded batches, one write transaction per batch, until none are left. Every batch returns the
+element ids of the deleted nodes' neighbours; those are the only nodes that can have become
+orphans, so the orphan pass checks just these candidates instead of scanning the whole graph.
+
+Retention rules (all timestamps are epoch seconds):
+
+- ``:Event`` (per-event ingest path) by ``ts``
+- ``:EVENT`` (output.json importer) by ``ingested_ts``, stamped by the importer mapping;
+  older nodes without it are stamped with the current time once, so they expire one
+  retention period after the upgrade
+- offline ``:Host`` by ``last_seen_ts``
+- ``:EventRollup`` by ``day_ts`` (only when ``rollup_retention_days`` > 0)
+
+Expiring events are not simply dropped: unless ``event_rollup_enabled`` is off, the same
+transaction that deletes a batch first adds it to per (domain, type, module, day)
+``:EventRollup`` counters, so long-term trends survive while raw events are bounded.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+
+from .config import settings
+from .neo4j_client import neo4j_client
+
+
+@dataclass(frozen=True)
+class RetentionRule:
+    stat: str
+    label: str
+    prop: str
+    # Extra predicate on the matched node ``n`` (evaluated after the indexed range filter)
+    where: str = ""
+
+
+EVENT_RULES = (
+    RetentionRule("deleted_events", "Event", "ts"),
+    RetentionRule("deleted_events", "EVENT", "ingested_ts"),
+)
+OFFLINE_HOST_RULE = RetentionRule("deleted_offline_hosts", "Host", "last_seen_ts", "n.status = 'offline'")
+ROLLUP_RULE = RetentionRule("deleted_rollups", "EventRollup", "day_ts")
+
+# Range indexes backing the retention predicates (created with the constraints)
+INDEX_STATEMENTS = (
+    "CREATE INDEX event_ts IF NOT EXISTS FOR (n:Event) ON (n.ts)",
+    "CREATE INDEX event_ingested_ts IF NOT EXISTS FOR (n:EVENT) ON (n.ingested_ts)",
+    # Scan time of importer events: the rollup time window (see ROLLUP_FIELDS)
+    "CREATE INDEX raw_event_ts IF NOT EXISTS FOR (n:EVENT) ON (n.ts)",
+    "CREATE INDEX host_last_seen_ts IF NOT EXISTS FOR (n:Host) ON (n.last_seen_ts)",
+    "CREATE CONSTRAINT event_rollup_unique IF NOT EXISTS FOR (r:EventRollup) REQUIRE r.key IS UNIQUE",
+    "CREATE INDEX event_rollup_day IF NOT EXISTS FOR (r:EventRollup) ON (r.day_ts)",
+)
+
+# Rollup dimensions of an event node ``n`` (either label): the Event ingest path links its
+# Module and Domain; importer EVENT nodes carry ``module`` and reach the seed Domain through
+# the node they are ABOUT.
+ROLLUP_FIELDS = (
+    "coalesce(n.type, 'UNKNOWN') AS etype, "
+    "coalesce(n.module, head([(n)-[:EMITTED_BY]->(mod:Module) | mod.name]), 'unknown') AS emodule, "
+    "coalesce(head([(n)-[:ABOUT]->(dom:Domain) | dom.name]), "
+    "head([(n)-[:ABOUT]->()-[*1..2]->(dom:Domain) | dom.name]), '') AS edomain, "
+    "coalesce(n.ts, n.ingested_ts) AS t"
+)
+
+_stamped = False
+
+
+def _delete_statement(rule: RetentionRule, rollup: bool = False) -> str:
+    extra = f" AND {rule.where}" if rule.where else ""
+    head = f"MATCH (n:{rule.label}) WHERE n.{rule.prop} < $threshold{extra} WITH n LIMIT $batch "
+    if not rollup:
+        return head + (
+            "OPTIONAL MATCH (n)--(m) "
+            "WITH n, collect(DISTINCT elementId(m)) AS neighbours "
+            "DETACH DELETE n "
+            "RETURN neighbours"
+        )
+    # Fold the batch into its rollups in the same transaction, so a retried batch counts once
+    return head + (
+        f"WITH n, [(n)--(m) | elementId(m)] AS neighbours, {ROLLUP_FIELDS} "
+        "WITH etype, emodule, edomain, toInteger(t) / 86400 * 86400 AS day_ts, "
+        "collect({n: n, neighbours: neighbours}) AS rows, count(*) AS c, min(t) AS first_ts, max(t) AS last_ts "
+        "MERGE (r:EventRollup {key: edomain + '|' + etype + '|' + emodule + '|' + toString(day_ts)}) "
+        "ON CREATE SET r.domain = edomain, r.type = etype, r.module = emodule, r.day_ts = day_ts, "
+        "r.day = toString(date(datetime({epochSeconds: day_ts}))), r.count = 0, "
+        "r.first_ts = first_ts, r.last_ts = last_ts "
+        "SET r.count = r.count + c, "
+        "r.first_ts = CASE WHEN first_ts < r.first_ts THEN first_ts ELSE r.first_ts END, "
+        "r.last_ts = CASE WHEN last_ts > r.last_ts THEN last_ts ELSE r.last_ts END "
+        "WITH rows UNWIND rows AS row "
+        "WITH row.n AS n, row.neighbours AS neighbours "
+        "DETACH DELETE n "
+        "RETURN neighbours"
+    )
+
+
+_ORPHAN_STATEMENT = (
+    "UNWIND $ids AS id "
+    "MATCH (n) WHERE elementId(n) = id AND NOT (n)--() "
+    "DETACH DELETE n "
+    "RETURN count(n) AS deleted"
+)
+
+_STAMP_STATEMENT = (
+    "MATCH (n:EVENT) WHERE n.ingested_ts IS NULL "
+    "WITH n LIMIT $batch "
+    "SET n.ingested_ts = $now "
+    "RETURN count(n) AS stamped"
+)
+
+
+class RetentionRun:
+    """One retention pass; ``stats`` keeps the counters reported by ``cleanup_graph``."""
+
+    def __init__(self, now_epoch: int, batch_size: int | None = None) -> None:
+        self.now = now_epoch
+        self.batch = max(1, batch_size or settings.retention_batch_size)
+        self.candidates: set[str] = set()
+        self.stats: dict[str, Any] = {
+            "deleted_events": 0,
+            "deleted_offline_hosts": 0,
+            "deleted_orphans": 0,
+            "deleted_rollups": 0,
+            "stamped_events": 0,
+            "batches": 0,
+        }
+
+    def stamp_ingest_time(self) -> None:
+        """Give pre-existing EVENT nodes an ``ingested_ts`` (once per process)."""
+        global _stamped
+        if _stamped:
+            return
+        while True:
+            rows = neo4j_client.write(_STAMP_STATEMENT, {"batch": self.batch, "now": self.now})
+            self.stats["batches"] += 1
+            stamped = int(rows[0]["stamped"]) if rows else 0
+            self.stats["stamped_events"] += stamped
+            if stamped < self.batch:
+                break
+        _stamped = True
+
+    def expire(self, rule: RetentionRule, threshold: float, rollup: bool = False) -> int:
+        cypher = _delete_statement(rule, rollup)
+        deleted = 0
+        while True:
+            rows = neo4j_client.write(cypher, {"threshold": threshold, "batch": self.batch})
+            self.stats["batches"] += 1
+            deleted += len(rows)
+            for row in rows:
+                self.candidates.update(row["neighbours"])
+            if settings.orphan_cleanup_enabled and len(self.candidates) >= self.batch * 10:
+                self.delete_orphans()
+            if len(rows) < self.batch:
+                break
+        self.stats[rule.stat] += deleted
+        if deleted:
+            logger.debug("Retention removed {} {} nodes ({} < {})", deleted, rule.label, rule.prop, threshold)
+        return deleted
+
+    def delete_orphans(self) -> int:
+        """Delete the candidates that no longer have any relationship."""
+        ids = list(self.candidates)
+        self.candidates.clear()
+        deleted = 0
+        for i in range(0, len(ids), self.batch):
+            rows = neo4j_client.write(_ORPHAN_STATEMENT, {"ids": ids[i:i + self.batch]})
+            self.stats["batches"] += 1
+            deleted += int(rows[0]["deleted"]) if rows else 0
+        self.stats["deleted_orphans"] += deleted
+        return deleted
+
+
+def run_retention(now_epoch: int, batch_size: int | None = None) -> dict[str, Any]:
+    """Apply the retention policy until nothing expired is left; returns deletion stats."""
+    started = time.monotonic()
+    run = RetentionRun(now_epoch, batch_size)
+    if settings.event_retention_days > 0:
+        run.stamp_ingest_time()
+        threshold = now_epoch - settings.event_retention_days * 86400
+        for rule in EVENT_RULES:
+            run.expire(rule, threshold, rollup=settings.event_rollup_enabled)
+    if settings.offline_host_retention_days > 0:
+        run.expire(OFFLINE_HOST_RULE, now_epoch - settings.offline_host_retention_days * 86400)
+    if settings.rollup_retention_days > 0:
+        run.expire(ROLLUP_RULE, now_epoch - settings.rollup_retention_days * 86400)
+    if settings.orphan_cleanup_enabled:
+        run.delete_orphans()
+    run.stats["seconds"] = round(time.monotonic() - started, 3)
+    return run.stats
@@ -0,0 +1,179 @@
+"""Persistent index of scan directories (SQLite under the scans root).
+
+One row per BBOT scan, keyed by scan name: directory, target, start/finish time, event count,
+output.json size and ingest/upload status. The scheduler writes the row when a scan starts and
+finishes, so mapping a scan name to its directory is a primary-key lookup instead of a search
+through every ``scan.log``. The same database keeps the per-target adaptive rescan state.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    name TEXT PRIMARY KEY,
+    dir TEXT,
+    target TEXT,
+    started_at REAL,
+    finished_at REAL,
+    status TEXT,
+    event_count INTEGER DEFAULT 0,
+    output_size INTEGER DEFAULT 0,
+    import_status TEXT DEFAULT 'pending',
+    imported_records INTEGER DEFAULT 0,
+    startup_seconds REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS scans_started_at ON scans(started_at);
+CREATE INDEX IF NOT EXISTS scans_target ON scans(target);
+CREATE TABLE IF NOT EXISTS target_schedule (
+    target TEXT PRIMARY KEY,
+    interval REAL,
+    next_run REAL,
+    last_scan_at REAL,
+    change_rate REAL,
+    surface TEXT
+);
+"""
+
+
+def default_index_path() -> Path:
+    if settings.scan_index_path:
+        return Path(settings.scan_index_path)
+    return Path(os.path.expanduser("~/.bbot/scans")) / ".scan_index.sqlite3"
+
+
+class ScanIndex:
+    def __init__(self, path: str | Path | None = None) -> None:
+        self._path = Path(path) if path else None
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path or default_index_path()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Columns added after the first release of the index
+            existing = {r["name"] for r in conn.execute("PRAGMA table_info(scans)")}
+            for column, decl in (("startup_seconds", "REAL"),):
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE scans ADD COLUMN {column} {decl}")
+            self._conn = conn
+        return self._conn
+
+    def _upsert(self, name: str, **fields: Any) -> None:
+        fields = {k: v for k, v in fields.items() if v is not None}
+        fields["updated_at"] = time.time()
+        cols = ["name", *fields]
+        sets = ", ".join(f"{c}=excluded.{c}" for c in fields)
+        sql = (
+            f"INSERT INTO scans ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+            f"ON CONFLICT(name) DO UPDATE SET {sets}"
+        )
+        with self._lock:
+            self._db().execute(sql, [name, *fields.values()])
+
+    def record_start(
+        self,
+        name: str,
+        target: str | None = None,
+        started_at: float | None = None,
+        scan_dir: str | None = None,
+        startup_seconds: float | None = None,
+    ) -> None:
+        self._upsert(
+            name,
+            target=target,
+            started_at=started_at or time.time(),
+            status="running",
+            dir=scan_dir,
+            startup_seconds=startup_seconds,
+        )
+
+    def record_finish(
+        self,
+        name: str,
+        status: str = "finished",
+        event_count: int | None = None,
+        finished_at: float | None = None,
+        scan_dir: str | None = None,
+        output_size: int | None = None,
+    ) -> None:
+        self._upsert(
+            name,
+            status=status,
+            event_count=event_count,
+            finished_at=finished_at or time.time(),
+            dir=scan_dir,
+            output_size=output_size,
+        )
+
+    def record_import(self, name: str, import_status: str, records: int | None = None, scan_dir: str | None = None, output_size: int | None = None) -> None:
+        """``import_status``: ingested, uploaded, live, failed or skipped."""
+        self._upsert(name, import_status=import_status, imported_records=records, dir=scan_dir, output_size=output_size)
+
+    def get(self, name: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM scans WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, limit: int = 50, offset: int = 0, target: str | None = None, status: str | None = None) -> list[dict[str, Any]]:
+        where, params = [], []
+        if target:
+            where.append("target = ?")
+            params.append(target)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        sql = "SELECT * FROM scans"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY started_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._db().execute(sql, [*params, limit, offset]).fetchall()
+        return [dict(r) for r in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._db().execute("SELECT COUNT(*) FROM scans").fetchone()[0])
+
+    def get_target_state(self, target: str) -> dict[str, Any] | None:
+        """Adaptive schedule state of a target (see ``adaptive_schedule``)."""
+        with self._lock:
+            row = self._db().execute("SELECT * FROM target_schedule WHERE target = ?", (target,)).fetchone()
+        if not row:
+            return None
+        state = dict(row)
+        state["surface"] = json.loads(state["surface"] or "[]")
+        return state
+
+    def save_target_state(self, target: str, **fields: Any) -> None:
+        fields["surface"] = json.dumps(list(fields.get("surface") or ()))
+        cols = ["target", *fields]
+        sets = ", ".join(f"{c}=excluded.{c}" for c in fields)
+        sql = (
+            f"INSERT INTO target_schedule ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+            f"ON CONFLICT(target) DO UPDATE SET {sets}"
+        )
+        with self._lock:
+            self._db().execute(sql, [target, *fields.values()])
+
+
+# Global index instance
+scan_index = ScanIndex()
@@ -0,0 +1,287 @@
+"""Run BBOT scans in an isolated child process.
+
+The child (``python -m app.scan_process``) applies CPU/memory rlimits to itself, builds the
+scanner from the request it reads on stdin and streams events back over a dedicated pipe as
+length-prefixed frames::
+
+    kind (1 byte) | length (4 bytes, big endian) | payload
+
+``E`` frames carry one event as JSON, ``X`` an error message and ``D`` the final summary.
+The parent enforces the wall-clock timeout and kills the child's whole process group (BBOT
+spawns its own helpers) on timeout, error or when the consumer stops early.
+
+Children import BBOT before reading their request, so with ``scan_runner.prewarm`` > 0 a few
+idle children are kept ready and a scan skips interpreter start-up and the BBOT import.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from loguru import logger
+
+from .config import settings
+from .models import ScanRequest
+
+_HEADER = struct.Struct(">cI")
+FRAME_EVENT = b"E"
+FRAME_ERROR = b"X"
+FRAME_DONE = b"D"
+
+# Bounds concurrent child scans (each one may use a full core)
+_slots: asyncio.Semaphore | None = None
+# Idle pre-spawned children: (process, read end of its frame pipe)
+_warm: list[tuple[asyncio.subprocess.Process, int]] = []
+_refill_task: asyncio.Task | None = None
+
+
+class ScanProcessError(RuntimeError):
+    pass
+
+
+def _dumps(obj: Any) -> bytes:
+    try:
+        import orjson
+
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    except ImportError:
+        return json.dumps(obj, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    try:
+        import orjson
+
+        return orjson.loads(data)
+    except ImportError:
+        return json.loads(data)
+
+
+def _frame(kind: bytes, payload: bytes) -> bytes:
+    return _HEADER.pack(kind, len(payload)) + payload
+
+
+def _kill_group(proc: asyncio.subprocess.Process, sig: int) -> None:
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _terminate(proc: asyncio.subprocess.Process, grace: float = 5.0) -> None:
+    if proc.returncode is not None:
+        return
+    _kill_group(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), grace)
+    except asyncio.TimeoutError:
+        _kill_group(proc, signal.SIGKILL)
+        await proc.wait()
+
+
+async def _spawn() -> tuple[asyncio.subprocess.Process, int]:
+    read_fd, write_fd = os.pipe()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "app.scan_process", "--fd", str(write_fd),
+            stdin=asyncio.subprocess.PIPE,
+            pass_fds=(write_fd,),
+            cwd=str(Path(__file__).resolve().parent.parent),
+            start_new_session=True,
+        )
+    except BaseException:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    return proc, read_fd
+
+
+async def _refill() -> None:
+    while len(_warm) < settings.scan_prewarm:
+        try:
+            _warm.append(await _spawn())
+        except Exception as exc:
+            logger.warning("Failed to pre-spawn scan process: {}", exc)
+            return
+
+
+async def _acquire() -> tuple[asyncio.subprocess.Process, int, bool]:
+    """A child for the next scan: an idle pre-spawned one when available, else a fresh one."""
+    child = None
+    while _warm:
+        proc, read_fd = _warm.pop(0)
+        if proc.returncode is None:
+            child = (proc, read_fd, True)
+            break
+        os.close(read_fd)
+    if child is None:
+        proc, read_fd = await _spawn()
+        child = (proc, read_fd, False)
+    start_warm_pool()
+    return child
+
+
+def start_warm_pool() -> None:
+    """Top the pool of idle pre-spawned children up to SCAN_PREWARM in the background."""
+    global _refill_task
+    if settings.scan_prewarm > 0 and (_refill_task is None or _refill_task.done()):
+        _refill_task = asyncio.create_task(_refill())
+
+
+async def close_warm_pool() -> None:
+    if _refill_task is not None and not _refill_task.done():
+        _refill_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _refill_task
+    while _warm:
+        proc, read_fd = _warm.pop()
+        os.close(read_fd)
+        await _terminate(proc, grace=2.0)
+
+
+async def async_start_scan_process(
+    req: ScanRequest,
+    timeout: float | None = None,
+    cpu_seconds: int | None = None,
+    memory_mb: int | None = None,
+) -> AsyncIterator[dict]:
+    """Run ``req`` in a child process and yield its events as output.json-style dicts."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(max(1, settings.max_concurrent_scans))
+    timeout = settings.scan_timeout_seconds if timeout is None else timeout
+    payload = {
+        "request": req.model_dump(),
+        "settings": {
+            "bbot_modules": settings.bbot_modules,
+            "bbot_disable_modules": settings.bbot_disable_modules,
+        },
+        "limits": {
+            "cpu_seconds": settings.scan_cpu_seconds if cpu_seconds is None else cpu_seconds,
+            "memory_mb": settings.scan_memory_mb if memory_mb is None else memory_mb,
+        },
+    }
+    async with _slots:
+        proc, read_fd, warm = await _acquire()
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=1 << 24)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, "rb", 0)
+        )
+        deadline = time.monotonic() + timeout if timeout and timeout > 0 else None
+        started = time.monotonic()
+        events = 0
+        done = False
+        try:
+            proc.stdin.write(_dumps(payload))
+            await proc.stdin.drain()
+            proc.stdin.close()
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    header = await asyncio.wait_for(reader.readexactly(_HEADER.size), remaining)
+                except asyncio.IncompleteReadError:
+                    break  # child exited (or closed the pipe) without a DONE frame
+                kind, length = _HEADER.unpack(header)
+                body = await asyncio.wait_for(reader.readexactly(length), remaining)
+                if kind == FRAME_EVENT:
+                    events += 1
+                    yield _loads(body)
+                elif kind == FRAME_ERROR:
+                    raise ScanProcessError(body.decode("utf-8", "replace"))
+                elif kind == FRAME_DONE:
+                    done = True
+                    break
+        except asyncio.TimeoutError:
+            logger.warning("Scan process {} exceeded {}s wall-clock timeout; killing it", proc.pid, timeout)
+            await _terminate(proc, grace=2.0)
+            raise ScanProcessError(f"scan timed out after {timeout}s ({events} events)")
+        finally:
+            transport.close()
+            if not done:
+                await _terminate(proc)
+        code = await proc.wait()
+        logger.info(
+            "Scan process {} ({}) finished: {} events in {:.1f}s",
+            proc.pid, "pre-warmed" if warm else "cold", events, time.monotonic() - started,
+        )
+        if not done or code != 0:
+            # e.g. SIGXCPU/SIGKILL from the rlimits, or an unhandled crash
+            raise ScanProcessError(f"scan process exited with code {code} after {events} events")
+
+
+def _apply_limits(cpu_seconds: int, memory_mb: int) -> None:
+    import resource
+
+    if cpu_seconds and cpu_seconds > 0:
+        # Soft limit delivers SIGXCPU; the hard limit a few seconds later is a SIGKILL backstop
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+    if memory_mb and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+async def _child_main(fd: int) -> int:
+    # Import BBOT before blocking on the request: this is what a pre-warmed child saves.
+    # bbot_runner imports it lazily, so load it explicitly here.
+    import bbot.scanner  # noqa: F401
+
+    from .bbot_runner import _event_to_dict, build_scanner
+
+    raw = sys.stdin.buffer.read()
+    if not raw:
+        return 0  # idle pre-warmed child released without a scan
+    payload = _loads(raw)
+    limits = payload.get("limits") or {}
+    _apply_limits(int(limits.get("cpu_seconds") or 0), int(limits.get("memory_mb") or 0))
+    for key, value in (payload.get("settings") or {}).items():
+        setattr(settings, key, value)
+
+    out = os.fdopen(fd, "wb", buffering=1 << 16)
+    events = 0
+    try:
+        scan = build_scanner(ScanRequest(**payload["request"]))
+        async for event in scan.async_start():
+            out.write(_frame(FRAME_EVENT, _dumps(_event_to_dict(event))))
+            # Flush per event so the parent sees events live; a full pipe blocks the scan
+            out.flush()
+            events += 1
+        out.write(_frame(FRAME_DONE, _dumps({"events": events})))
+        out.flush()
+        return 0
+    except Exception as exc:
+        try:
+            out.write(_frame(FRAME_ERROR, f"{type(exc).__name__}: {exc}".encode("utf-8", "replace")))
+            out.flush()
+        except Exception:
+            pass
+        return 1
+    finally:
+        try:
+            out.close()
+        except Exception:
+            pass
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Isolated BBOT scan child process (internal)")
+    parser.add_argument("--fd", type=int, required=True, help="Pipe file descriptor for event frames")
+    args = parser.parse_args(argv)
+    return asyncio.run(_child_main(args.fd))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Live registry of BBOT scan directories.
+
+Watches the scan roots with inotify (via ``watchfiles``) and keeps an in-memory record per
+scan dir (name, mtime, output.json size, completion), so the scheduler and importer can look
+scan dirs up without walking every root. Falls back to periodic polling of the roots when
+inotify is unavailable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from .repository import _get_scan_roots
+
+
+@dataclass
+class ScanDirInfo:
+    name: str
+    path: Path
+    mtime: float = 0.0
+    output_size: int = 0
+    complete: bool = False
+    first_seen: float = 0.0
+
+
+def _read_completion(output_file: Path, tail_bytes: int = 262144) -> bool:
+    """A finished BBOT scan ends output.json with a SCAN event carrying ``finished_at``."""
+    try:
+        size = output_file.stat().st_size
+        with output_file.open("rb") as f:
+            f.seek(max(0, size - tail_bytes))
+            tail = f.read()
+    except Exception:
+        return False
+    for raw in reversed(tail.rstrip(b"\n").split(b"\n")):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            ev = json.loads(raw)
+        except Exception:
+            return False
+        data = ev.get("data") if isinstance(ev, dict) else None
+        return (ev.get("type") or "").upper() == "SCAN" and isinstance(data, dict) and bool(data.get("finished_at"))
+    return False
+
+
+class ScanDirWatcher:
+    def __init__(self, poll_interval: float = 10.0) -> None:
+        self.poll_interval = poll_interval
+        self._dirs: dict[str, ScanDirInfo] = {}
+        self._by_name: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._roots: list[Path] = []
+        self._task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+        self._stop = asyncio.Event()
+        self.mode = "idle"
+
+    # --- registry updates ---
+
+    def refresh_dir(self, path: Path) -> ScanDirInfo | None:
+        key = str(path)
+        if not path.is_dir():
+            with self._lock:
+                info = self._dirs.pop(key, None)
+                if info and self._by_name.get(info.name) == key:
+                    self._by_name.pop(info.name, None)
+            return None
+        output = path / "output.json"
+        try:
+            st = output.stat()
+            size, mtime = st.st_size, st.st_mtime
+        except FileNotFoundError:
+            size, mtime = 0, path.stat().st_mtime
+        with self._lock:
+            info = self._dirs.get(key)
+            if info is None:
+                info = ScanDirInfo(name=path.name, path=path, first_seen=time.time())
+                self._dirs[key] = info
+                self._by_name[path.name] = key
+            changed = size != info.output_size or mtime != info.mtime
+            info.output_size, info.mtime = size, mtime
+        if size and (changed or not info.complete):
+            info.complete = _read_completion(output)
+        return info
+
+    def full_scan(self) -> None:
+        """Walk the roots once (startup, polling fallback)."""
+        seen: set[str] = set()
+        for root in self._roots:
+            try:
+                children = [d for d in root.iterdir() if d.is_dir()]
+            except Exception:
+                continue
+            for d in children:
+                seen.add(str(d))
+                self.refresh_dir(d)
+        with self._lock:
+            stale = [k for k in self._dirs if k not in seen]
+        for key in stale:
+            self.refresh_dir(Path(key))
+
+    def _scan_dir_of(self, changed: Path) -> Path | None:
+        for root in self._roots:
+            try:
+                rel = changed.relative_to(root)
+            except ValueError:
+                continue
+            if rel.parts:
+                return root / rel.parts[0]
+        return None
+
+    # --- queries ---
+
+    def paths(self) -> set[str]:
+        with self._lock:
+            return set(self._dirs)
+
+    def list(self) -> list[ScanDirInfo]:
+        with self._lock:
+            return sorted(self._dirs.values(), key=lambda i: i.mtime)
+
+    def get(self, name: str) -> ScanDirInfo | None:
+        with self._lock:
+            key = self._by_name.get(name)
+            return self._dirs.get(key) if key else None
+
+    async def wait_complete(self, path: str | Path, timeout: float) -> bool:
+        """Wait until output.json in ``path`` holds the final SCAN event, up to ``timeout``."""
+        deadline = time.monotonic() + timeout
+        while True:
+            info = await asyncio.to_thread(self.refresh_dir, Path(path))
+            if info is not None and info.complete:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    # --- lifecycle ---
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._roots = _get_scan_roots()
+        self._stop = asyncio.Event()
+        await asyncio.to_thread(self.full_scan)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        # The watchfiles thread only exits when it sees the stop event (within one ``step``);
+        # cancelling alone leaves it running past interpreter shutdown
+        self._stop.set()
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        self.mode = "idle"
+
+    async def _run(self) -> None:
+        inotify_ok = True
+        while not self._stop.is_set():
+            if self._roots and inotify_ok:
+                try:
+                    await self._watch()
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    inotify_ok = False
+                    logger.warning("inotify scan dir watch unavailable ({}); polling every {}s", exc, self.poll_interval)
+            self.mode = "polling"
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+            if self._stop.is_set():
+                return
+            # Roots may appear after startup (the first scan creates ~/.bbot/scans)
+            self._roots = _get_scan_roots() or self._roots
+            await asyncio.to_thread(self.full_scan)
+            self._changed.set()
+
+    async def _watch(self) -> None:
+        from watchfiles import awatch
+
+        self.mode = "inotify"
+        logger.info("Watching scan roots via inotify: {}", [str(r) for r in self._roots])
+        async for changes in awatch(*self._roots, debounce=500, step=100, stop_event=self._stop):
+            dirs = {d for _, p in changes if (d := self._scan_dir_of(Path(p))) is not None}
+            for d in dirs:
+                await asyncio.to_thread(self.refresh_dir, d)
+            self._changed.set()
+
+
+# Global watcher instance
+scan_dir_watcher = ScanDirWatcher()
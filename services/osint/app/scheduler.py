@@ -4,23 +4,55 @@ from pathlib import Path
 
 from loguru import logger
 
-from .bbot_runner import async_start_scan, _event_to_dict
+from .adaptive_schedule import AdaptiveScheduler, surface_key
+from .bbot_runner import async_start_scan, _event_to_dict, _preset_stats
 from .config import settings
+from .live_ingest import LiveIngestor
+from . import metrics, tracing
 from .models import ScanRequest
 from .notifications import notify_telegram
 from .repository import (
     cleanup_graph,
+    find_scan_dirs_by_name,
     ingest_dirs_by_scan_name,
     ingest_scan_dir,
-    list_scan_dirs,
 )
+from .scan_index import scan_index
+from .scan_watcher import scan_dir_watcher
 from .worker_uploader import upload_scan_dir
 
 
+def _record_scan(method: str, name: str | None, **fields) -> None:
+    """Update the scan index; index failures never interrupt scanning or import."""
+    if not name:
+        return
+    try:
+        getattr(scan_index, method)(name, **fields)
+    except Exception as exc:
+        logger.debug("Scan index {} failed for {}: {}", method, name, exc)
+
+
 class ContinuousScanner:
     def __init__(self):
         self.running = False
         self.current_scan_task = None
+        self.scan_defaults: dict = {}
+        self.is_worker = False
+        self.auto_upload_enabled = False
+        self.live_ingest_enabled = False
+        self.adaptive: AdaptiveScheduler | None = None
+        # Scanner startup latency (scan start -> first event) per target
+        self.startup_samples: list[float] = []
+
+    def startup_summary(self) -> dict:
+        samples = self.startup_samples
+        return {
+            "count": len(samples),
+            "last_seconds": round(samples[-1], 3) if samples else None,
+            "avg_seconds": round(sum(samples) / len(samples), 3) if samples else None,
+            "max_seconds": round(max(samples), 3) if samples else None,
+            "preset_cache": dict(_preset_stats),
+        }
     
     async def run_forever(self):
         """Main loop - scan targets continuously"""
@@ -38,6 +70,7 @@ class ContinuousScanner:
             return
         
         scan_defaults = settings.scan_defaults or {}
+        self.scan_defaults = scan_defaults
         cycle_sleep = scan_defaults.get("cycle_sleep_seconds", 3600)  # Default 1 hour between cycles
         target_sleep = scan_defaults.get("target_sleep_seconds", 300)  # Default 5 min between targets
 
@@ -58,12 +91,20 @@ class ContinuousScanner:
                     ", ".join(missing),
                 )
                 auto_upload_enabled = False
+        self.is_worker = is_worker
+        self.auto_upload_enabled = auto_upload_enabled
+        self.live_ingest_enabled = settings.live_ingest_enabled and not is_worker
         
         logger.info(f"Targets: {targets}")
         logger.info(f"Cycle sleep (between full cycles): {cycle_sleep}s")
         logger.info(f"Target sleep (between each target): {target_sleep}s")
         if settings.bbot_disable_modules:
             logger.info(f"Disabled modules (from init_config): {settings.bbot_disable_modules}")
+
+        adaptive_cfg = scan_defaults.get("adaptive") or {}
+        if isinstance(adaptive_cfg, dict) and adaptive_cfg.get("enabled"):
+            await self._run_adaptive(targets, adaptive_cfg, cycle_sleep, target_sleep)
+            return
         
         while self.running:
             cycle_start = time.time()
@@ -76,137 +117,284 @@ class ContinuousScanner:
                     break
                 
                 logger.info(f"[{idx+1}/{len(targets)}] Scanning target: {target}")
-                
-                try:
-                    # Build scan request
-                    req = ScanRequest(
-                        targets=[target],
-                        presets=scan_defaults.get("presets", ["subdomain-enum"]),
-                        flags=scan_defaults.get("flags", []),
-                        max_workers=scan_defaults.get("max_workers", 2),
-                        spider_depth=scan_defaults.get("spider_depth", 2),
-                        spider_distance=scan_defaults.get("spider_distance", 1),
-                        spider_links_per_page=scan_defaults.get("spider_links_per_page", 10),
-                        allow_deadly=scan_defaults.get("allow_deadly", False),
-                    )
-                    logger.info(f"Resolved presets={req.presets} flags={req.flags} for target={target}")
-                    
-                    # Run scan: do NOT ingest live stream; only detect new scan dirs
-                    event_count = 0
-                    scan_name: str | None = None
-                    scan_start_ts = time.time()
-                    before_dirs = {str(p) for p in list_scan_dirs()}
-                    async for event in async_start_scan(req):
-                        ev = _event_to_dict(event)
-                        # Optionally capture scan name from first SCAN event (for fallback matching)
-                        if not scan_name and isinstance(ev, dict):
-                            try:
-                                if (ev.get("type") or "").upper() == "SCAN":
-                                    data = ev.get("data") or {}
-                                    for k in ("scan_name","name","label","id","slug"):
-                                        v = data.get(k) or ev.get(k)
-                                        if isinstance(v, str) and v:
-                                            scan_name = v
-                                            break
-                            except Exception:
-                                pass
-                        # Do not ingest here; rely on output.json importer
-                        event_count += 1
-                    
-                    total_events += event_count
-                    logger.info(f"✓ Target {target} completed: {event_count} events")
-                    # Post-scan: schedule import after short delay to ensure files are flushed
-                    async def _import_after_delay(domain: str, detect_delay: int = 1, read_delay: int = 15, sname: str | None = None, before: set[str] | None = None):
-                        try:
-                            if is_worker and not auto_upload_enabled:
-                                logger.info("Auto upload disabled for worker role; skipping domain {}", domain)
-                                return
-                            # Phase 1: detect new dirs shortly after completion
-                            await asyncio.sleep(detect_delay)
-                            prev = before or set()
-                            after_dirs = {str(p) for p in list_scan_dirs()}
-                            new_dirs = sorted(set(after_dirs) - set(prev))
-                            # Phase 2: give time for files to flush before reading
-                            await asyncio.sleep(read_delay)
-                            used_dirs: list[str] = []
-                            total_processed = 0
-                            if new_dirs:
-                                for d in new_dirs:
-                                    try:
-                                        if is_worker and auto_upload_enabled:
-                                            total_processed += upload_scan_dir(d, default_domain=domain, scan_name=sname)
-                                        else:
-                                            total_processed += ingest_scan_dir(d, default_domain=domain)
-                                        used_dirs.append(d)
-                                    except FileNotFoundError as fnf:
-                                        logger.error(f"output.json missing in {d}: {fnf}")
-                                    except Exception as e:
-                                        logger.error(f"Import failed for {d}: {e}")
-                                action = "Uploaded" if is_worker and auto_upload_enabled else "Imported"
-                                logger.info(f"{action} {total_processed} records for {domain} from new scan dirs: {used_dirs}")
-                                return
-                            # If no new dirs, fall back: if we captured scan name, try by name
-                            if sname:
-                                if is_worker and auto_upload_enabled:
-                                    candidate = next((p for p in list_scan_dirs() if Path(p).name == sname), None)
-                                    if candidate:
-                                        try:
-                                            uploaded = upload_scan_dir(candidate, default_domain=domain, scan_name=sname)
-                                            logger.info(
-                                                "Uploaded {} records for {} from scan '{}' (fallback)",
-                                                uploaded,
-                                                domain,
-                                                sname,
-                                            )
-                                            return
-                                        except Exception as exc:
-                                            logger.error("Fallback upload failed for scan {}: {}", sname, exc)
-                                else:
-                                    extra_by_name, used_by_name = ingest_dirs_by_scan_name(sname, default_domain=domain, max_dirs=1, max_age_seconds=7200)
-                                    if used_by_name:
-                                        logger.info(f"Imported {extra_by_name} records for {domain} from scan '{sname}': {used_by_name}")
-                                        return
-                            logger.warning(f"No new scan dirs detected for {domain}; skipping import")
-                        except Exception as _e:
-                            logger.error(f"Scan dir import failed for {domain}: {_e}")
-                    asyncio.create_task(_import_after_delay(target, 1, 15, scan_name, before_dirs))
-                    
-                except Exception as e:
-                    logger.error(f"✗ Error scanning {target}: {e}")
+                event_count, _, _ = await self._scan_target(target)
+                total_events += event_count
                 
                 # Sleep between targets (except after last target)
                 if idx < len(targets) - 1 and target_sleep > 0:
                     logger.info(f"Sleeping {target_sleep}s before next target...")
                     await asyncio.sleep(target_sleep)
             
-            stats: dict[str, int] = {}
-            if not is_worker and settings.cleanup_enabled:
-                logger.info("Running cleanup...")
-                stats = cleanup_graph(int(time.time()))
-                logger.info(f"Cleanup stats: {stats}")
-            elif is_worker:
-                logger.info("Worker role detected – skipping Neo4j cleanup phase")
-            
-            cycle_elapsed = int(time.time() - cycle_start)
-            logger.info(f"=== Cycle completed in {cycle_elapsed}s, total events: {total_events} ===")
-            
-            # Telegram notification
-            msg = (
-                f"Scan cycle completed\n"
-                f"Duration: {cycle_elapsed}s\n"
-                f"Targets: {len(targets)}\n"
-                f"Events: {total_events}\n"
-                f"Cleanup: {stats.get('deleted_events',0)} events, {stats.get('deleted_offline_hosts',0)} hosts, {stats.get('deleted_orphans',0)} orphans"
-            )
-            try:
-                await notify_telegram(msg)
-            except Exception:
-                pass
+            await self._finish_cycle(cycle_start, len(targets), total_events)
             
             # Sleep until next cycle
             if cycle_sleep > 0:
                 logger.info(f"Sleeping {cycle_sleep}s until next cycle...")
                 await asyncio.sleep(cycle_sleep)
+
+    async def _run_adaptive(self, targets: list[str], adaptive_cfg: dict, cycle_sleep: int, target_sleep: int):
+        """Scan whichever target is due next; intervals follow each target's change rate.
+
+        Cleanup and the cycle notification run every ``cycle_sleep_seconds`` instead of after
+        a full pass over the targets.
+        """
+        min_interval = adaptive_cfg.get("min_interval_seconds", 3600)
+        max_interval = adaptive_cfg.get("max_interval_seconds", 7 * 86400)
+        self.adaptive = AdaptiveScheduler(
+            targets,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            backoff=adaptive_cfg.get("backoff", 2.0),
+            initial_interval=adaptive_cfg.get("initial_interval_seconds", cycle_sleep or min_interval),
+        )
+        logger.info(f"Adaptive rescan enabled: interval {self.adaptive.min_interval:.0f}s..{self.adaptive.max_interval:.0f}s")
+        period_start = time.time()
+        period_targets: set[str] = set()
+        total_events = 0
+        while self.running:
+            nxt = self.adaptive.peek()
+            if nxt is None:
+                return
+            target, wait = nxt
+            if wait > 0:
+                # Wake up periodically so stop() and cleanup are not delayed by long intervals
+                await asyncio.sleep(min(wait, 60))
+            else:
+                self.adaptive.pop()
+                logger.info(f"Scanning target: {target} (adaptive)")
+                event_count, surface, ok = await self._scan_target(target)
+                total_events += event_count
+                period_targets.add(target)
+                if ok and event_count:
+                    state = self.adaptive.record(target, surface)
+                    rate = "n/a" if state.change_rate is None else f"{state.change_rate:.1%}"
+                    logger.info(
+                        f"Target {target}: {len(surface)} surface keys, change rate {rate}, next scan in {state.interval:.0f}s"
+                    )
+                else:
+                    # Failed or empty scan: keep the previous surface and retry after min interval
+                    self.adaptive.reschedule(target)
+                if target_sleep > 0 and self.running:
+                    await asyncio.sleep(target_sleep)
+            if cycle_sleep > 0 and time.time() - period_start >= cycle_sleep:
+                await self._finish_cycle(period_start, len(period_targets), total_events)
+                period_start = time.time()
+                period_targets = set()
+                total_events = 0
+
+    async def _finish_cycle(self, cycle_start: float, target_count: int, total_events: int):
+        stats: dict[str, int] = {}
+        if not self.is_worker and settings.cleanup_enabled:
+            logger.info("Running cleanup...")
+            # Runs to completion in batches; keep the event loop free meanwhile
+            stats = await asyncio.to_thread(cleanup_graph, int(time.time()))
+            logger.info(f"Cleanup stats: {stats}")
+        elif self.is_worker:
+            logger.info("Worker role detected – skipping Neo4j cleanup phase")
+        
+        cycle_elapsed = int(time.time() - cycle_start)
+        logger.info(f"=== Cycle completed in {cycle_elapsed}s, total events: {total_events} ===")
+        
+        # Telegram notification
+        msg = (
+            f"Scan cycle completed\n"
+            f"Duration: {cycle_elapsed}s\n"
+            f"Targets: {target_count}\n"
+            f"Events: {total_events}\n"
+            f"Cleanup: {stats.get('deleted_events',0)} events, {stats.get('deleted_offline_hosts',0)} hosts, {stats.get('deleted_orphans',0)} orphans"
+        )
+        try:
+            await notify_telegram(msg)
+        except Exception:
+            pass
+
+    async def _scan_target(self, target: str) -> tuple[int, set[str], bool]:
+        """Scan one target and schedule its import; returns (events, surface keys, success).
+
+        Each scan starts a trace; the import task created inside inherits it, and uploads pass
+        it on to the central API.
+        """
+        with tracing.span("scan", target=target, role="worker" if self.is_worker else "central") as span:
+            event_count, surface, ok = await self._run_scan(target)
+            span.set("events", event_count)
+            span.set("ok", ok)
+            return event_count, surface, ok
+
+    async def _run_scan(self, target: str) -> tuple[int, set[str], bool]:
+        try:
+            # Build scan request
+            req = ScanRequest(
+                targets=[target],
+                presets=self.scan_defaults.get("presets", ["subdomain-enum"]),
+                flags=self.scan_defaults.get("flags", []),
+                max_workers=self.scan_defaults.get("max_workers", 2),
+                spider_depth=self.scan_defaults.get("spider_depth", 2),
+                spider_distance=self.scan_defaults.get("spider_distance", 1),
+                spider_links_per_page=self.scan_defaults.get("spider_links_per_page", 10),
+                allow_deadly=self.scan_defaults.get("allow_deadly", False),
+            )
+            logger.info(f"Resolved presets={req.presets} flags={req.flags} for target={target}")
+
+            # Run scan: detect new scan dirs for the output.json importer and,
+            # when live ingest is enabled, also write events as they arrive
+            event_count = 0
+            scan_name: str | None = None
+            before_dirs = scan_dir_watcher.paths()
+            live = LiveIngestor() if self.live_ingest_enabled else None
+            live_stats: dict = {}
+            surface: set[str] = set()
+            scan_ok = False
+            if live:
+                metrics.track_queue(live.queue)
+                await live.start()
+            startup: float | None = None
+            scan_start_ts = time.time()
+            try:
+                async for event in async_start_scan(req):
+                    if startup is None:
+                        startup = time.time() - scan_start_ts
+                        self.startup_samples = (self.startup_samples + [startup])[-100:]
+                        logger.info(f"Scanner startup for {target}: {startup:.2f}s")
+                    ev = _event_to_dict(event)
+                    # Optionally capture scan name from first SCAN event (for fallback matching)
+                    if not scan_name and isinstance(ev, dict):
+                        try:
+                            if (ev.get("type") or "").upper() == "SCAN":
+                                data = ev.get("data") or {}
+                                for k in ("scan_name","name","label","id","slug"):
+                                    v = data.get(k) or ev.get(k)
+                                    if isinstance(v, str) and v:
+                                        scan_name = v
+                                        break
+                                if scan_name:
+                                    span = tracing.current_span()
+                                    if span is not None:
+                                        span.set("scan_name", scan_name)
+                                    info = scan_dir_watcher.get(scan_name)
+                                    _record_scan(
+                                        "record_start",
+                                        scan_name,
+                                        target=target,
+                                        started_at=scan_start_ts,
+                                        startup_seconds=startup,
+                                        scan_dir=str(info.path) if info else None,
+                                    )
+                        except Exception:
+                            pass
+                    if isinstance(ev, dict):
+                        key = surface_key(ev)
+                        if key:
+                            surface.add(key)
+                    if live and isinstance(ev, dict):
+                        # Blocks while the live queue is full, slowing the scan down
+                        await live.put(ev)
+                    event_count += 1
+                scan_ok = True
+            finally:
+                metrics.SCAN_SECONDS.labels(target).observe(time.time() - scan_start_ts)
+                metrics.SCAN_EVENTS.labels(target).inc(event_count)
+                metrics.SCANS.labels(target, "finished" if scan_ok else "failed").inc()
+                if live:
+                    live_stats = await live.close()
+                info = scan_dir_watcher.get(scan_name) if scan_name else None
+                _record_scan(
+                    "record_finish",
+                    scan_name,
+                    status="finished" if scan_ok else "failed",
+                    event_count=event_count,
+                    scan_dir=str(info.path) if info else None,
+                    output_size=info.output_size if info else None,
+                )
+
+            logger.info(f"✓ Target {target} completed: {event_count} events")
+            needs_file_import = True
+            if live:
+                logger.info(f"Live ingest for {target}: {live_stats}")
+                # Events are already in the graph unless the live writer failed;
+                # the file importer then only runs as an opt-in reconciliation pass
+                needs_file_import = bool(live_stats.get("failed")) or settings.live_ingest_reconcile
+                if not live_stats.get("failed"):
+                    _record_scan("record_import", scan_name, import_status="live", records=live_stats.get("events"))
+            if needs_file_import:
+                asyncio.create_task(self._import_after_delay(target, 1, 15, scan_name, before_dirs))
+            return event_count, surface, scan_ok
+        except Exception as e:
+            logger.error(f"✗ Error scanning {target}: {e}")
+            return 0, set(), False
+
+    async def _import_after_delay(self, domain: str, detect_delay: int = 1, read_delay: int = 15, sname: str | None = None, before: set[str] | None = None):
+        try:
+            if self.is_worker and not self.auto_upload_enabled:
+                logger.info("Auto upload disabled for worker role; skipping domain {}", domain)
+                _record_scan("record_import", sname, import_status="skipped")
+                return
+            with tracing.span("flush_wait", scan_name=sname) as span:
+                # Phase 1: detect new dirs shortly after completion (from the watcher registry)
+                await asyncio.sleep(detect_delay)
+                if not scan_dir_watcher.running:
+                    await asyncio.to_thread(scan_dir_watcher.full_scan)
+                prev = before or set()
+                new_dirs = sorted(scan_dir_watcher.paths() - set(prev))
+                span.set("dirs", len(new_dirs))
+                # Phase 2: wait for output.json to hold the final SCAN event, at most read_delay
+                for d in new_dirs:
+                    if not await scan_dir_watcher.wait_complete(d, read_delay):
+                        logger.debug("Scan dir {} not marked complete after {}s; importing anyway", d, read_delay)
+                        span.set("incomplete", True)
+            used_dirs: list[str] = []
+            total_processed = 0
+            # Imports and uploads block on the database, the network and write admission slots:
+            # run them in threads so the API event loop keeps serving meanwhile
+            if new_dirs:
+                for d in new_dirs:
+                    dname = Path(d).name
+                    try:
+                        if self.is_worker and self.auto_upload_enabled:
+                            processed = await asyncio.to_thread(upload_scan_dir, d, default_domain=domain, scan_name=sname)
+                            _record_scan("record_import", dname, import_status="uploaded", records=processed, scan_dir=d)
+                        else:
+                            processed = await asyncio.to_thread(ingest_scan_dir, d, default_domain=domain)
+                            _record_scan("record_import", dname, import_status="ingested", records=processed, scan_dir=d)
+                        total_processed += processed
+                        used_dirs.append(d)
+                    except FileNotFoundError as fnf:
+                        logger.error(f"output.json missing in {d}: {fnf}")
+                        _record_scan("record_import", dname, import_status="failed", scan_dir=d)
+                    except Exception as e:
+                        logger.error(f"Import failed for {d}: {e}")
+                        _record_scan("record_import", dname, import_status="failed", scan_dir=d)
+                action = "Uploaded" if self.is_worker and self.auto_upload_enabled else "Imported"
+                logger.info(f"{action} {total_processed} records for {domain} from new scan dirs: {used_dirs}")
+                return
+            # If no new dirs, fall back: if we captured scan name, try by name
+            if sname:
+                if self.is_worker and self.auto_upload_enabled:
+                    found = await asyncio.to_thread(find_scan_dirs_by_name, sname, max_dirs=1, max_age_seconds=7200)
+                    candidate = str(found[0]) if found else None
+                    if candidate:
+                        try:
+                            uploaded = await asyncio.to_thread(upload_scan_dir, candidate, default_domain=domain, scan_name=sname)
+                            _record_scan("record_import", sname, import_status="uploaded", records=uploaded, scan_dir=candidate)
+                            logger.info(
+                                "Uploaded {} records for {} from scan '{}' (fallback)",
+                                uploaded,
+                                domain,
+                                sname,
+                            )
+                            return
+                        except Exception as exc:
+                            logger.error("Fallback upload failed for scan {}: {}", sname, exc)
+                else:
+                    extra_by_name, used_by_name = await asyncio.to_thread(
+                        ingest_dirs_by_scan_name, sname, default_domain=domain, max_dirs=1, max_age_seconds=7200
+                    )
+                    if used_by_name:
+                        logger.info(f"Imported {extra_by_name} records for {domain} from scan '{sname}': {used_by_name}")
+                        _record_scan("record_import", sname, import_status="ingested", records=extra_by_name, scan_dir=used_by_name[0])
+                        return
+            logger.warning(f"No new scan dirs detected for {domain}; skipping import")
+        except Exception as _e:
+            logger.error(f"Scan dir import failed for {domain}: {_e}")
     
     async def stop(self):
         """Stop the scanner gracefully"""
@@ -218,4 +406,3 @@ class ContinuousScanner:
 
 # Global scanner instance
 scanner = ContinuousScanner()
-
@@ -0,0 +1,219 @@
+"""Budgeted result shaping for agent-facing queries.
+
+An LLM client pays for every byte of a tool result: ``osint.events.query`` rows carry the full
+BBOT event JSON in ``raw``, so a ``limit=200`` answer can run to megabytes. When a request sets
+``max_bytes``/``max_tokens``, ``group_by``, ``raw`` or ``cursor``, the rows are shaped here:
+
+- ``raw`` is kept, truncated, reduced to a few telling keys (``summary``, the default under a
+  budget) or dropped
+- identical rows (one per matched module/host in the Cypher) and repeated list entries are
+  collapsed
+- with ``group_by`` rows are grouped and values shared by a whole group are stated once
+- rows are taken in order until the encoded size would pass the budget; the rest is reachable
+  through ``next_cursor``, an opaque token for the same query one page further
+
+Tokens are estimated as ``TOKEN_BYTES`` bytes of JSON each.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+TOKEN_BYTES = 4
+# Room left for the envelope (counts, shaping stats, cursor, hint)
+_ENVELOPE_BYTES = 400
+_GROUP_BYTES = 48
+# Keys of a BBOT event JSON kept by raw="summary"
+SUMMARY_KEYS = ("data", "host", "port", "resolved_hosts", "tags", "discovery_context")
+_SUMMARY_LIST_ITEMS = 10
+
+SHAPING_FIELDS = {"max_bytes", "max_tokens", "group_by", "raw", "raw_max_chars", "cursor"}
+
+
+class CursorError(ValueError):
+    """The cursor is malformed or belongs to a query with other filters."""
+
+
+def requested(req: BaseModel) -> bool:
+    return any(getattr(req, field, None) is not None for field in SHAPING_FIELDS - {"raw_max_chars"})
+
+
+def _fingerprint(req: BaseModel) -> str:
+    filters = req.model_dump(exclude=SHAPING_FIELDS | {"limit", "profile", "stream"})
+    return hashlib.sha1(orjson.dumps(filters, option=orjson.OPT_SORT_KEYS)).hexdigest()[:12]
+
+
+def encode_cursor(req: BaseModel, offset: int) -> str:
+    token = orjson.dumps({"o": offset, "f": _fingerprint(req)})
+    return base64.urlsafe_b64encode(token).decode("ascii").rstrip("=")
+
+
+def cursor_offset(req: BaseModel) -> int:
+    """Rows to skip for ``req.cursor`` (0 without one); raises ``CursorError``."""
+    cursor = getattr(req, "cursor", None)
+    if not cursor:
+        return 0
+    try:
+        state = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(state["o"])
+        fingerprint = state["f"]
+    except Exception as exc:
+        raise CursorError("malformed cursor") from exc
+    if fingerprint != _fingerprint(req) or offset < 0:
+        raise CursorError("cursor does not match the filters of this query")
+    return offset
+
+
+def budget_bytes(req: BaseModel) -> int | None:
+    limits = [getattr(req, "max_bytes", None)]
+    max_tokens = getattr(req, "max_tokens", None)
+    if max_tokens is not None:
+        limits.append(max_tokens * TOKEN_BYTES)
+    limits = [b for b in limits if b is not None]
+    return min(limits) if limits else None
+
+
+def _unique(values: list[Any]) -> list[Any]:
+    """``values`` without repeats, first occurrence order (hashable items only)."""
+    try:
+        return list(dict.fromkeys(values))
+    except TypeError:
+        return values
+
+
+def _clip(value: Any, max_chars: int) -> Any:
+    if isinstance(value, list):
+        value = _unique(value)
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    if isinstance(value, list) and len(value) > _SUMMARY_LIST_ITEMS:
+        return [_clip(v, max_chars) for v in value[:_SUMMARY_LIST_ITEMS]] + [f"+{len(value) - _SUMMARY_LIST_ITEMS} more"]
+    if isinstance(value, list):
+        return [_clip(v, max_chars) for v in value]
+    return value
+
+
+def _parse_raw(raw: Any) -> dict[str, Any] | None:
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, (str, bytes)):
+        try:
+            parsed = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+    return None
+
+
+def _shape_row(row: dict[str, Any], raw_mode: str, max_chars: int) -> dict[str, Any]:
+    # Repeated list entries (sources, tags) say nothing new
+    out = {k: _unique(v) if isinstance(v, list) else v for k, v in row.items()}
+    if "raw" not in out or raw_mode == "full":
+        return out
+    raw = out.pop("raw")
+    if raw_mode == "omit" or raw is None:
+        return out
+    if raw_mode == "summary":
+        parsed = _parse_raw(raw)
+        if parsed is not None:
+            out["raw"] = {k: _clip(parsed[k], max_chars) for k in SUMMARY_KEYS if parsed.get(k) not in (None, "", [])}
+            return out
+    out["raw"] = _clip(raw if isinstance(raw, str) else orjson.dumps(raw).decode(), max_chars)
+    return out
+
+
+def _group_key(row: dict[str, Any], field: str) -> Any:
+    if field in row:
+        return row[field]
+    # Event rows have no host column; BBOT keeps it in the event JSON
+    parsed = _parse_raw(row.get("raw"))
+    return parsed.get(field) if parsed else None
+
+
+def _size(value: Any) -> int:
+    return len(orjson.dumps(value, default=str))
+
+
+def _hoist(rows: list[dict[str, Any]]) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Move fields with one value across all ``rows`` into a shared dict."""
+    if len(rows) < 2:
+        return {}, rows
+    common = {
+        k: v for k, v in rows[0].items()
+        if all(k in r and r[k] == v for r in rows[1:])
+    }
+    if not common:
+        return {}, rows
+    return common, [{k: v for k, v in r.items() if k not in common} for r in rows]
+
+
+def shape(rows: list[dict[str, Any]], req: BaseModel, offset: int, tool: str) -> dict[str, Any]:
+    """Shaped response body for ``rows`` (one page fetched at ``offset`` with ``req.limit``)."""
+    budget = budget_bytes(req)
+    raw_mode = getattr(req, "raw", None) or ("summary" if budget is not None else "full")
+    max_chars = getattr(req, "raw_max_chars", 256)
+    group_by = getattr(req, "group_by", None)
+
+    used = _ENVELOPE_BYTES
+    seen: set[bytes] = set()
+    groups: dict[Any, list[dict[str, Any]]] = {}
+    taken: list[dict[str, Any]] = []
+    consumed = duplicates = 0
+    over_budget = False
+    for row in rows:
+        key = _group_key(row, group_by) if group_by else None
+        shaped = _shape_row(row, raw_mode, max_chars)
+        encoded = orjson.dumps(shaped, option=orjson.OPT_SORT_KEYS, default=str)
+        if encoded in seen:
+            consumed += 1
+            duplicates += 1
+            continue
+        cost = len(encoded) + 1 + (_GROUP_BYTES + _size(key) if group_by and key not in groups else 0)
+        if budget is not None and used + cost > budget:
+            if taken:
+                break
+            # Always return at least one row so paging makes progress
+            over_budget = True
+        used += cost
+        consumed += 1
+        seen.add(encoded)
+        taken.append(shaped)
+        if group_by:
+            groups.setdefault(key, []).append(shaped)
+
+    body: dict[str, Any]
+    if group_by:
+        out_groups = []
+        for key, members in groups.items():
+            common, members = _hoist([{k: v for k, v in m.items() if k != group_by} for m in members])
+            group: dict[str, Any] = {group_by: key, "count": len(members)}
+            if common:
+                group["common"] = common
+            group["rows"] = members
+            out_groups.append(group)
+        body = {"groups": out_groups, "count": len(taken)}
+    else:
+        body = {"results": taken, "count": len(taken)}
+
+    limit = getattr(req, "limit", len(rows))
+    more = consumed < len(rows) or len(rows) >= limit > 0
+    body["next_cursor"] = encode_cursor(req, offset + consumed) if more else None
+    body["shaping"] = {
+        "budget_bytes": budget,
+        "raw": raw_mode,
+        "offset": offset,
+        "fetched": len(rows),
+        "duplicates_removed": duplicates,
+        "deferred": len(rows) - consumed,
+    }
+    if over_budget:
+        body["shaping"]["over_budget"] = True
+    if more:
+        body["hint"] = f"More rows available: call {tool} again with the same arguments and cursor=next_cursor."
+    body["shaping"]["bytes"] = _size(body)
+    return body
@@ -0,0 +1,106 @@
+"""Cold-start benchmark per deployment role.
+
+Each run starts a fresh interpreter with ``DEPLOYMENT_ROLE`` set, imports ``app.main`` and runs
+the startup handlers, then reports the import and startup times and whether BBOT was loaded.
+Neo4j is connected in the background, so it does not count towards startup unless
+``--wait-ready`` is given (then the time until ``/readyz`` would report ready is included).
+
+    python -m app.startup_bench --roles central worker --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+_CHILD = r"""
+import asyncio, json, os, sys, time
+t0 = time.perf_counter()
+import app.main as main
+t_import = time.perf_counter() - t0
+
+async def run(wait_ready, timeout):
+    t1 = time.perf_counter()
+    await main._on_startup()
+    t_startup = time.perf_counter() - t1
+    t_ready = None
+    if wait_ready:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if main.readyz().status_code == 200:
+                t_ready = time.perf_counter() - t0
+                break
+            await asyncio.sleep(0.05)
+    return t_startup, t_ready
+
+# Not asyncio.run(): it would wait for the background Neo4j connect thread on shutdown
+loop = asyncio.new_event_loop()
+t_startup, t_ready = loop.run_until_complete(run(sys.argv[1] == "1", float(sys.argv[2])))
+print(json.dumps({
+    "import_seconds": t_import,
+    "startup_seconds": t_startup,
+    "ready_seconds": t_ready,
+    "bbot_loaded": any(m == "bbot" or m.startswith("bbot.") for m in sys.modules),
+    "modules": len(sys.modules),
+}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+def run_once(role: str, wait_ready: bool = False, timeout: float = 60.0) -> dict:
+    env = dict(os.environ, DEPLOYMENT_ROLE=role)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD, "1" if wait_ready else "0", str(timeout)],
+        cwd=str(Path(__file__).resolve().parent.parent),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=timeout + 60,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{role} run failed: {proc.stderr.strip()[-500:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = wall
+    return result
+
+
+def summarize(samples: list[dict]) -> dict:
+    out: dict = {"runs": len(samples), "bbot_loaded": any(s["bbot_loaded"] for s in samples)}
+    for key in ("process_seconds", "import_seconds", "startup_seconds", "ready_seconds"):
+        values = [s[key] for s in samples if s.get(key) is not None]
+        if values:
+            out[key] = {
+                "median": round(statistics.median(values), 3),
+                "min": round(min(values), 3),
+                "max": round(max(values), 3),
+            }
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cold start time per deployment role")
+    parser.add_argument("--roles", nargs="+", default=["central", "worker"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--wait-ready", action="store_true", help="Include the time until /readyz is ready")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Readiness wait per run (seconds)")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for role in args.roles:
+        samples = [run_once(role, args.wait_ready, args.timeout) for _ in range(max(1, args.runs))]
+        report[role] = summarize(samples)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
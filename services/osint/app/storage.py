@@ -0,0 +1,154 @@
+"""Storage backends behind the repository functions.
+
+``repository`` maps and validates; a ``GraphStore`` persists and queries. Two backends:
+
+- ``neo4j`` (default): the Cypher statements against the shared ``neo4j_client``
+- ``memory``: an in-process graph (dicts plus label and adjacency indexes) that needs no
+  services, for benchmarks, tests and small single-node deployments. It is optionally
+  snapshotted to ``MEMORY_STORE_PATH`` on shutdown and reloaded at startup.
+
+The backend is chosen by ``settings.storage_backend`` (``STORAGE_BACKEND`` or
+``storage.backend`` in init_config.json). Features only Neo4j provides (event rollups, ad-hoc
+Cypher) raise ``UnsupportedByBackend``, which the API reports as 501.
+"""
+
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+
+from .config import settings
+from .output_mapping import NodeRow, RelRow
+
+BACKENDS = ("neo4j", "memory")
+
+
+class UnsupportedByBackend(NotImplementedError):
+    """The configured storage backend does not implement this operation."""
+
+
+class GraphStore(ABC):
+    name = "base"
+
+    @property
+    @abstractmethod
+    def is_connected(self) -> bool: ...
+
+    @abstractmethod
+    def connect(self) -> None: ...
+
+    def close(self) -> None:
+        """Release resources (and persist state, for backends that keep it in memory)."""
+
+    @abstractmethod
+    def ensure_schema(self) -> None: ...
+
+    def stats(self) -> dict[str, Any]:
+        """Backend-specific counters for ``/status``."""
+        return {}
+
+    @abstractmethod
+    def write_rows(self, nodes: list[NodeRow], rels: list[RelRow]) -> int:
+        """Commit one importer batch (nodes before relationships); returns the attempts used."""
+
+    @abstractmethod
+    def node_keys(self, label: str, prop: str, limit: int) -> list[Any]:
+        """Up to ``limit`` existing keys of ``label`` (used to warm the importer key cache)."""
+
+    @abstractmethod
+    def upsert_subdomain(self, record: dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    def ingest_event(self, params: dict[str, Any]) -> None:
+        """Write one normalized event of the per-event ingest path (see ``repository.ingest_event``)."""
+
+    @abstractmethod
+    def query_subdomains(self, domain: str | None, host: str | None, online_only: bool, limit: int, skip: int = 0) -> list[dict]:
+        """Hosts newest first (ties by host, domain), ``skip`` rows in (cursor paging)."""
+
+    @abstractmethod
+    def query_events(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        host: str | None,
+        since_ts: int | None,
+        until_ts: int | None,
+        limit: int,
+        skip: int = 0,
+    ) -> list[dict]:
+        """Events newest first (ties by id, module), ``skip`` rows in (cursor paging)."""
+
+    def iter_subdomains(
+        self,
+        domain: str | None,
+        host: str | None,
+        online_only: bool,
+        limit: int,
+        skip: int = 0,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[dict]:
+        """``query_subdomains`` as an iterator, for streamed responses.
+
+        Backends that can fetch incrementally yield rows as they arrive and stop (releasing the
+        query) once ``cancel`` is set or the iterator is closed; the default materializes first.
+        """
+        yield from self.query_subdomains(domain, host, online_only, limit, skip)
+
+    def iter_events(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        host: str | None,
+        since_ts: int | None,
+        until_ts: int | None,
+        limit: int,
+        skip: int = 0,
+        cancel: threading.Event | None = None,
+    ) -> Iterator[dict]:
+        """``query_events`` as an iterator (see ``iter_subdomains``)."""
+        yield from self.query_events(types, modules, domain, host, since_ts, until_ts, limit, skip)
+
+    @abstractmethod
+    def cleanup(self, now_epoch: int) -> dict[str, Any]:
+        """Apply the retention policy from ``settings``; returns deletion stats."""
+
+    def rollup_rows(
+        self,
+        types: list[str] | None,
+        modules: list[str] | None,
+        domain: str | None,
+        since: int,
+        until: int,
+        include_raw: bool,
+    ) -> list[dict]:
+        """Per-day event counts (``day_ts, etype, emodule, edomain, count``) for ``query_event_rollups``."""
+        raise UnsupportedByBackend(f"event rollups are not supported by the {self.name} storage backend")
+
+
+_stores: dict[str, GraphStore] = {}
+_lock = threading.Lock()
+
+
+def get_store(backend: str | None = None) -> GraphStore:
+    """The process-wide store of ``backend`` (default: ``settings.storage_backend``)."""
+    name = (backend or settings.storage_backend or "neo4j").strip().lower()
+    store = _stores.get(name)
+    if store is not None:
+        return store
+    with _lock:
+        if name not in _stores:
+            if name == "neo4j":
+                from .neo4j_store import Neo4jStore
+
+                _stores[name] = Neo4jStore()
+            elif name == "memory":
+                from .memory_store import MemoryStore
+
+                _stores[name] = MemoryStore(settings.memory_store_path)
+            else:
+                raise ValueError(f"Unknown storage backend {name!r} (expected one of {', '.join(BACKENDS)})")
+        return _stores[name]
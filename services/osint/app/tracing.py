@@ -0,0 +1,271 @@
+"""Minimal tracing for the scan -> upload -> ingest pipeline.
+
+Spans follow the W3C trace context model: a trace id shared by every stage of one scan and a
+span id per stage. The context travels between processes in a ``traceparent`` header
+(``00-<trace id>-<span id>-01``), so a worker's scan, its upload and the central ingest end up in
+one trace. Inside a process the current span lives in a context variable, which asyncio tasks
+and ``asyncio.to_thread`` inherit.
+
+Finished spans are exported in the background, either as JSON lines (``tracing.exporter =
+"file"``) or as OTLP/HTTP JSON to a collector (``"otlp"``, e.g. ``http://localhost:4318``).
+Nothing is recorded while tracing is disabled.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from loguru import logger
+
+from .config import settings
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+@dataclass
+class Span:
+    name: str
+    context: SpanContext
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return self.context.traceparent
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+# Context of the spans handed out while tracing is off (never exported or propagated)
+_DISABLED = SpanContext("0" * 32, "0" * 16)
+
+
+def enabled() -> bool:
+    return settings.tracing_enabled and settings.tracing_exporter != "none"
+
+
+def parse_traceparent(header: str | None) -> SpanContext | None:
+    """Parse a W3C ``traceparent`` header; None when absent or malformed."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def current_traceparent() -> str | None:
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+def _parent_context(parent: Span | SpanContext | str | None) -> SpanContext | None:
+    if isinstance(parent, Span):
+        return parent.context
+    if isinstance(parent, str):
+        return parse_traceparent(parent)
+    if parent is not None:
+        return parent
+    span = _current.get()
+    return span.context if span is not None else None
+
+
+def _new_span(name: str, parent: Span | SpanContext | str | None, attributes: dict[str, Any]) -> Span:
+    ctx = _parent_context(parent)
+    trace_id = ctx.trace_id if ctx else secrets.token_hex(16)
+    return Span(
+        name=name,
+        context=SpanContext(trace_id, secrets.token_hex(8)),
+        parent_id=ctx.span_id if ctx else None,
+        attributes={k: v for k, v in attributes.items() if v is not None},
+    )
+
+
+@contextmanager
+def span(name: str, parent: Span | SpanContext | str | None = None, **attributes: Any) -> Iterator[Span]:
+    """Time a block as a span (child of ``parent`` or of the current span) and make it current."""
+    if not enabled():
+        yield Span(name, _DISABLED)
+        return
+    s = _new_span(name, parent, attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as exc:
+        s.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        _exporter.submit(s)
+
+
+def record_span(
+    name: str,
+    start_ns: int,
+    end_ns: int,
+    parent: Span | SpanContext | str | None = None,
+    **attributes: Any,
+) -> None:
+    """Export an already-measured span (e.g. cumulative time of an interleaved stage)."""
+    if not enabled():
+        return
+    s = _new_span(name, parent, attributes)
+    s.start_ns, s.end_ns = start_ns, end_ns
+    _exporter.submit(s)
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(s: Span) -> dict[str, Any]:
+    out: dict[str, Any] = {
+        "traceId": s.context.trace_id,
+        "spanId": s.context.span_id,
+        "name": s.name,
+        "kind": 1,  # internal
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+class _Exporter:
+    """Background batch exporter; spans are dropped (not blocked on) when the queue is full."""
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 512, interval: float = 2.0) -> None:
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, s: Span) -> None:
+        try:
+            self._queue.put_nowait(s)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _drain(self, block: bool) -> list[Span]:
+        batch: list[Span] = []
+        try:
+            batch.append(self._queue.get(timeout=self.interval) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                self._export(batch)
+
+    def flush(self) -> None:
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._export(batch)
+
+    def _export(self, batch: list[Span]) -> None:
+        try:
+            if settings.tracing_exporter == "otlp":
+                self._export_otlp(batch)
+            elif settings.tracing_exporter == "file":
+                self._export_file(batch)
+        except Exception as exc:
+            logger.debug("Trace export of {} spans failed: {}", len(batch), exc)
+
+    def _export_file(self, batch: list[Span]) -> None:
+        path = settings.tracing_file
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for s in batch:
+                f.write(json.dumps({
+                    "trace_id": s.context.trace_id,
+                    "span_id": s.context.span_id,
+                    "parent_id": s.parent_id,
+                    "name": s.name,
+                    "service": settings.tracing_service_name,
+                    "start": s.start_ns / 1e9,
+                    "duration_ms": round(((s.end_ns or s.start_ns) - s.start_ns) / 1e6, 3),
+                    "attributes": s.attributes,
+                    "error": s.error,
+                }, default=str) + "\n")
+
+    def _export_otlp(self, batch: list[Span]) -> None:
+        import httpx
+
+        endpoint = settings.tracing_otlp_endpoint.rstrip("/")
+        if not endpoint.endswith("/v1/traces"):
+            endpoint += "/v1/traces"
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": settings.tracing_service_name}},
+                    {"key": "deployment.role", "value": {"stringValue": settings.deployment_role or "central"}},
+                ]},
+                "scopeSpans": [{"scope": {"name": "bbot-osint"}, "spans": [_otlp_span(s) for s in batch]}],
+            }]
+        }
+        httpx.post(endpoint, json=body, timeout=5.0).raise_for_status()
+
+
+_exporter = _Exporter()
+
+
+def flush() -> None:
+    """Export queued spans now (shutdown, CLI tools)."""
+    _exporter.flush()
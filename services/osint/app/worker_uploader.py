@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import base64
 import gzip
+import time
 from pathlib import Path
 from typing import Any
 
@@ -9,6 +10,7 @@ import httpx
 from loguru import logger
 
 from .config import settings
+from . import metrics, tracing
 
 
 def _resolve(value: Any, fallback: Any) -> Any:
@@ -42,6 +44,9 @@ def _post_payload(
         "X-Worker-Token": worker_token,
         "Content-Type": "application/json",
     }
+    traceparent = tracing.current_traceparent()
+    if traceparent:
+        headers["traceparent"] = traceparent
 
     with httpx.Client(verify=verify_tls, timeout=timeout) as client:
         resp = client.post(endpoint, headers=headers, json=payload)
@@ -67,25 +72,36 @@ def upload_output_json_bytes(
         raise ValueError("Payload is empty")
 
     use_compress = _resolve(compress, settings.central_upload_compress)
-    payload_bytes = gzip.compress(data) if use_compress else data
     encoding = "gzip" if use_compress else "plain"
-
-    payload = {
-        "scan_name": scan_name,
-        "default_domain": default_domain,
-        "encoding": encoding,
-        "payload_b64": base64.b64encode(payload_bytes).decode("ascii"),
-    }
+    with tracing.span("compress", encoding=encoding, raw_bytes=len(data)) as span:
+        payload_bytes = gzip.compress(data) if use_compress else data
+        payload = {
+            "scan_name": scan_name,
+            "default_domain": default_domain,
+            "encoding": encoding,
+            "payload_b64": base64.b64encode(payload_bytes).decode("ascii"),
+        }
+        span.set("payload_bytes", len(payload_bytes))
 
     endpoint = _build_endpoint(url)
-    resp = _post_payload(
-        endpoint,
-        payload,
-        worker_id=_resolve(worker_id, settings.central_worker_id),
-        worker_token=_resolve(worker_token, settings.central_worker_token),
-        verify_tls=_resolve(verify_tls, settings.central_api_verify_tls),
-        timeout=_resolve(timeout, settings.central_api_timeout),
-    )
+    started = time.perf_counter()
+    try:
+        with tracing.span("transfer", endpoint=endpoint, bytes=len(payload_bytes)):
+            resp = _post_payload(
+                endpoint,
+                payload,
+                worker_id=_resolve(worker_id, settings.central_worker_id),
+                worker_token=_resolve(worker_token, settings.central_worker_token),
+                verify_tls=_resolve(verify_tls, settings.central_api_verify_tls),
+                timeout=_resolve(timeout, settings.central_api_timeout),
+            )
+    except Exception:
+        metrics.UPLOADS.labels("failed").inc()
+        raise
+    finally:
+        metrics.UPLOAD_SECONDS.observe(time.perf_counter() - started)
+    metrics.UPLOADS.labels("ok").inc()
+    metrics.UPLOAD_BYTES.labels(encoding).inc(len(payload_bytes))
 
     try:
         body = resp.json()
@@ -119,5 +135,6 @@ def upload_scan_dir(
     if not output_file.exists():
         raise FileNotFoundError(f"output.json not found in scan dir: {path}")
     effective_scan = scan_name or path.name
-    return upload_output_json_file(output_file, default_domain, effective_scan, **kwargs)
+    with tracing.span("upload", scan_name=effective_scan, scan_dir=str(path)):
+        return upload_output_json_file(output_file, default_domain, effective_scan, **kwargs)
 
@@ -0,0 +1,6 @@
+"""Benchmarks for the importer (synthetic BBOT output and ingest runners) and the API.
+
+    python -m benchmarks.synth --events 100000 --out /tmp/output.json
+    python -m benchmarks.ingest_bench --events 100000 --target null --out results.json
+    python -m benchmarks.load_test --url http://localhost:8000 --mix query=20,mcp=20 --duration 60
+"""
@@ -0,0 +1,272 @@
+"""Ingest benchmark: run the import paths over one output.json and report throughput.
+
+Paths:
+
+- ``file``: ``ingest_output_json_file`` with a single writer (the default importer)
+- ``file_parallel``: the same with ``--writers`` writer threads and ``--parse-processes`` parsers
+- ``live``: ``LiveIngestor`` fed event by event, as during a scan with live ingest
+- ``per_event``: legacy ``ingest_event`` (one write transaction per event)
+- ``bulk_export``: offline CSV export for ``neo4j-admin import`` (never touches Neo4j)
+
+Targets: ``neo4j`` writes to the Neo4j configured by the usual env vars (use a throwaway
+container), ``memory`` to the in-process storage backend, and ``null`` swaps the Neo4j
+client's write calls for a counting stand-in so only the Python side (parse, map, batch
+building) is measured.
+
+Each path runs in a fresh interpreter so peak RSS and caches are per path. Results are
+written as JSON; ``--compare`` prints the change against an earlier result file.
+
+    python -m benchmarks.ingest_bench --events 200000 --target null --out results.json
+    python -m benchmarks.ingest_bench --file output.json --target neo4j --db-hits --compare results.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+PATHS = ("file", "file_parallel", "live", "per_event", "bulk_export")
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _install_null_target(counters: dict[str, int]) -> None:
+    """Replace Neo4j writes with a counter of statements and UNWIND rows."""
+    from app.neo4j_client import neo4j_client
+
+    def run_write_batch(statements: list[tuple[str, dict[str, Any]]]) -> int:
+        counters["transactions"] += 1
+        for _, params in statements:
+            counters["statements"] += 1
+            counters["rows"] += len((params or {}).get("rows") or ())
+        return 1
+
+    def write(cypher: str, parameters: dict[str, Any] | None = None) -> list[dict[str, Any]]:
+        counters["transactions"] += 1
+        counters["statements"] += 1
+        return []
+
+    neo4j_client.run_write_batch = run_write_batch  # type: ignore[method-assign]
+    neo4j_client.write = write  # type: ignore[method-assign]
+    neo4j_client.read = lambda cypher, parameters=None: []  # type: ignore[method-assign]
+
+
+async def _run_live(path: Path) -> int:
+    from app.live_ingest import LiveIngestor
+
+    live = LiveIngestor()
+    await live.start()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                await live.put(json.loads(line))
+    stats = await live.close()
+    if stats.get("failed"):
+        raise RuntimeError("live ingest writer failed")
+    return int(stats.get("events") or 0)
+
+
+def _run_per_event(path: Path) -> int:
+    from app.repository import ingest_event
+
+    count = 0
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                ingest_event(json.loads(line))
+                count += 1
+    return count
+
+
+def run_child(args: argparse.Namespace) -> dict[str, Any]:
+    from app import ingest_writer
+    from app.config import settings
+    from app.neo4j_client import neo4j_client
+
+    settings.ingest_batch_size = args.batch_size
+    if args.path == "file_parallel":
+        settings.ingest_writers = args.writers
+        settings.ingest_parse_processes = args.parse_processes
+        settings.ingest_parse_min_bytes = 0
+    else:
+        settings.ingest_writers = 1
+        settings.ingest_parse_processes = 1
+
+    counters = {"transactions": 0, "statements": 0, "rows": 0}
+    settings.storage_backend = "memory" if args.target == "memory" else "neo4j"
+    if args.target == "null":
+        _install_null_target(counters)
+    elif args.path != "bulk_export":
+        from app.repository import ensure_constraints
+        from app.storage import get_store
+
+        get_store().connect()
+        ensure_constraints()
+
+    # Per-batch flush latency from the metrics hook the batch writer already calls
+    latencies: list[float] = []
+    record = ingest_writer.record_ingested
+
+    def record_ingested(types, seconds: float) -> None:
+        latencies.append(seconds)
+        record(types, seconds)
+
+    ingest_writer.record_ingested = record_ingested
+
+    path = Path(args.file)
+    profile = args.db_hits and args.target == "neo4j"
+    hits_before = neo4j_client.metrics().get("db_hits", 0)
+    started = time.perf_counter()
+    with neo4j_client.profiling(profile):
+        if args.path in ("file", "file_parallel"):
+            from app.repository import ingest_output_json_file
+
+            events = ingest_output_json_file(str(path))
+        elif args.path == "live":
+            events = asyncio.run(_run_live(path))
+        elif args.path == "per_event":
+            events = _run_per_event(path)
+        else:
+            from app.bulk_export import export_files
+
+            with tempfile.TemporaryDirectory() as out_dir:
+                events = int(export_files([path], Path(out_dir)).get("events") or 0)
+    elapsed = time.perf_counter() - started
+
+    result: dict[str, Any] = {
+        "path": args.path,
+        "target": args.target,
+        "events": events,
+        "seconds": round(elapsed, 3),
+        "events_per_s": round(events / elapsed, 1) if elapsed > 0 else None,
+        "batches": len(latencies),
+        "batch_p50_ms": None,
+        "batch_p99_ms": None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "db_hits": neo4j_client.metrics().get("db_hits", 0) - hits_before if profile else None,
+    }
+    if latencies:
+        result["batch_p50_ms"] = round(statistics.median(latencies) * 1000, 2)
+        result["batch_p99_ms"] = round((_percentile(latencies, 99) or 0) * 1000, 2)
+    if args.target == "null":
+        result["null_target"] = counters
+    elif args.target == "memory":
+        from app.storage import get_store
+
+        result["graph"] = {k: v for k, v in get_store().stats().items() if k != "labels"}
+    return result
+
+
+def run_path(path_name: str, file: Path, args: argparse.Namespace) -> dict[str, Any]:
+    cmd = [
+        sys.executable, "-m", "benchmarks.ingest_bench", "--child", path_name,
+        "--file", str(file), "--target", args.target, "--batch-size", str(args.batch_size),
+        "--writers", str(args.writers), "--parse-processes", str(args.parse_processes),
+    ]
+    if args.db_hits:
+        cmd.append("--db-hits")
+    proc = subprocess.run(cmd, cwd=str(ROOT), capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"path": path_name, "error": proc.stderr.strip()[-1000:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> list[str]:
+    """Human-readable change per path: throughput, p99 batch latency and peak RSS."""
+    lines = []
+    prev = {r["path"]: r for r in previous.get("results", []) if "error" not in r}
+    for r in current.get("results", []):
+        old = prev.get(r["path"])
+        if "error" in r or not old:
+            continue
+        parts = [r["path"]]
+        for key, label in (("events_per_s", "events/s"), ("batch_p99_ms", "p99 ms"), ("peak_rss_mb", "RSS MB")):
+            if r.get(key) is not None and old.get(key):
+                parts.append(f"{label} {old[key]} -> {r[key]} ({(r[key] - old[key]) / old[key]:+.1%})")
+        lines.append("  ".join(parts))
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the output.json ingest paths")
+    parser.add_argument("--file", help="Existing output.json (default: generate one)")
+    parser.add_argument("--events", type=int, default=100000, help="Synthetic events when --file is not given")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=["file", "file_parallel", "live", "bulk_export"])
+    parser.add_argument("--target", choices=("null", "memory", "neo4j"), default="null")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--parse-processes", type=int, default=4)
+    parser.add_argument("--db-hits", action="store_true", help="PROFILE every statement (neo4j target; slower)")
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--child", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        args.path = args.child
+        print(json.dumps(run_child(args)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.file:
+            file = Path(args.file)
+        else:
+            from .synth import generate
+
+            file = generate(Path(tmp) / "output.json", args.events, seed=args.seed)
+        report = {
+            "meta": {
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "file": str(args.file) if args.file else None,
+                "file_bytes": file.stat().st_size,
+                "events": args.events if not args.file else None,
+                "target": args.target,
+                "batch_size": args.batch_size,
+                "writers": args.writers,
+                "parse_processes": args.parse_processes,
+            },
+            "results": [run_path(p, file, args) for p in args.paths],
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        for line in compare(report, previous):
+            print(line, file=sys.stderr)
+    return 0 if all("error" not in r for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Open-loop load generator for the API and the MCP shim.
+
+Each scenario fires at its own target rate (requests/s) for ``--duration`` seconds,
+independently of how fast the server answers, so a slow server shows up as latency and
+dropped requests instead of a silently lower request rate. Latency is measured from the
+scheduled send time, so time spent waiting on a saturated client counts as well.
+
+Scenarios (``--mix name=rate,...``):
+
+- ``query``: ``POST /query`` for one of the ``--domains``
+- ``events``: ``POST /events/query`` for a random event type
+- ``mcp``: ``POST /mcp/invoke`` cycling over ``osint.query``, ``osint.events.query`` and ``osint.status``
+- ``ingest``: ``POST /ingest/output`` with a gzip'ed synthetic output.json of ``--ingest-events``
+  events (needs ``--worker-id`` / ``--worker-token``)
+
+While the load runs the server's ``/debug/loop-lag`` is polled, so the report shows how late
+the API event loop ran. ``--max-error-rate``, ``--max-p99-ms`` and ``--max-loop-lag-ms`` turn
+the run into a gate: the exit code is 2 when one of them is exceeded.
+
+    python -m benchmarks.load_test --url http://localhost:8000 --mix query=20,events=10,mcp=20 \\
+        --duration 60 --out load.json --max-p99-ms 500 --max-loop-lag-ms 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import gzip
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+
+SCENARIOS = ("query", "events", "mcp", "ingest")
+_EVENT_TYPES = ("DNS_NAME", "OPEN_TCP_PORT", "URL", "TECHNOLOGY", "FINDING")
+_MCP_TOOLS = ("osint.query", "osint.events.query", "osint.status")
+
+
+def _percentile(ordered: list[float], pct: float) -> float | None:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, rate = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (expected {', '.join(SCENARIOS)})")
+        try:
+            mix[name] = float(rate)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad rate for {name}: {rate!r}") from None
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def _ingest_payload(events: int, seed: int) -> str:
+    from .synth import generate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generate(Path(tmp) / "output.json", events, seed=seed)
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb") as gz:
+            gz.write(path.read_bytes())
+    return base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+class Scenario:
+    def __init__(self, name: str, rate: float, build: Callable[[], tuple[str, dict[str, Any], dict[str, str]]]) -> None:
+        self.name = name
+        self.rate = rate
+        self.build = build
+        self.latencies: list[float] = []
+        self.statuses: dict[str, int] = {}
+        self.sent = 0
+        self.ok = 0
+        self.dropped = 0
+
+    def record(self, status: str, seconds: float) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(seconds)
+        if status.startswith("2"):
+            self.ok += 1
+
+    def report(self, duration: float) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+        errors = self.sent - self.ok
+        out: dict[str, Any] = {
+            "target_rps": self.rate,
+            "sent": self.sent,
+            "ok": self.ok,
+            "errors": errors,
+            "dropped": self.dropped,
+            "error_rate": round(errors / self.sent, 4) if self.sent else 0.0,
+            "throughput_rps": round(self.ok / duration, 2) if duration > 0 else None,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+        for pct in (50, 90, 99):
+            value = _percentile(ordered, pct)
+            out[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+        out["max_ms"] = round(ordered[-1] * 1000, 2) if ordered else None
+        return out
+
+
+def build_scenarios(args: argparse.Namespace, mix: dict[str, float]) -> list[Scenario]:
+    rng = random.Random(args.seed)
+    auth = {"X-API-Token": args.token} if args.token else {}
+    tools = itertools.cycle(_MCP_TOOLS)
+
+    def query() -> tuple[str, dict[str, Any], dict[str, str]]:
+        return "/query", {"domain": rng.choice(args.domains), "limit": 50}, auth
+
+    def events() -> tuple[str, dict[str, Any], dict[str, str]]:
+        return "/events/query", {"types": [rng.choice(_EVENT_TYPES)], "limit": 100}, auth
+
+    def mcp() -> tuple[str, dict[str, Any], dict[str, str]]:
+        tool = next(tools)
+        arguments: dict[str, Any] = {}
+        if tool == "osint.query":
+            arguments = {"domain": rng.choice(args.domains), "limit": 50}
+        elif tool == "osint.events.query":
+            arguments = {"types": [rng.choice(_EVENT_TYPES)], "limit": 100}
+        return "/mcp/invoke", {"tool": tool, "arguments": arguments}, auth
+
+    scenarios = []
+    for name, rate in mix.items():
+        if name == "ingest":
+            if not (args.worker_id and args.worker_token):
+                raise SystemExit("the ingest scenario needs --worker-id and --worker-token")
+            body = {
+                "scan_name": "load_test",
+                "default_domain": args.domains[0],
+                "encoding": "gzip",
+                "payload_b64": _ingest_payload(args.ingest_events, args.seed),
+            }
+            headers = {"X-Worker-Id": args.worker_id, "X-Worker-Token": args.worker_token}
+            scenarios.append(Scenario(name, rate, lambda: ("/ingest/output", body, headers)))
+        else:
+            scenarios.append(Scenario(name, rate, {"query": query, "events": events, "mcp": mcp}[name]))
+    return scenarios
+
+
+class LoadRun:
+    def __init__(self, args: argparse.Namespace, scenarios: list[Scenario]) -> None:
+        self.args = args
+        self.scenarios = scenarios
+        self.in_flight = 0
+        self.lag_timeline: list[dict[str, Any]] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _send(self, client: httpx.AsyncClient, sc: Scenario, scheduled: float) -> None:
+        path, body, headers = sc.build()
+        try:
+            resp = await client.post(path, json=body, headers=headers)
+            status = str(resp.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        finally:
+            self.in_flight -= 1
+        sc.record(status, time.perf_counter() - scheduled)
+
+    async def _drive(self, client: httpx.AsyncClient, sc: Scenario, start: float, end: float) -> None:
+        rng = random.Random(f"{self.args.seed}:{sc.name}")
+        next_at = start
+        while next_at < end:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sc.sent += 1
+            if self.in_flight >= self.args.max_in_flight:
+                # Client saturated: count the miss rather than silently slowing down
+                sc.dropped += 1
+                sc.statuses["dropped"] = sc.statuses.get("dropped", 0) + 1
+            else:
+                self.in_flight += 1
+                task = asyncio.create_task(self._send(client, sc, next_at))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            next_at += rng.expovariate(sc.rate) if self.args.poisson else 1 / sc.rate
+
+    async def _loop_lag(self, client: httpx.AsyncClient, since: float) -> dict[str, Any] | None:
+        headers = {"X-API-Token": self.args.token} if self.args.token else {}
+        try:
+            resp = await client.get("/debug/loop-lag", params={"since": since}, headers=headers)
+            return resp.json() if resp.status_code == 200 else None
+        except httpx.HTTPError:
+            return None
+
+    async def _poll_lag(self, client: httpx.AsyncClient, start_wall: float, stop: asyncio.Event) -> None:
+        last = start_wall
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.args.lag_poll)
+            except asyncio.TimeoutError:
+                pass
+            now = time.time()
+            summary = await self._loop_lag(client, last)
+            if summary and summary.get("samples"):
+                self.lag_timeline.append({"t": round(now - start_wall, 1), **summary})
+            last = now
+
+    async def run(self) -> dict[str, Any]:
+        limits = httpx.Limits(max_connections=self.args.max_in_flight, max_keepalive_connections=self.args.max_in_flight)
+        async with httpx.AsyncClient(base_url=self.args.url, timeout=self.args.timeout, limits=limits) as client:
+            start_wall = time.time()
+            start = time.perf_counter()
+            end = start + self.args.duration
+            stop = asyncio.Event()
+            poller = asyncio.create_task(self._poll_lag(client, start_wall, stop))
+            await asyncio.gather(*(self._drive(client, sc, start, end) for sc in self.scenarios))
+            if self._tasks:
+                await asyncio.wait(set(self._tasks))
+            duration = time.perf_counter() - start
+            stop.set()
+            await poller
+            loop_lag = await self._loop_lag(client, start_wall)
+        results = {sc.name: sc.report(duration) for sc in self.scenarios}
+        total_sent = sum(sc.sent for sc in self.scenarios)
+        total_ok = sum(sc.ok for sc in self.scenarios)
+        all_latencies = sorted(lat for sc in self.scenarios for lat in sc.latencies)
+        p99 = _percentile(all_latencies, 99)
+        return {
+            "duration_s": round(duration, 2),
+            "scenarios": results,
+            "total": {
+                "sent": total_sent,
+                "ok": total_ok,
+                "error_rate": round((total_sent - total_ok) / total_sent, 4) if total_sent else 0.0,
+                "throughput_rps": round(total_ok / duration, 2) if duration > 0 else None,
+                "p99_ms": round(p99 * 1000, 2) if p99 is not None else None,
+            },
+            "loop_lag": loop_lag,
+            "loop_lag_timeline": self.lag_timeline,
+        }
+
+
+def check_gates(report: dict[str, Any], args: argparse.Namespace) -> list[str]:
+    failures = []
+    total = report["total"]
+    if args.max_error_rate is not None and total["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {total['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.max_p99_ms is not None:
+        for name, sc in report["scenarios"].items():
+            if sc["p99_ms"] is not None and sc["p99_ms"] > args.max_p99_ms:
+                failures.append(f"{name} p99 {sc['p99_ms']} ms > {args.max_p99_ms} ms")
+    if args.max_loop_lag_ms is not None:
+        lag = report.get("loop_lag") or {}
+        if lag.get("p99_ms") is None:
+            failures.append("no loop lag samples (is LOOP_LAG_INTERVAL_MS > 0 and /debug/loop-lag reachable?)")
+        elif lag["p99_ms"] > args.max_loop_lag_ms:
+            failures.append(f"event loop lag p99 {lag['p99_ms']} ms > {args.max_loop_lag_ms} ms")
+    return failures
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> list[str]:
+    lines = []
+    prev = previous.get("scenarios", {})
+    for name, sc in current.get("scenarios", {}).items():
+        old = prev.get(name)
+        if not old:
+            continue
+        parts = [name]
+        for key, label in (("throughput_rps", "rps"), ("p99_ms", "p99 ms"), ("error_rate", "errors")):
+            if sc.get(key) is not None and old.get(key):
+                parts.append(f"{label} {old[key]} -> {sc[key]} ({(sc[key] - old[key]) / old[key]:+.1%})")
+        lines.append("  ".join(parts))
+    old_lag = (previous.get("loop_lag") or {}).get("p99_ms")
+    new_lag = (current.get("loop_lag") or {}).get("p99_ms")
+    if old_lag is not None and new_lag is not None:
+        lines.append(f"loop lag p99 ms {old_lag} -> {new_lag}")
+    return lines
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API and MCP endpoints at target rates")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", default=os.getenv("API_TOKEN"), help="X-API-Token (default: $API_TOKEN)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("query=10,events=5,mcp=10"),
+                        help="Requests/s per scenario, e.g. query=20,events=10,mcp=20,ingest=0.5")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of a fixed gap")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Client-side concurrency cap; excess sends count as dropped")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--domains", nargs="+", default=["evilcorp.com", "example.org"])
+    parser.add_argument("--worker-id", default=os.getenv("CENTRAL_WORKER_ID"))
+    parser.add_argument("--worker-token", default=os.getenv("CENTRAL_WORKER_TOKEN"))
+    parser.add_argument("--ingest-events", type=int, default=500, help="Events per /ingest/output payload")
+    parser.add_argument("--lag-poll", type=float, default=5.0, help="Seconds between /debug/loop-lag polls")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the report JSON here")
+    parser.add_argument("--compare", help="Earlier report JSON to compare against")
+    parser.add_argument("--max-error-rate", type=float, help="Gate: fail above this overall error rate (0-1)")
+    parser.add_argument("--max-p99-ms", type=float, help="Gate: fail when any scenario's p99 exceeds this")
+    parser.add_argument("--max-loop-lag-ms", type=float, help="Gate: fail when the server's loop lag p99 exceeds this")
+    args = parser.parse_args(argv)
+    if not args.mix:
+        parser.error("--mix has no scenario with a positive rate")
+
+    scenarios = build_scenarios(args, args.mix)
+    started = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    report = asyncio.run(LoadRun(args, scenarios).run())
+    report["meta"] = {
+        "url": args.url,
+        "mix": args.mix,
+        "duration": args.duration,
+        "poisson": args.poisson,
+        "max_in_flight": args.max_in_flight,
+        "python": platform.python_version(),
+        "started": started,
+    }
+    failures = check_gates(report, args)
+    report["gate_failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        for line in compare(report, previous):
+            print(line, file=sys.stderr)
+    for failure in failures:
+        print(f"GATE FAILED: {failure}", file=sys.stderr)
+    return 2 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
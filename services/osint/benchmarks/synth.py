@@ -0,0 +1,196 @@
+"""Synthetic BBOT ``output.json`` generator.
+
+Produces JSON lines shaped like BBOT 2.x output: a leading SCAN event with the seeds, a
+type mix dominated by DNS_NAME / OPEN_TCP_PORT / URL, and a final SCAN event with
+``finished_at``. Hosts are drawn from a per-domain pool with a heavy-tailed popularity, so a
+few hosts carry most ports, URLs and findings (as in real scans), and hosts share IPs from
+a smaller pool (CDNs, shared hosting), which gives ``resolved_hosts`` realistic fan-in.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+DEFAULT_MIX: dict[str, float] = {
+    "DNS_NAME": 0.40,
+    "OPEN_TCP_PORT": 0.18,
+    "URL": 0.14,
+    "URL_UNVERIFIED": 0.05,
+    "TECHNOLOGY": 0.09,
+    "IP_ADDRESS": 0.05,
+    "FINDING": 0.03,
+    "PROTOCOL": 0.03,
+    "EMAIL_ADDRESS": 0.02,
+    "STORAGE_BUCKET": 0.01,
+}
+
+_PORTS = (80, 443, 443, 443, 8080, 8443, 22, 21, 25, 3306, 5432, 6379, 9200)
+_TECH = ("nginx", "apache", "cloudflare", "wordpress", "php", "react", "jquery", "iis", "envoy", "varnish")
+_MODULES = {
+    "DNS_NAME": ("subdomaincenter", "crt", "dnsbrute", "anubisdb", "certspotter"),
+    "OPEN_TCP_PORT": ("portscan", "speculate"),
+    "URL": ("httpx",),
+    "URL_UNVERIFIED": ("excavate", "wayback"),
+    "TECHNOLOGY": ("wappalyzer", "httpx"),
+    "IP_ADDRESS": ("speculate",),
+    "FINDING": ("badsecrets", "nuclei", "telerik"),
+    "PROTOCOL": ("fingerprintx",),
+    "EMAIL_ADDRESS": ("emailformat", "hunterio"),
+    "STORAGE_BUCKET": ("bucket_amazon", "bucket_azure"),
+}
+_WORDS = ("api", "www", "mail", "dev", "staging", "vpn", "cdn", "app", "admin", "portal", "shop", "docs", "git", "auth")
+
+
+def _evid(etype: str, key: str) -> str:
+    return f"{etype}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+
+class Generator:
+    def __init__(
+        self,
+        domains: list[str],
+        hosts_per_domain: int = 2000,
+        ips: int | None = None,
+        mix: dict[str, float] | None = None,
+        seed: int = 1,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.domains = domains
+        self.mix = mix or DEFAULT_MIX
+        self.hosts = {
+            d: [f"{self.rng.choice(_WORDS)}{i}.{d}" if i else d for i in range(hosts_per_domain)] for d in domains
+        }
+        n_ips = ips or max(16, hosts_per_domain * len(domains) // 4)
+        self.ips = [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(1, n_ips + 1)]
+        # Stable host -> IP assignment; several hosts share one IP
+        self._host_ips: dict[str, list[str]] = {}
+        self.started = time.time() - 3600
+
+    def _popular(self, items: list[str]) -> str:
+        # Pareto-ish popularity: low indexes are picked far more often
+        idx = int(self.rng.paretovariate(1.2)) - 1
+        return items[idx % len(items)]
+
+    def _resolved(self, host: str) -> list[str]:
+        ips = self._host_ips.get(host)
+        if ips is None:
+            ips = [self._popular(self.ips) for _ in range(self.rng.choice((1, 1, 1, 2, 2, 4)))]
+            self._host_ips[host] = ips
+        return ips
+
+    def _base(self, etype: str, data: Any, key: str, host: str | None, domain: str, n: int) -> dict[str, Any]:
+        ev: dict[str, Any] = {
+            "type": etype,
+            "id": _evid(etype, key),
+            "uuid": f"{etype}:{n:012x}",
+            "data": data,
+            "scope_distance": 0,
+            "scan": "SCAN:benchmark",
+            "timestamp": self.started + n * 0.01,
+            "parent": _evid("DNS_NAME", domain),
+            "tags": ["in-scope"],
+            "module": self.rng.choice(_MODULES.get(etype, ("speculate",))),
+            "module_sequence": "",
+        }
+        if host:
+            ev["host"] = host
+            ev["resolved_hosts"] = self._resolved(host)
+        return ev
+
+    def event(self, n: int) -> dict[str, Any]:
+        etype = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        domain = self.rng.choice(self.domains)
+        host = self._popular(self.hosts[domain])
+        if etype == "DNS_NAME":
+            # Enumeration walks the whole host pool, so DNS names are spread uniformly
+            host = self.rng.choice(self.hosts[domain])
+            return self._base(etype, host, host, host, domain, n)
+        if etype == "OPEN_TCP_PORT":
+            endpoint = f"{host}:{self.rng.choice(_PORTS)}"
+            return self._base(etype, endpoint, endpoint, host, domain, n)
+        if etype in ("URL", "URL_UNVERIFIED"):
+            url = f"https://{host}/{self.rng.choice(_WORDS)}/{self.rng.randrange(50)}"
+            ev = self._base(etype, url, url, host, domain, n)
+            ev["tags"] = ["in-scope", "status-200", "http-title-home"]
+            return ev
+        if etype == "TECHNOLOGY":
+            tech = self.rng.choice(_TECH)
+            data = {"technology": tech, "url": f"https://{host}/", "host": host}
+            return self._base(etype, data, f"{host}|{tech}", host, domain, n)
+        if etype == "IP_ADDRESS":
+            ip = self._popular(self.ips)
+            return self._base(etype, ip, ip, ip, domain, n)
+        if etype == "FINDING":
+            desc = f"{self.rng.choice(('Exposed', 'Outdated', 'Misconfigured'))} {self.rng.choice(_TECH)} on {host}"
+            data = {"description": desc, "host": host, "url": f"https://{host}/"}
+            return self._base(etype, data, desc, host, domain, n)
+        if etype == "PROTOCOL":
+            port = self.rng.choice(_PORTS)
+            data = {"protocol": self.rng.choice(("SSH", "FTP", "SMTP", "MYSQL", "REDIS")), "host": host, "port": port}
+            ev = self._base(etype, data, f"{host}:{port}", host, domain, n)
+            ev["port"] = port
+            return ev
+        if etype == "EMAIL_ADDRESS":
+            email = f"{self.rng.choice(('info', 'admin', 'security', 'hr'))}{self.rng.randrange(100)}@{domain}"
+            return self._base(etype, email, email, domain, domain, n)
+        name = f"{domain.split('.')[0]}-{self.rng.choice(_WORDS)}-{self.rng.randrange(20)}"
+        data = {"name": name, "url": f"https://{name}.s3.amazonaws.com/"}
+        return self._base(etype, data, name, f"{name}.s3.amazonaws.com", domain, n)
+
+    def scan_event(self, finished: bool) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "name": "synthetic_benchmark",
+            "id": "SCAN:benchmark",
+            "target": {"seeds": self.domains, "whitelist": self.domains},
+            "status": "FINISHED" if finished else "RUNNING",
+        }
+        if finished:
+            data["finished_at"] = time.time()
+        return {"type": "SCAN", "id": "SCAN:benchmark", "data": data, "tags": [], "module": "TARGET"}
+
+    def iter_events(self, count: int) -> Iterator[dict[str, Any]]:
+        yield self.scan_event(False)
+        for n in range(count):
+            yield self.event(n)
+        yield self.scan_event(True)
+
+
+def generate(
+    out: str | Path,
+    events: int,
+    domains: list[str] | None = None,
+    hosts_per_domain: int = 2000,
+    seed: int = 1,
+) -> Path:
+    """Write ``events`` synthetic events (plus the two SCAN events) to ``out``."""
+    path = Path(out)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    gen = Generator(domains or ["evilcorp.com", "example.org"], hosts_per_domain=hosts_per_domain, seed=seed)
+    with path.open("w", encoding="utf-8") as f:
+        for ev in gen.iter_events(events):
+            f.write(json.dumps(ev, separators=(",", ":")) + "\n")
+    return path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic BBOT output.json")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--domains", nargs="+", default=["evilcorp.com", "example.org"])
+    parser.add_argument("--hosts-per-domain", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    path = generate(args.out, args.events, args.domains, args.hosts_per_domain, args.seed)
+    print(f"{path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
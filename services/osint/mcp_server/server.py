@@ -1,13 +1,28 @@
+import asyncio
+import contextlib
+import functools
 import json
-from typing import Any, Callable, Dict
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import orjson
 
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
+from loguru import logger
+from neo4j.exceptions import ServiceUnavailable
 from pydantic import BaseModel, Field, ValidationError
 
-from app.models import EventsQueryRequest, QueryRequest
-from app.repository import query_events, query_subdomains
+from app.models import EventRollupQueryRequest, EventsQueryRequest, QueryRequest
+from app.repository import iter_events, iter_subdomains, query_event_rollups, query_events, query_subdomains
+from app.admission import Overloaded, admission, rate_limiter
 from app.config import settings
+from app.neo4j_client import neo4j_client
+from app.storage import UnsupportedByBackend
+from app import metrics, shaping
+from mcp_server.streaming import KEEPALIVE, SSEResponse, iterate_in_thread, sse
 
 
 """
@@ -27,9 +42,48 @@ async def token_middleware(request: Request, call_next):
     return await call_next(request)
 
 
+@mcp_app.exception_handler(Overloaded)
+async def _overloaded(request: Request, exc: Overloaded):
+    return JSONResponse(status_code=429, content={"detail": exc.detail}, headers={"Retry-After": exc.retry_after_header})
+
+
+@mcp_app.exception_handler(shaping.CursorError)
+async def _bad_cursor(request: Request, exc: shaping.CursorError):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+
+@mcp_app.exception_handler(UnsupportedByBackend)
+async def _unsupported_by_backend(request: Request, exc: UnsupportedByBackend):
+    return JSONResponse(status_code=501, content={"detail": str(exc)})
+
+
 class MCPInvokeRequest(BaseModel):
     tool: str
     arguments: Dict[str, Any] = Field(default_factory=dict)
+    # Stream the output as server-sent events (same as sending "Accept: text/event-stream")
+    stream: bool = False
+
+
+def _instrumented(tool: str) -> Callable[[Callable[[Dict[str, Any]], Dict[str, Any]]], Callable[[Dict[str, Any]], Dict[str, Any]]]:
+    """Count invocations and observe latency of a tool executor (all entry points)."""
+    seconds = metrics.MCP_SECONDS.labels(tool)
+
+    def decorate(fn: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        @functools.wraps(fn)
+        def wrapper(payload: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            status = "error"
+            try:
+                result = fn(payload)
+                status = "ok"
+                return result
+            finally:
+                seconds.observe(time.perf_counter() - started)
+                metrics.MCP_INVOCATIONS.labels(tool, status).inc()
+
+        return wrapper
+
+    return decorate
 
 
 def _schema_for(model: type[BaseModel]) -> Dict[str, Any]:
@@ -38,36 +92,73 @@ def _schema_for(model: type[BaseModel]) -> Dict[str, Any]:
     return schema
 
 
-def _run_osint_query(payload: Dict[str, Any]) -> Dict[str, Any]:
+def _validated(model: type[BaseModel], payload: Dict[str, Any]) -> Any:
     try:
-        req = QueryRequest(**payload)
+        return model(**payload)
     except ValidationError as exc:
         raise HTTPException(status_code=422, detail=json.loads(exc.json())) from exc
-    rows = list(
-        query_subdomains(req.domain, req.host, req.online_only, req.limit)
-    )
-    return {"results": rows}
 
 
+def _with_profile(body: Dict[str, Any], plans: list | None) -> Dict[str, Any]:
+    if plans is not None:
+        body["profile"] = plans
+    return body
+
+
+@_instrumented("osint.query")
+def _run_osint_query(payload: Dict[str, Any]) -> Dict[str, Any]:
+    req = _validated(QueryRequest, payload)
+    offset = shaping.cursor_offset(req)
+    with neo4j_client.profiling(req.profile) as plans:
+        rows = list(
+            query_subdomains(req.domain, req.host, req.online_only, req.limit, offset)
+        )
+    if shaping.requested(req):
+        return _with_profile(shaping.shape(rows, req, offset, "osint.query"), plans)
+    return _with_profile({"results": rows}, plans)
+
+
+@_instrumented("osint.events.query")
 def _run_osint_events_query(payload: Dict[str, Any]) -> Dict[str, Any]:
-    try:
-        req = EventsQueryRequest(**payload)
-    except ValidationError as exc:
-        raise HTTPException(status_code=422, detail=json.loads(exc.json())) from exc
-    rows = list(
-        query_events(
+    req = _validated(EventsQueryRequest, payload)
+    offset = shaping.cursor_offset(req)
+    with neo4j_client.profiling(req.profile) as plans:
+        rows = list(
+            query_events(
+                req.types,
+                req.modules,
+                req.domain,
+                req.host,
+                req.since_ts,
+                req.until_ts,
+                req.limit,
+                offset,
+            )
+        )
+    if shaping.requested(req):
+        return _with_profile(shaping.shape(rows, req, offset, "osint.events.query"), plans)
+    return _with_profile({"results": rows}, plans)
+
+
+@_instrumented("osint.events.rollups")
+def _run_osint_events_rollups(payload: Dict[str, Any]) -> Dict[str, Any]:
+    req = _validated(EventRollupQueryRequest, payload)
+    with neo4j_client.profiling(req.profile) as plans:
+        rows = query_event_rollups(
             req.types,
             req.modules,
             req.domain,
-            req.host,
             req.since_ts,
             req.until_ts,
+            req.bucket,
+            req.group_by,
+            req.include_raw,
             req.limit,
         )
-    )
-    return {"results": rows}
+    return _with_profile({"results": rows, "bucket": req.bucket}, plans)
 
 
+@_instrumented("osint.status")
 def _run_osint_status(_payload: Dict[str, Any]) -> Dict[str, Any]:
     from app.scheduler import scanner
 
@@ -79,19 +170,59 @@ def _run_osint_status(_payload: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _chunked(rows: Iterator[dict], size: int) -> Iterator[tuple[str, Dict[str, Any]]]:
+    with contextlib.closing(rows):
+        chunk: list[dict] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield "rows", {"rows": chunk}
+                chunk = []
+        if chunk:
+            yield "rows", {"rows": chunk}
+
+
+def _stream_osint_query(req: QueryRequest, cancel: threading.Event) -> Iterator[tuple[str, Dict[str, Any]]]:
+    with neo4j_client.profiling(req.profile) as plans:
+        yield from _chunked(
+            iter_subdomains(req.domain, req.host, req.online_only, req.limit, shaping.cursor_offset(req), cancel),
+            settings.mcp_stream_chunk_rows,
+        )
+    yield "result", _with_profile({}, plans)
+
+
+def _stream_osint_events_query(req: EventsQueryRequest, cancel: threading.Event) -> Iterator[tuple[str, Dict[str, Any]]]:
+    with neo4j_client.profiling(req.profile) as plans:
+        yield from _chunked(
+            iter_events(req.types, req.modules, req.domain, req.host, req.since_ts, req.until_ts, req.limit, shaping.cursor_offset(req), cancel),
+            settings.mcp_stream_chunk_rows,
+        )
+    yield "result", _with_profile({}, plans)
+
+
 TOOL_DEFINITIONS: Dict[str, Dict[str, Any]] = {
     "osint.query": {
         "name": "osint.query",
         "label": "Query Hosts",
-        "description": "Return hosts discovered for a domain/host filter from Neo4j.",
+        "description": "Return hosts discovered for a domain/host filter from Neo4j (max_tokens/cursor page large results).",
         "input_schema": _schema_for(QueryRequest),
     },
     "osint.events.query": {
         "name": "osint.events.query",
         "label": "Query Events",
-        "description": "Return raw event records filtered by type, module, or scope.",
+        "description": (
+            "Return raw event records filtered by type, module, or scope. Set max_tokens (or max_bytes) for a "
+            "size-bounded page with summarized raw JSON, group_by to group rows, and pass next_cursor back as "
+            "cursor for the next page."
+        ),
         "input_schema": _schema_for(EventsQueryRequest),
     },
+    "osint.events.rollups": {
+        "name": "osint.events.rollups",
+        "label": "Event Time Series",
+        "description": "Count events per day or week (by domain, type or module), including history kept only as rollups.",
+        "input_schema": _schema_for(EventRollupQueryRequest),
+    },
     "osint.status": {
         "name": "osint.status",
         "label": "Scanner Status",
@@ -104,10 +235,27 @@ TOOL_DEFINITIONS: Dict[str, Dict[str, Any]] = {
 TOOL_EXECUTORS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
     "osint.query": _run_osint_query,
     "osint.events.query": _run_osint_events_query,
+    "osint.events.rollups": _run_osint_events_rollups,
     "osint.status": _run_osint_status,
 }
 
 
+# Argument models, used to normalize batch calls before merging identical ones
+TOOL_MODELS: Dict[str, Optional[type[BaseModel]]] = {
+    "osint.query": QueryRequest,
+    "osint.events.query": EventsQueryRequest,
+    "osint.events.rollups": EventRollupQueryRequest,
+    "osint.status": None,
+}
+
+
+# Tools whose rows are streamed as they are fetched: (argument model, frame generator)
+STREAM_EXECUTORS: Dict[str, tuple[type[BaseModel], Callable[[Any, threading.Event], Iterator[tuple[str, Dict[str, Any]]]]]] = {
+    "osint.query": (QueryRequest, _stream_osint_query),
+    "osint.events.query": (EventsQueryRequest, _stream_osint_events_query),
+}
+
+
 @mcp_app.get("/")
 async def mcp_root() -> dict[str, Any]:
     """Root endpoint so HTTP-based MCP clients can perform a quick handshake."""
@@ -119,11 +267,14 @@ async def mcp_root() -> dict[str, Any]:
         "endpoints": {
             "tools": "/mcp/tools",
             "invoke": "/mcp/invoke",
+            "invoke_batch": "/mcp/invoke/batch",
             "health": "/mcp/healthz",
         },
         "capabilities": {
-            "tools": ["list", "invoke"],
-            "streaming": False,
+            "tools": ["list", "invoke", "batch"],
+            # POST /mcp/invoke with "Accept: text/event-stream" (or "stream": true)
+            "streaming": True,
+            "transports": ["http", "sse"],
         },
         "requires_token": bool(settings.api_token),
     }
@@ -148,12 +299,12 @@ async def mcp_query(
         "online_only": online_only,
         "limit": limit,
     }
-    return _run_osint_query(payload)
+    return await run_in_threadpool(_run_osint_query, payload)
 
 
 @mcp_app.post("/tools/osint.query")
 async def mcp_query_post(body: Dict[str, Any]) -> dict[str, Any]:
-    return _run_osint_query(body)
+    return await run_in_threadpool(_run_osint_query, body)
 
 
 @mcp_app.get("/tools")
@@ -206,12 +357,17 @@ async def mcp_events_query(
         "until_ts": until_ts,
         "limit": limit,
     }
-    return _run_osint_events_query(payload)
+    return await run_in_threadpool(_run_osint_events_query, payload)
 
 
 @mcp_app.post("/tools/osint.events.query")
 async def mcp_events_query_post(body: Dict[str, Any]) -> dict[str, Any]:
-    return _run_osint_events_query(body)
+    return await run_in_threadpool(_run_osint_events_query, body)
+
+
+@mcp_app.post("/tools/osint.events.rollups")
+async def mcp_events_rollups_post(body: Dict[str, Any]) -> dict[str, Any]:
+    return await run_in_threadpool(_run_osint_events_rollups, body)
 
 
 @mcp_app.get("/tools/osint.status")
@@ -227,12 +383,233 @@ async def mcp_status_post(body: Dict[str, Any] | None = None) -> dict[str, Any]:
     return _run_osint_status({})
 
 
+def _error_frame(exc: BaseException) -> Dict[str, Any]:
+    if isinstance(exc, HTTPException):
+        return {"status": exc.status_code, "detail": exc.detail}
+    if isinstance(exc, UnsupportedByBackend):
+        return {"status": 501, "detail": str(exc)}
+    if isinstance(exc, shaping.CursorError):
+        return {"status": 422, "detail": str(exc)}
+    if isinstance(exc, Overloaded):
+        return {"status": 429, "detail": exc.detail, "retry_after": exc.retry_after_header}
+    if isinstance(exc, ServiceUnavailable):
+        return {"status": 503, "detail": "Neo4j unavailable", "error": str(exc)}
+    return {"status": 500, "detail": "Internal Server Error"}
+
+
+class _StreamSlot:
+    """Admission read slot of one stream, released once the query has really stopped.
+
+    The worker thread that runs the frames releases it after closing them (a query still
+    computing its first row runs until then); ``on_close`` releases it only when no worker
+    ever took it over.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._state = "held"
+
+    def guard(self, frames: Iterator[Any]) -> Iterator[Any]:
+        with self._lock:
+            if self._state == "released":
+                return  # response already closed: don't start the query
+            self._state = "running"
+        try:
+            yield from frames
+        finally:
+            frames.close()
+            self._release()
+
+    def on_close(self) -> None:
+        with self._lock:
+            if self._state != "held":
+                return
+        self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            if self._state == "released":
+                return
+            self._state = "released"
+        admission.release("read")
+
+
+async def _stream_invoke(tool: str, arguments: Dict[str, Any]) -> SSEResponse:
+    """``/mcp/invoke`` as server-sent events.
+
+    Frames: ``start``, then ``rows`` (``{"rows": [...]}``, up to MCP_STREAM_CHUNK_ROWS each) for
+    streamable tools, then one ``result`` with the summary (``rows``, ``elapsed_ms``, plus
+    ``output`` for tools that are not streamed and ``profile`` when requested), or ``error``.
+    """
+    stream = STREAM_EXECUTORS.get(tool)
+    slot: Optional[_StreamSlot] = None
+    if stream is not None:
+        model, generate = stream
+        req = _validated(model, arguments)  # argument errors are still a plain 422
+        shaping.cursor_offset(req)  # ... and so is a bad cursor
+        # The stream holds a read slot until its query ends; a full queue is still a plain 429
+        await run_in_threadpool(admission.acquire, "read")
+        slot = _StreamSlot()
+        guard = slot.guard
+
+        def make_frames(cancel: threading.Event) -> Iterator[tuple[str, Dict[str, Any]]]:
+            return guard(generate(req, cancel))
+    else:
+        handler = TOOL_EXECUTORS[tool]
+
+        def make_frames(_cancel: threading.Event) -> Iterator[tuple[str, Dict[str, Any]]]:
+            yield "result", {"output": handler(arguments)}
+
+    async def events():
+        started = time.perf_counter()
+        cancel = threading.Event()
+        status = "cancelled"
+        total = 0
+        frames = iterate_in_thread(make_frames(cancel), cancel, keepalive=settings.mcp_stream_keepalive_seconds or None)
+        try:
+            yield sse("start", {"tool": tool})
+            try:
+                async for frame in frames:
+                    if frame is None:
+                        yield KEEPALIVE
+                        continue
+                    event, data = frame
+                    if event == "rows":
+                        total += len(data["rows"])
+                    else:
+                        data = {"tool": tool, "rows": total, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1), **data}
+                    yield sse(event, data)
+            except Exception as exc:
+                status = "error"
+                if not isinstance(exc, (HTTPException, UnsupportedByBackend, Overloaded)):
+                    logger.exception("Streamed MCP tool {} failed", tool)
+                yield sse("error", {"tool": tool, "rows": total, **_error_frame(exc)})
+            else:
+                status = "ok"
+            finally:
+                await frames.aclose()
+        finally:
+            if stream is not None:  # non-streamed tools are counted by their executor
+                metrics.MCP_SECONDS.labels(tool).observe(time.perf_counter() - started)
+                metrics.MCP_INVOCATIONS.labels(tool, status).inc()
+
+    return SSEResponse(events(), on_close=slot.on_close if slot is not None else None)
+
+
 @mcp_app.post("/invoke")
-async def mcp_invoke(req: MCPInvokeRequest) -> dict[str, Any]:
+async def mcp_invoke(req: MCPInvokeRequest, request: Request) -> Any:
     handler = TOOL_EXECUTORS.get(req.tool)
     if not handler:
         raise HTTPException(status_code=404, detail="Unknown tool")
-    return {"tool": req.tool, "output": handler(req.arguments)}
+    if req.stream or "text/event-stream" in request.headers.get("accept", ""):
+        return await _stream_invoke(req.tool, req.arguments)
+    # Executors block on the database (and on admission slots): keep them off the event loop
+    return {"tool": req.tool, "output": await run_in_threadpool(handler, req.arguments)}
+
+
+class MCPBatchCall(BaseModel):
+    # Echoed back so results can be matched to calls (default: position in the batch)
+    id: Optional[str] = None
+    tool: str
+    arguments: Dict[str, Any] = Field(default_factory=dict)
+
+
+class MCPBatchRequest(BaseModel):
+    calls: list[MCPBatchCall] = Field(min_length=1)
+    # Send each result as an SSE frame as soon as it completes (or "Accept: text/event-stream")
+    stream: bool = False
+    max_concurrency: Optional[int] = Field(default=None, gt=0)
+
+
+def _merge_key(tool: str, arguments: Dict[str, Any]) -> bytes:
+    """Identity of a call after argument defaults are applied (invalid arguments stay as sent)."""
+    model = TOOL_MODELS.get(tool)
+    normalized: Any = arguments
+    if model is not None:
+        with contextlib.suppress(ValidationError):
+            normalized = model(**arguments).model_dump(mode="json")
+    return orjson.dumps([tool, normalized], option=orjson.OPT_SORT_KEYS, default=str)
+
+
+async def _run_call(tool: str, arguments: Dict[str, Any], limit: asyncio.Semaphore) -> Dict[str, Any]:
+    handler = TOOL_EXECUTORS.get(tool)
+    if handler is None:
+        return {"status": 404, "detail": "Unknown tool"}
+    async with limit:
+        started = time.perf_counter()
+        try:
+            output = await run_in_threadpool(handler, arguments)
+            result: Dict[str, Any] = {"status": 200, "output": output}
+        except Exception as exc:
+            if not isinstance(exc, (HTTPException, UnsupportedByBackend, Overloaded, ServiceUnavailable, shaping.CursorError)):
+                logger.exception("Batched MCP tool {} failed", tool)
+            result = _error_frame(exc)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+
+@mcp_app.post("/invoke/batch")
+async def mcp_invoke_batch(req: MCPBatchRequest, request: Request) -> Any:
+    """Run several tool calls in one round trip.
+
+    Identical calls (same tool, same arguments after defaults) run once and share the result.
+    Distinct calls run concurrently (MCP_BATCH_CONCURRENCY, or ``max_concurrency`` if lower),
+    each in its own admission slot. Results come back in call order, or as SSE ``result``
+    frames in completion order followed by a ``done`` frame.
+    """
+    if len(req.calls) > settings.mcp_batch_max_calls:
+        raise HTTPException(status_code=422, detail=f"at most {settings.mcp_batch_max_calls} calls per batch")
+    groups: Dict[bytes, list[int]] = {}
+    for index, call in enumerate(req.calls):
+        groups.setdefault(_merge_key(call.tool, call.arguments), []).append(index)
+    # The middleware charged one request; the other distinct calls count against the same budget
+    rate_limiter.check(
+        rate_limiter.client_key(request.headers.get("X-API-Token"), request.client.host if request.client else None),
+        settings.rate_limit_per_minute,
+        settings.rate_limit_burst,
+        cost=len(groups) - 1,
+    )
+    limit = asyncio.Semaphore(min(req.max_concurrency or settings.mcp_batch_concurrency, settings.mcp_batch_concurrency))
+    started = time.perf_counter()
+
+    def frame(index: int, result: Dict[str, Any]) -> Dict[str, Any]:
+        call = req.calls[index]
+        return {"id": call.id if call.id is not None else str(index), "tool": call.tool, **result}
+
+    def summary() -> Dict[str, Any]:
+        return {
+            "count": len(req.calls),
+            "unique_calls": len(groups),
+            "merged": len(req.calls) - len(groups),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def run_group(indices: list[int]) -> tuple[list[int], Dict[str, Any]]:
+        call = req.calls[indices[0]]
+        return indices, await _run_call(call.tool, call.arguments, limit)
+
+    if not (req.stream or "text/event-stream" in request.headers.get("accept", "")):
+        done = await asyncio.gather(*(run_group(indices) for indices in groups.values()))
+        results: list[Dict[str, Any]] = [{} for _ in req.calls]
+        for indices, result in done:
+            for index in indices:
+                results[index] = frame(index, result)
+        return {"results": results, **summary()}
+
+    async def events():
+        tasks = [asyncio.create_task(run_group(indices)) for indices in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, result = await next_done
+                for index in indices:
+                    yield sse("result", frame(index, result))
+            yield sse("done", summary())
+        finally:
+            # Client gone: calls still waiting for a concurrency slot never start
+            for task in tasks:
+                task.cancel()
+
+    return SSEResponse(events())
 
 
 def get_app():
@@ -0,0 +1,107 @@
+"""Server-sent events transport for ``/mcp/invoke``.
+
+A streamed invocation runs the tool's frame generator in one worker thread, which owns the
+Neo4j session from the first row to the last, and hands frames to the event loop through a
+small bounded buffer (a slow client therefore pauses the fetch instead of growing memory).
+When the client disconnects, Starlette cancels the response; ``cancel`` is set, the worker
+stops before its next row and closes the generator, which rolls the read transaction back.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator
+
+import orjson
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+KEEPALIVE = ": keepalive\n\n"
+
+_DONE = object()
+
+
+def sse(event: str, data: Any) -> str:
+    """One SSE frame (``event`` + single-line JSON ``data``)."""
+    return f"event: {event}\ndata: {orjson.dumps(data, default=str).decode()}\n\n"
+
+
+class SSEResponse(StreamingResponse):
+    media_type = "text/event-stream"
+
+    def __init__(self, content: AsyncIterator[str], on_close: Callable[[], None] | None = None, **kwargs: Any) -> None:
+        self.on_close = on_close
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(kwargs.pop("headers", None) or {})}
+        super().__init__(content, headers=headers, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # A failed send leaves the body generator suspended; close it so its cleanup runs now
+            aclose = getattr(self.body_iterator, "aclose", None)
+            try:
+                if aclose is not None:
+                    await aclose()
+            finally:
+                if self.on_close is not None:
+                    self.on_close()
+
+
+async def iterate_in_thread(
+    frames: Iterator[Any],
+    cancel: threading.Event,
+    buffer: int = 4,
+    keepalive: float | None = None,
+) -> AsyncIterator[Any]:
+    """Drive ``frames`` in a worker thread and yield its items on the event loop.
+
+    Yields None after ``keepalive`` idle seconds (for SSE comments that keep proxies from
+    timing out a long query). Exceptions from ``frames`` are re-raised here. Leaving the
+    ``async for`` early sets ``cancel``; the worker then closes ``frames`` without waiting
+    for a free buffer slot.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[tuple[Any, BaseException | None]] = asyncio.Queue()
+    slots = threading.Semaphore(max(1, buffer))
+
+    def push(item: Any, exc: BaseException | None = None) -> None:
+        with contextlib.suppress(RuntimeError):  # loop already closed (shutdown)
+            loop.call_soon_threadsafe(queue.put_nowait, (item, exc))
+
+    def produce() -> None:
+        try:
+            with contextlib.closing(frames):
+                for item in frames:
+                    while not slots.acquire(timeout=0.5):
+                        if cancel.is_set():
+                            return
+                    if cancel.is_set():
+                        return
+                    push(item)
+        except BaseException as exc:
+            push(_DONE, exc)
+        else:
+            push(_DONE)
+
+    # Copy the context so profiling and tracing context vars reach the worker
+    worker = loop.run_in_executor(None, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            try:
+                item, exc = await asyncio.wait_for(queue.get(), keepalive) if keepalive else await queue.get()
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is _DONE:
+                if exc is not None:
+                    raise exc
+                break
+            slots.release()
+            yield item
+        await worker
+    finally:
+        cancel.set()